@@ -1,9 +1,14 @@
 """Flask web application for visualizing infrastructure graph."""
 
+import gc
+import io
+import json
 import os
 import sys
+import time
+from itertools import islice
 from pathlib import Path
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, g, render_template, jsonify, request, stream_with_context, url_for
 from flask_cors import CORS
 from dotenv import load_dotenv
 
@@ -17,8 +22,14 @@ except ImportError:
     NEO4J_AVAILABLE = False
     Neo4jClient = None
 
+from src.database import migrations
 from src.database.postgres_client import PostgresClient
-from src.enrichment.enrichment_pipeline import enrich_domain
+from src.analysis.aggregations import build_service_graph, domain_analytics, graph_stats, infrastructure_summary
+from src.enrichment import job_queue, metrics
+from src.enrichment.domain_import import read_domain_rows
+from src.enrichment.enrichment_pipeline import enrich_domain, stage_reporter
+from src.enrichment.single_flight import SingleFlight
+from src.enrichment import wappalyzer_engine
 from collections import Counter
 
 # OpenAI import
@@ -39,6 +50,76 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-pro
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
 openai_client = OpenAI(api_key=OPENAI_API_KEY) if (OPENAI_AVAILABLE and OPENAI_API_KEY) else None
 
+# Load the Wappalyzer database before gunicorn (--preload) forks its workers,
+# and move it out of the GC's reach so collections in the workers don't touch
+# (and copy) its pages
+wappalyzer_engine.preload()
+gc.freeze()
+
+# Bring the database schema up to date once per start, before the workers
+# fork; they only check the version afterwards
+migrations.run()
+
+# Every worker adds its metrics to one shared file, so /metrics reports the
+# same totals whichever worker serves the scrape
+metrics.share()
+
+# /api/check serves a stored enrichment instead of re-enriching if it is at most this old
+CHECK_MAX_AGE_HOURS = float(os.getenv('CHECK_MAX_AGE_HOURS', '24'))
+
+# Concurrent /api/check and /api/enrich calls for the same domain share one
+# enrichment; callers arriving this many seconds after it finished get the
+# same result too
+ENRICH_SHARE_WINDOW = float(os.getenv('ENRICH_SHARE_WINDOW', '10'))
+_enrichments = SingleFlight(window=ENRICH_SHARE_WINDOW)
+
+# /api/check/stream looks for new progress of its check job this often, and
+# sends a keepalive after this many seconds without any (seconds)
+CHECK_STREAM_POLL_INTERVAL = 0.25
+CHECK_STREAM_HEARTBEAT = 15.0
+
+
+def get_postgres():
+    """
+    PostgresClient for the current request.
+    
+    The connection is borrowed from the pool on first use and returned when
+    the request ends, so a request makes at most one connection however many
+    queries it runs.
+    """
+    if 'postgres' not in g:
+        g.postgres = PostgresClient()
+    return g.postgres
+
+
+@app.teardown_appcontext
+def release_postgres(exception):
+    postgres = g.pop('postgres', None)
+    if postgres is not None:
+        postgres.close()
+
+
+def coalesced_enrichment(domain, on_stage=None):
+    """
+    enrich_domain(), shared with concurrent requests for the same domain.
+    
+    ``on_stage`` is only called if this call runs the enrichment, not when
+    it joins one already running.
+    """
+    return _enrichments.do(domain.lower(), enrich_domain, domain, on_stage=on_stage)
+
+
+def job_accepted(job_id, domain):
+    """202 response pointing the client at a queued job."""
+    status_url = url_for('get_job_status', job_id=job_id)
+    return jsonify({
+        "message": "Domain queued for enrichment",
+        "domain": domain,
+        "job_id": job_id,
+        "status_url": status_url,
+        "status": "queued"
+    }), 202, {"Location": status_url}
+
 
 @app.route('/')
 def index():
@@ -64,15 +145,39 @@ def check():
     return render_template('check.html')
 
 
+def get_fresh_stored_enrichment(domain):
+    """Return the stored enrichment for a domain if it is newer than CHECK_MAX_AGE_HOURS."""
+    from datetime import datetime, timedelta
+    
+    try:
+        stored = get_postgres().get_enriched_domain(domain)
+    except Exception as e:
+        print(f"Stored enrichment lookup failed (enriching live): {e}")
+        return None
+    
+    if not stored or not stored.get('enriched_at'):
+        return None
+    if datetime.now() - stored['enriched_at'] > timedelta(hours=CHECK_MAX_AGE_HOURS):
+        return None
+    return stored
+
+
 @app.route('/api/check', methods=['POST'])
 def check_domain_only():
     """
     Check/enrich a domain WITHOUT storing it in the database.
     This is for one-off analysis only.
     
+    A stored enrichment younger than CHECK_MAX_AGE_HOURS is returned
+    immediately instead; pass "force": true to always enrich live (the
+    lookup cache is skipped too).
+    Live enrichment runs as a background job: the response is 202 with a
+    job_id, and GET /api/jobs/<job_id> returns the result when it is done.
+    
     POST /api/check
     Body: {
-        "domain": "example.com"
+        "domain": "example.com",
+        "force": false
     }
     """
     data = request.get_json()
@@ -81,191 +186,148 @@ def check_domain_only():
         return jsonify({"error": "Domain is required"}), 400
     
     domain = data['domain'].strip()
+    force = bool(data.get('force'))
     
-    try:
-        # Enrich domain but DON'T store it
-        print(f"Checking domain (no storage): {domain}")
-        enrichment_data = enrich_domain(domain)
-        
-        return jsonify({
-            "message": "Domain analyzed successfully (not stored)",
-            "domain": domain,
-            "data": enrichment_data,
-            "status": "checked"
-        }), 200
+    if not force:
+        stored = get_fresh_stored_enrichment(domain)
+        if stored:
+            return jsonify({
+                "message": "Domain served from stored enrichment",
+                "domain": domain,
+                "data": stored,
+                "enriched_at": str(stored['enriched_at']),
+                "status": "cached"
+            }), 200
     
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            "error": str(e),
-            "domain": domain,
-            "status": "error"
-        }), 500
+    job_id, _ = submit_check(domain, force)
+    return job_accepted(job_id, domain)
 
 
-def get_graph_from_postgres():
-    """Generate graph data from PostgreSQL instead of Neo4j."""
-    from collections import Counter
+def submit_check(domain, force=False):
+    """
+    Queue a check job for a domain, or join the one already queued or running.
     
-    postgres = PostgresClient()
-    domains = postgres.get_all_enriched_domains()
-    postgres.close()
-    
-    # Build nodes and edges from PostgreSQL data
-    nodes = []
-    edges = []
-    node_id_map = {}  # Map of (type, name) -> node_id
-    node_counter = 0
-    
-    # Service frequency counters
-    service_counts = Counter()
-    
-    # Add domain nodes
-    for domain in domains:
-        domain_name = domain.get('domain', '')
-        if not domain_name:
-            continue
-            
-        node_id = f"domain_{domain_name}"
-        node_id_map[('domain', domain_name)] = node_id
-        
-        nodes.append({
-            "id": node_id,
-            "label": "Domain",
-            "node_type": "domain",
-            "properties": {
-                "domain": domain_name,
-                "name": domain_name
-            }
-        })
-        
-        # Create service nodes and edges
-        # Host
-        if domain.get('host_name'):
-            host_name = domain['host_name']
-            service_counts[('host', host_name)] += 1
-            if ('host', host_name) not in node_id_map:
-                node_counter += 1
-                host_id = f"host_{node_counter}_{host_name}"
-                node_id_map[('host', host_name)] = host_id
-                nodes.append({
-                    "id": host_id,
-                    "label": "Host",
-                    "node_type": "service",
-                    "properties": {
-                        "name": host_name,
-                        "ip": domain.get('ip_address', ''),
-                        "isp": domain.get('isp', '')
-                    }
-                })
-            edges.append({
-                "source": node_id,
-                "target": node_id_map[('host', host_name)],
-                "type": "HOSTED_ON"
-            })
-        
-        # CDN
-        if domain.get('cdn'):
-            cdn_name = domain['cdn']
-            service_counts[('cdn', cdn_name)] += 1
-            if ('cdn', cdn_name) not in node_id_map:
-                node_counter += 1
-                cdn_id = f"cdn_{node_counter}_{cdn_name}"
-                node_id_map[('cdn', cdn_name)] = cdn_id
-                nodes.append({
-                    "id": cdn_id,
-                    "label": "CDN",
-                    "node_type": "service",
-                    "properties": {"name": cdn_name}
-                })
-            edges.append({
-                "source": node_id,
-                "target": node_id_map[('cdn', cdn_name)],
-                "type": "USES_CDN"
+    Concurrent checks of a domain (through /api/check or /api/check/stream)
+    share one job, but a forced check never joins an unforced one.
+    """
+    # Enrich domain but DON'T store it
+    key = f"{domain.lower()}:force" if force else domain.lower()
+    return job_queue.submit("check", key, {"domain": domain, "force": force})
+
+
+def server_sent_event(event, data):
+    """One Server-Sent Events message with a JSON payload."""
+    return f"event: {event}\ndata: {app.json.dumps(data)}\n\n"
+
+
+@app.route('/api/check/stream', methods=['GET'])
+def check_domain_stream():
+    """
+    Streaming variant of /api/check, as Server-Sent Events.
+    
+    The domain is checked by the same background job as /api/check (joining
+    one already running for it), and the stream follows that job: a "stage"
+    event is sent as each enrichment stage finishes, with the result fields
+    it filled in; then "done" with the same body as /api/check's result, or
+    "failed" with the error. Stored enrichments are served as in
+    /api/check (a single "done" event). A client that disconnects stops
+    following the job; the job itself finishes for anyone else checking.
+    
+    GET /api/check/stream?domain=example.com&force=false
+    """
+    domain = (request.args.get('domain') or '').strip()
+    if not domain:
+        return jsonify({"error": "Domain is required"}), 400
+    
+    force = request.args.get('force', '').lower() in ('1', 'true', 'yes')
+    stored = None if force else get_fresh_stored_enrichment(domain)
+    
+    def failed(error):
+        return server_sent_event("failed", {"error": error, "domain": domain, "status": "error"})
+    
+    def events():
+        if stored:
+            yield server_sent_event("done", {
+                "message": "Domain served from stored enrichment",
+                "domain": domain,
+                "data": stored,
+                "enriched_at": str(stored['enriched_at']),
+                "status": "cached"
             })
+            return
         
-        # CMS
-        if domain.get('cms'):
-            cms_name = domain['cms']
-            service_counts[('cms', cms_name)] += 1
-            if ('cms', cms_name) not in node_id_map:
-                node_counter += 1
-                cms_id = f"cms_{node_counter}_{cms_name}"
-                node_id_map[('cms', cms_name)] = cms_id
-                nodes.append({
-                    "id": cms_id,
-                    "label": "CMS",
-                    "node_type": "service",
-                    "properties": {"name": cms_name}
-                })
-            edges.append({
-                "source": node_id,
-                "target": node_id_map[('cms', cms_name)],
-                "type": "HAS_CMS"
-            })
+        try:
+            job_id, _ = submit_check(domain, force)
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            yield failed(str(e))
+            return
         
-        # Registrar
-        if domain.get('registrar'):
-            registrar_name = domain['registrar']
-            service_counts[('registrar', registrar_name)] += 1
-            if ('registrar', registrar_name) not in node_id_map:
-                node_counter += 1
-                registrar_id = f"registrar_{node_counter}_{registrar_name}"
-                node_id_map[('registrar', registrar_name)] = registrar_id
-                nodes.append({
-                    "id": registrar_id,
-                    "label": "Registrar",
-                    "node_type": "service",
-                    "properties": {"name": registrar_name}
-                })
-            edges.append({
-                "source": node_id,
-                "target": node_id_map[('registrar', registrar_name)],
-                "type": "REGISTERED_BY"
-            })
+        after = 0
+        last_sent = time.monotonic()
+        try:
+            while True:
+                # Read the status first: events recorded before the job
+                # finished are then all in the events read after it
+                job = job_queue.get_job(job_id)
+                for after, event, data in job_queue.job_events(job_id, after):
+                    yield server_sent_event(event, data)
+                    last_sent = time.monotonic()
+                
+                if job is None:
+                    yield failed("Job expired before it finished")
+                    return
+                if job['status'] == 'done':
+                    yield server_sent_event("done", job['result'])
+                    return
+                if job['status'] == 'failed':
+                    yield failed(job['error'] or "Failed to analyze domain")
+                    return
+                
+                if time.monotonic() - last_sent >= CHECK_STREAM_HEARTBEAT:
+                    # Comment line: keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    last_sent = time.monotonic()
+                time.sleep(CHECK_STREAM_POLL_INTERVAL)
+        except GeneratorExit:
+            # Client went away: stop following the job, which carries on
+            print(f"  → Stream of check {job_id} closed by the client")
+            return
     
-    # Filter to top 20 services
-    top_services = service_counts.most_common(20)
-    top_service_keys = {key for key, count in top_services}
-    
-    # Filter nodes and edges
-    domain_nodes = [n for n in nodes if n.get("node_type") == "domain"]
-    service_nodes = [
-        n for n in nodes 
-        if n.get("node_type") == "service" 
-        and any((n["properties"].get("name") == name and 
-                 (n["label"].lower(), name) in top_service_keys) 
-                for name in [n["properties"].get("name")])
-    ]
-    
-    # Keep all service nodes (we'll filter by checking if they're in top_service_keys)
-    all_service_keys_set = {key for key, _ in top_services}
-    filtered_service_nodes = [
-        n for n in nodes if n.get("node_type") == "service"
-        and (n["label"].lower(), n["properties"].get("name")) in all_service_keys_set
-    ]
-    
-    # Filter edges to only include top services
-    filtered_node_ids = {n["id"] for n in domain_nodes + filtered_service_nodes}
-    filtered_edges = [
-        e for e in edges
-        if e.get("source") in filtered_node_ids and e.get("target") in filtered_node_ids
-    ]
-    
-    service_names = [name for (_, name), _ in top_services[:20]]
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def run_check_job(domain, force=False):
+    """
+    Job handler for /api/check and /api/check/stream.
     
+    Each finished stage is recorded as a "stage" job event for the streams
+    following the job.
+    """
+    print(f"Checking domain (no storage): {domain}")
+    job_id = job_queue.current_job()
+    on_stage = None
+    if job_id:
+        on_stage = stage_reporter(domain, lambda progress: job_queue.add_event(job_id, "stage", progress))
     return {
-        "nodes": domain_nodes + filtered_service_nodes,
-        "edges": filtered_edges,
-        "stats": {
-            "total_domains": len(domain_nodes),
-            "total_services": len(filtered_service_nodes),
-            "top_services": service_names
-        }
+        "message": "Domain analyzed successfully (not stored)",
+        "domain": domain,
+        # Forced checks must not be served a result from before they were made
+        "data": (enrich_domain(domain, on_stage=on_stage, force=True) if force
+                 else coalesced_enrichment(domain, on_stage)),
+        "status": "checked"
     }
 
 
+def get_graph_from_postgres():
+    """Generate graph data from PostgreSQL instead of Neo4j."""
+    domains = get_postgres().get_all_enriched_domains()
+    
+    return build_service_graph(domains)
+
+
 @app.route('/api/graph')
 def get_graph():
     """Get graph data from Neo4j or PostgreSQL, filtered to show top 20 services."""
@@ -406,29 +468,9 @@ def get_graph():
 @app.route('/api/stats')
 def get_stats():
     """Get statistics about the dataset."""
-    # Use PostgreSQL for stats
-    postgres = PostgresClient()
-    domains = postgres.get_all_enriched_domains()
-    postgres.close()
-    
     try:
         # Generate graph-like structure from PostgreSQL
-        graph_data = get_graph_from_postgres()
-        
-        nodes = graph_data.get("nodes", [])
-        edges = graph_data.get("edges", [])
-        
-        # Count nodes by type
-        node_counts = {}
-        for node in nodes:
-            label = node.get("label", "Unknown")
-            node_counts[label] = node_counts.get(label, 0) + 1
-        
-        stats = {
-            "total_nodes": len(nodes),
-            "total_edges": len(edges),
-            "node_types": node_counts
-        }
+        stats = graph_stats(get_graph_from_postgres())
         
         return jsonify(stats)
     except Exception as e:
@@ -438,11 +480,20 @@ def get_stats():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/metrics')
+def get_metrics():
+    """Stage and provider latency/outcome metrics in Prometheus text format."""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/enrich', methods=['POST'])
 def enrich_and_store():
     """
     Enrich a domain and store results in database.
     
+    Returns 200 if the domain is already stored; otherwise the work is
+    queued and the response is 202 with a job_id to poll at /api/jobs/<job_id>.
+    
     POST /api/enrich
     Body: {
         "domain": "example.com",
@@ -459,90 +510,224 @@ def enrich_and_store():
     source = data.get('source', 'Web API')
     notes = data.get('notes', '')
     
-    # Check if domain already exists
-    postgres = PostgresClient()
-    neo4j = Neo4jClient()
-    
     try:
-        # Check PostgreSQL for existing domain
-        existing = postgres.get_all_enriched_domains()
-        existing_domains = [d['domain'] for d in existing if d['domain']]
-        
-        if domain in existing_domains:
-            return jsonify({
-                "message": "Domain already exists in database",
-                "domain": domain,
-                "status": "exists"
-            }), 200
-        
-        # Enrich domain
-        print(f"Enriching domain: {domain}")
-        enrichment_data = enrich_domain(domain)
+        exists = get_postgres().get_enriched_domain(domain) is not None
+    except Exception as e:
+        return jsonify({
+            "error": str(e),
+            "domain": domain,
+            "status": "error"
+        }), 500
+    
+    if exists:
+        return jsonify({
+            "message": "Domain already exists in database",
+            "domain": domain,
+            "status": "exists"
+        }), 200
+    
+    # Concurrent requests for the same domain store it once
+    job_id, _ = job_queue.submit("enrich", domain.lower(), {"domain": domain, "source": source, "notes": notes})
+    return job_accepted(job_id, domain)
+
+
+# Batch uploads are checked against the database and queued this many rows at a time
+BATCH_CHUNK_SIZE = 500
+
+
+@app.route('/api/enrich/batch', methods=['POST'])
+def enrich_batch():
+    """
+    Enrich and store a list of domains uploaded as CSV or NDJSON.
+    
+    The body is read as it arrives, so uploads of any size work. Every
+    BATCH_CHUNK_SIZE rows are checked against the database with one query,
+    and the new domains are queued as /api/enrich jobs. The response is
+    NDJSON: a line per row as it is handled ("queued", "exists",
+    "duplicate" or "invalid"), a line per job as it finishes ("done" or
+    "failed"), then a "complete" line with counts. By default the
+    response (202) ends once everything is queued, and the jobs are
+    followed through /api/jobs/<job_id>; pass wait=true to keep it open
+    until they finish.
+    
+    POST /api/enrich/batch?source=Manual%20entry&wait=false
+    Content-Type: text/csv              (header row; columns domain or url, source, notes)
+                  application/x-ndjson  ({"domain": ..., "source": ..., "notes": ...} per line)
+    """
+    fmt = "ndjson" if "json" in request.mimetype else "csv"
+    default_source = request.args.get('source', 'Web API')
+    wait = request.args.get('wait', 'false').lower() in ('1', 'true', 'yes')
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    
+    def results():
+        counts = Counter()
+        seen = set()
+        pending = {}  # job_id -> domain
         
-        # Store in PostgreSQL
-        domain_id = postgres.insert_domain(domain, source, notes)
-        postgres.insert_enrichment(domain_id, enrichment_data)
+        def line(entry):
+            counts[entry["status"]] += 1
+            return json.dumps(entry) + "\n"
         
-        # Store in Neo4j (optional - only if available)
-        if NEO4J_AVAILABLE:
-            try:
-                neo4j = Neo4jClient()
-                neo4j.create_domain(domain, source, notes)
-                
-                # Create host node and link
-                if enrichment_data.get("ip_address"):
-                    neo4j.create_host(
-                        host_name=enrichment_data.get("host_name", "Unknown"),
-                        ip=enrichment_data["ip_address"],
-                        asn=enrichment_data.get("asn"),
-                        isp=enrichment_data.get("isp")
-                    )
-                    neo4j.link_domain_to_host(domain, enrichment_data["ip_address"])
-                
-                # Create CDN node and link
-                if enrichment_data.get("cdn"):
-                    neo4j.create_cdn(enrichment_data["cdn"])
-                    neo4j.link_domain_to_cdn(domain, enrichment_data["cdn"])
+        postgres = PostgresClient()
+        try:
+            rows = enumerate(read_domain_rows(lines, fmt, default_source), 1)
+            while True:
+                chunk = list(islice(rows, BATCH_CHUNK_SIZE))
+                if not chunk:
+                    break
                 
-                # Create CMS node and link
-                if enrichment_data.get("cms"):
-                    neo4j.create_cms(enrichment_data["cms"])
-                    neo4j.link_domain_to_cms(domain, enrichment_data["cms"])
+                new_rows = []
+                for number, row in chunk:
+                    domain = row['domain']
+                    if not domain:
+                        yield line({"row": number, "status": "invalid", "error": row.get('error', "No domain")})
+                    elif domain.lower() in seen:
+                        yield line({"row": number, "domain": domain, "status": "duplicate"})
+                    else:
+                        seen.add(domain.lower())
+                        new_rows.append((number, row))
                 
-                # Create payment processor nodes and links
-                if enrichment_data.get("payment_processor"):
-                    processors = [p.strip() for p in enrichment_data["payment_processor"].split(",")]
-                    for processor in processors:
-                        neo4j.create_payment_processor(processor)
-                        neo4j.link_domain_to_payment(domain, processor)
+                existing = postgres.get_existing_domains([row['domain'] for _, row in new_rows])
+                to_queue = []
+                for number, row in new_rows:
+                    if row['domain'] in existing:
+                        yield line({"row": number, "domain": row['domain'], "status": "exists"})
+                    else:
+                        to_queue.append((number, row))
                 
-                neo4j.close()
-            except Exception as e:
-                print(f"Neo4j storage failed (continuing without it): {e}")
-                # Continue without Neo4j - PostgreSQL has all the data we need
+                jobs = job_queue.submit_many("enrich", [(row['domain'].lower(), row) for _, row in to_queue])
+                for (number, row), (job_id, _) in zip(to_queue, jobs):
+                    pending[job_id] = row['domain']
+                    yield line({"row": number, "domain": row['domain'], "status": "queued", "job_id": job_id})
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            yield line({"status": "error", "error": str(e)})
+            return
+        finally:
+            postgres.close()
         
-        return jsonify({
-            "message": "Domain enriched and stored successfully",
-            "domain": domain,
-            "data": enrichment_data,
-            "status": "success"
-        }), 201
+        while wait and pending:
+            time.sleep(job_queue.JOB_POLL_INTERVAL)
+            statuses = job_queue.job_statuses(pending)
+            for job_id in list(pending):
+                status, error = statuses.get(job_id, ("failed", "Job expired before it finished"))
+                if status in ("done", "failed"):
+                    yield line({"domain": pending.pop(job_id), "status": status, "job_id": job_id, "error": error})
+        
+        yield json.dumps({"status": "complete", "counts": dict(counts)}) + "\n"
     
-    except Exception as e:
-        return jsonify({
-            "error": str(e),
+    return Response(stream_with_context(results()), status=200 if wait else 202,
+                    mimetype='application/x-ndjson')
+
+
+def run_enrich_job(domain, source, notes):
+    """Job handler for /api/enrich."""
+    payload, _ = store_new_domain(domain, source, notes)
+    return payload
+
+
+def store_new_domain(domain, source, notes):
+    """
+    Enrich a domain and store it, unless it is already stored.
+    
+    Returns (response body, status code); errors are raised.
+    """
+    # Pooled connections are only held for the queries, not the enrichment
+    postgres = PostgresClient()
+    try:
+        # Check PostgreSQL for existing domain (it may have been stored since the job was queued)
+        exists = postgres.get_enriched_domain(domain) is not None
+    finally:
+        postgres.close()
+    
+    if exists:
+        return {
+            "message": "Domain already exists in database",
             "domain": domain,
-            "status": "error"
-        }), 500
+            "status": "exists"
+        }, 200
+    
+    # Enrich domain (shared with concurrent /api/check calls)
+    print(f"Enriching domain: {domain}")
+    enrichment_data = coalesced_enrichment(domain)
     
+    # Store in PostgreSQL
+    postgres = PostgresClient()
+    try:
+        domain_id = postgres.insert_domain(domain, source, notes)
+        postgres.insert_enrichment(domain_id, enrichment_data)
     finally:
         postgres.close()
+    
+    # Store in Neo4j (optional - only if available)
+    if NEO4J_AVAILABLE:
+        try:
+            neo4j = Neo4jClient()
+            neo4j.create_domain(domain, source, notes)
+            
+            # Create host node and link
+            if enrichment_data.get("ip_address"):
+                neo4j.create_host(
+                    host_name=enrichment_data.get("host_name", "Unknown"),
+                    ip=enrichment_data["ip_address"],
+                    asn=enrichment_data.get("asn"),
+                    isp=enrichment_data.get("isp")
+                )
+                neo4j.link_domain_to_host(domain, enrichment_data["ip_address"])
+            
+            # Create CDN node and link
+            if enrichment_data.get("cdn"):
+                neo4j.create_cdn(enrichment_data["cdn"])
+                neo4j.link_domain_to_cdn(domain, enrichment_data["cdn"])
+            
+            # Create CMS node and link
+            if enrichment_data.get("cms"):
+                neo4j.create_cms(enrichment_data["cms"])
+                neo4j.link_domain_to_cms(domain, enrichment_data["cms"])
+            
+            # Create payment processor nodes and links
+            if enrichment_data.get("payment_processor"):
+                processors = [p.strip() for p in enrichment_data["payment_processor"].split(",")]
+                for processor in processors:
+                    neo4j.create_payment_processor(processor)
+                    neo4j.link_domain_to_payment(domain, processor)
+            
+            neo4j.close()
+        except Exception as e:
+            print(f"Neo4j storage failed (continuing without it): {e}")
+            # Continue without Neo4j - PostgreSQL has all the data we need
+    
+    return {
+        "message": "Domain enriched and stored successfully",
+        "domain": domain,
+        "data": enrichment_data,
+        "status": "success"
+    }, 201
+
+
+job_queue.register("check", run_check_job)
+job_queue.register("enrich", run_enrich_job)
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """
+    Status of a job queued by /api/check or /api/enrich.
+    
+    "result" holds the response body the request used to return once
+    status is "done"; "error" says why when it is "failed".
+    """
+    job = job_queue.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found", "job_id": job_id}), 404
+    return jsonify(job)
 
 
 @app.route('/api/domains', methods=['GET'])
 def get_domains():
     """Get all enriched domains from database."""
-    postgres = PostgresClient()
+    postgres = get_postgres()
     
     try:
         domains = postgres.get_all_enriched_domains()
@@ -552,14 +737,12 @@ def get_domains():
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        postgres.close()
 
 
 @app.route('/api/domains/<domain>', methods=['GET'])
 def get_domain(domain):
     """Get enrichment data for a specific domain."""
-    postgres = PostgresClient()
+    postgres = get_postgres()
     
     try:
         all_domains = postgres.get_all_enriched_domains()
@@ -571,84 +754,24 @@ def get_domain(domain):
         return jsonify(domain_data[0])
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        postgres.close()
 
 
 @app.route('/api/analytics')
 def get_analytics():
     """Get analytics and outlier detection."""
-    postgres = PostgresClient()
+    postgres = get_postgres()
     
     try:
         domains = postgres.get_all_enriched_domains()
-        
-        if not domains:
-            return jsonify({
-                "outliers": [],
-                "statistics": {}
-            })
-        
-        total = len(domains)
-        outliers = []
-        
-        # Check for outliers in various columns
-        columns_to_check = {
-            'cms': 'CMS',
-            'cdn': 'CDN',
-            'payment_processor': 'Payment Processor',
-            'isp': 'ISP',
-            'host_name': 'Hosting Provider',
-            'registrar': 'Registrar'
-        }
-        
-        for col, label in columns_to_check.items():
-            values = {}
-            for domain in domains:
-                value = domain.get(col)
-                if value:
-                    values[value] = values.get(value, 0) + 1
-            
-            if values:
-                # Find most common value
-                most_common = max(values.items(), key=lambda x: x[1])
-                percentage = (most_common[1] / total) * 100
-                
-                # If 50%+ use the same value, it's an outlier
-                if percentage >= 50:
-                    outliers.append({
-                        'column': col,
-                        'label': label,
-                        'value': most_common[0],
-                        'count': most_common[1],
-                        'percentage': round(percentage, 1),
-                        'severity': 'high' if percentage >= 75 else 'medium'
-                    })
-        
-        # Calculate statistics
-        stats = {
-            'total_domains': total,
-            'domains_with_cms': sum(1 for d in domains if d.get('cms')),
-            'domains_with_cdn': sum(1 for d in domains if d.get('cdn')),
-            'domains_with_payment': sum(1 for d in domains if d.get('payment_processor')),
-            'unique_isps': len(set(d.get('isp') for d in domains if d.get('isp'))),
-            'unique_hosts': len(set(d.get('host_name') for d in domains if d.get('host_name')))
-        }
-        
-        return jsonify({
-            "outliers": outliers,
-            "statistics": stats
-        })
+        return jsonify(domain_analytics(domains))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        postgres.close()
 
 
 @app.route('/api/analysis', methods=['GET'])
 def get_ai_analysis():
     """Get AI-powered analysis of the domain data to identify bad actors."""
-    postgres = PostgresClient()
+    postgres = get_postgres()
     
     try:
         # ALWAYS check for cached analysis first
@@ -682,111 +805,7 @@ def get_ai_analysis():
         
         # Prepare data summary for OpenAI
         total = len(domains)
-        
-        # Normalize provider names to merge duplicates (e.g., "Cloudflare" and "Cloudflare, Inc.")
-        def normalize_provider_name(name):
-            """Normalize provider names to merge variants."""
-            if not name:
-                return name
-            name_lower = name.lower().strip()
-            # Cloudflare variants
-            if 'cloudflare' in name_lower:
-                return 'Cloudflare, Inc.'
-            # Namecheap variants
-            if 'namecheap' in name_lower:
-                return 'Namecheap, Inc.'
-            # Return original if no normalization needed
-            return name
-        
-        # Count providers
-        isps = Counter()
-        hosts = Counter()
-        registrars = Counter()
-        cdns = Counter()
-        cms_platforms = Counter()
-        # Service providers: count unique domains per provider across all roles (CDN/Host/ISP)
-        # Use a set to track which domains each provider serves
-        service_provider_domains = {}
-        
-        for domain in domains:
-            domain_id = domain.get('domain') or domain.get('id', '')
-            
-            if domain.get('isp'):
-                normalized_isp = normalize_provider_name(domain['isp'])
-                isps[normalized_isp] += 1
-                # Track unique domains for this ISP
-                if normalized_isp not in service_provider_domains:
-                    service_provider_domains[normalized_isp] = set()
-                service_provider_domains[normalized_isp].add(domain_id)
-                
-            if domain.get('host_name'):
-                normalized_host = normalize_provider_name(domain['host_name'])
-                hosts[normalized_host] += 1
-                # Track unique domains for this host
-                if normalized_host not in service_provider_domains:
-                    service_provider_domains[normalized_host] = set()
-                service_provider_domains[normalized_host].add(domain_id)
-                
-            if domain.get('registrar'):
-                normalized_registrar = normalize_provider_name(domain['registrar'])
-                registrars[normalized_registrar] += 1
-                
-            if domain.get('cdn'):
-                normalized_cdn = normalize_provider_name(domain['cdn'])
-                cdns[normalized_cdn] += 1
-                # Track unique domains for this CDN
-                if normalized_cdn not in service_provider_domains:
-                    service_provider_domains[normalized_cdn] = set()
-                service_provider_domains[normalized_cdn].add(domain_id)
-            
-            if domain.get('cms'):
-                cms_platforms[domain['cms']] += 1
-                
-        
-        # Convert service provider domain sets to counts
-        service_providers = Counter({provider: len(domains_set) 
-                                    for provider, domains_set in service_provider_domains.items()})
-        
-        # Create summary text - filter to top 10 and only include entries with 5+ domains
-        def format_summary_items(items, limit=10):
-            """Format items for summary, filtering to top N with 5+ domains."""
-            return chr(10).join([f"- {name}: {count} domains ({round(count/total*100, 1)}%)" 
-                                for name, count in items.most_common(limit) if count >= 5])
-        
-        summary = f"""
-Total domains analyzed: {total}
-
-Top ISPs:
-{format_summary_items(isps, 10)}
-
-Top Hosting Providers:
-{format_summary_items(hosts, 10)}
-
-Top Registrars:
-{format_summary_items(registrars, 10)}
-
-Top CDNs:
-{format_summary_items(cdns, 10)}
-
-Top Service Providers (CDN + Host + ISP combined):
-{format_summary_items(service_providers, 10)}
-
-"""
-        
-        # Prepare bad actors data - filter to top 10 and only include entries with 5+ domains
-        def filter_by_count(items, limit=10):
-            """Filter items to top N with 5+ domains."""
-            return [{"name": name, "count": count, "percentage": round(count/total*100, 1)} 
-                   for name, count in items.most_common(limit) if count >= 5]
-        
-        bad_actors_data = {
-            "top_isps": filter_by_count(isps, 10),
-            "top_hosts": filter_by_count(hosts, 10),
-            "top_registrars": filter_by_count(registrars, 10),
-            "top_cdns": filter_by_count(cdns, 10),
-            "top_service_providers": filter_by_count(service_providers, 10),
-            "top_cms": filter_by_count(cms_platforms, 10)
-        }
+        summary, bad_actors_data = infrastructure_summary(domains)
         
         # Call OpenAI API
         analysis_text = None
@@ -852,8 +871,6 @@ Format the response in clear sections with markdown formatting."""
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        postgres.close()
 
 
 def clean_analysis_formatting(text):
@@ -1103,5 +1120,9 @@ if __name__ == '__main__':
     # Render uses PORT environment variable, fallback to FLASK_PORT or 5001
     port = int(os.getenv('PORT', os.getenv('FLASK_PORT', 5001)))
     debug = os.getenv('FLASK_ENV', 'development').lower() != 'production'
+    # Under gunicorn, gunicorn.conf.py does this in each worker; with the
+    # reloader, only in the child process that serves requests
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        job_queue.start_workers()
     app.run(host='0.0.0.0', port=port, debug=debug)
 
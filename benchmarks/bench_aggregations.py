@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the dashboard aggregations at growing dataset sizes.
+
+Times every aggregation behind /api/graph, /api/stats, /api/analytics and
+/api/analysis over synthetic data (see dataset.py), plus JSON encoding of
+the response, and reports time and peak Python memory. With --postgres-db
+the rows are also loaded into a scratch database, and the fetch through
+PostgresClient.get_all_enriched_domains() is timed as well.
+
+    python benchmarks/bench_aggregations.py --sizes 10000,100000,1000000
+    python benchmarks/bench_aggregations.py --sizes 100000 --postgres-db ncii_bench
+"""
+
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.dataset import generate_domains
+from src.analysis.aggregations import build_service_graph, domain_analytics, graph_stats, infrastructure_summary
+
+# Endpoint -> aggregation over the enriched rows
+AGGREGATIONS: Dict[str, Callable] = {
+    "/api/graph": build_service_graph,
+    "/api/stats": lambda domains: graph_stats(build_service_graph(domains)),
+    "/api/analytics": domain_analytics,
+    "/api/analysis": infrastructure_summary,
+}
+
+
+def measure(func: Callable, *args) -> Dict:
+    """
+    Run ``func`` twice: once for wall time, once under tracemalloc for peak memory.
+
+    Tracing slows allocation-heavy code down a lot, so the two are kept apart.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"seconds": round(seconds, 4), "peak_mb": round(peak / (1024 * 1024), 1), "result": result}
+
+
+def load_into_postgres(domains: List[Dict]):
+    """Replace the contents of the (scratch) database with ``domains``."""
+    from psycopg2.extras import Json, execute_values
+    from src.database.postgres_client import PostgresClient
+
+    columns = [
+        "ip_address", "ip_addresses", "ipv6_addresses", "host_name", "asn", "isp", "cdn", "cms",
+        "payment_processor", "registrar", "name_servers", "mx_records", "web_server", "frameworks",
+        "analytics", "languages", "tech_stack", "http_headers", "whois_data", "dns_records",
+    ]
+    pg = PostgresClient()
+    try:
+        cursor = pg.conn.cursor()
+        cursor.execute("TRUNCATE domains RESTART IDENTITY CASCADE")
+        rows = execute_values(
+            cursor, "INSERT INTO domains (domain, source) VALUES %s RETURNING id",
+            [(d["domain"], d["source"]) for d in domains], page_size=10000, fetch=True
+        )
+        execute_values(
+            cursor, f"INSERT INTO domain_enrichment (domain_id, {', '.join(columns)}) VALUES %s",
+            [(domain_id,) + tuple(Json(d[c]) if isinstance(d[c], (list, dict)) else d[c] for c in columns)
+             for (domain_id,), d in zip(rows, domains)],
+            page_size=5000
+        )
+        pg.conn.commit()
+        cursor.close()
+    finally:
+        pg.close()
+
+
+def fetch_from_postgres() -> List[Dict]:
+    from src.database.postgres_client import PostgresClient
+
+    pg = PostgresClient()
+    try:
+        return pg.get_all_enriched_domains()
+    finally:
+        pg.close()
+
+
+def bench_size(size: int, seed: int, use_postgres: bool) -> Dict:
+    print(f"\n=== {size:,} domains")
+    gc.collect()
+    tracemalloc.start()
+    domains = generate_domains(size, seed)
+    generated = {"peak_mb": round(tracemalloc.get_traced_memory()[0] / (1024 * 1024), 1)}
+    tracemalloc.stop()
+    print(f"  dataset: {generated['peak_mb']} MB in memory")
+
+    report = {"size": size, "dataset": generated, "fetch": None, "endpoints": {}}
+
+    if use_postgres:
+        load_into_postgres(domains)
+        fetch = measure(fetch_from_postgres)
+        fetch.pop("result")
+        report["fetch"] = fetch
+        print(f"  DB fetch (get_all_enriched_domains): {fetch['seconds']:.2f}s, peak {fetch['peak_mb']} MB")
+
+    print(f"  {'endpoint':<16} {'aggregate s':>11} {'peak MB':>8} {'json s':>8} {'json MB':>8}"
+          + (f" {'total s (with DB)':>18}" if use_postgres else ""))
+    for endpoint, aggregate in AGGREGATIONS.items():
+        timing = measure(aggregate, domains)
+        result = timing.pop("result")
+
+        start = time.perf_counter()
+        encoded = json.dumps(result, default=str)
+        timing["json_seconds"] = round(time.perf_counter() - start, 4)
+        timing["json_mb"] = round(len(encoded) / (1024 * 1024), 2)
+        del encoded, result
+
+        line = (f"  {endpoint:<16} {timing['seconds']:>11.3f} {timing['peak_mb']:>8.1f} "
+                f"{timing['json_seconds']:>8.3f} {timing['json_mb']:>8.2f}")
+        if use_postgres:
+            timing["total_seconds"] = round(report["fetch"]["seconds"] + timing["seconds"] + timing["json_seconds"], 4)
+            line += f" {timing['total_seconds']:>18.2f}"
+        print(line)
+        report["endpoints"][endpoint] = timing
+
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark dashboard aggregations on synthetic data")
+    parser.add_argument(
+        "--sizes",
+        type=str,
+        default="10000,100000",
+        help="Comma-separated dataset sizes (default: 10000,100000)"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Random seed for the synthetic data"
+    )
+    parser.add_argument(
+        "--postgres-db",
+        type=str,
+        default=None,
+        metavar="NAME",
+        help="Also time the DB round trip using this scratch database (its domain tables are WIPED)"
+    )
+    parser.add_argument(
+        "--json",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Write results to this JSON file"
+    )
+
+    args = parser.parse_args()
+
+    if args.postgres_db:
+        from dotenv import load_dotenv
+        load_dotenv()
+        if args.postgres_db == os.getenv("POSTGRES_DB", "ncii_infra"):
+            print(f"Error: refusing to wipe the configured database {args.postgres_db}; use a scratch database")
+            sys.exit(1)
+        os.environ["POSTGRES_DB"] = args.postgres_db
+
+    reports = [bench_size(int(size), args.seed, bool(args.postgres_db)) for size in args.sizes.split(",")]
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+        print(f"\n✓ Results written to {args.json}")
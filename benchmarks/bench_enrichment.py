@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Hermetic end-to-end enrichment benchmark.
+
+Runs the real pipeline against local stand-ins (see fake_services): site
+fixtures behind an intercepting proxy, a DNS responder, fake ip-api /
+IPLocate / BuiltWith endpoints and a fake WHOIS. Nothing leaves the
+machine, so throughput can be compared between commits.
+
+Measures domains/sec, per-domain and per-stage latency, provider calls and
+memory for enrich_domain() one domain at a time and for the concurrent
+batch runner (enrich_domains).
+
+    python benchmarks/bench_enrichment.py --domains 200 --workers 8
+    python benchmarks/bench_enrichment.py --latency whois=0.5 --failure-rate site=0.1
+    python benchmarks/bench_enrichment.py --json after.json --baseline before.json
+"""
+
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.fake_services import Corpus, fake_whois, make_services, stand_ins
+
+# Default per-call latency of each stand-in, in seconds (roughly a fast real network)
+DEFAULT_LATENCY = {
+    "site": 0.05,
+    "dns": 0.002,
+    "whois": 0.1,
+    "ip-api": 0.05,
+    "iplocate": 0.05,
+    "builtwith": 0.1,
+}
+
+# API keys the pipeline would use against real providers; cleared so a local
+# .env can't send benchmark traffic anywhere
+_PROVIDER_KEYS = ("IPLOCATE_API_KEY", "BUILTWITH_API_KEY", "WAPPALYZER_API_KEY", "WHATCMS_API_KEY",
+                  "VIRUSTOTAL_API_KEY", "ABUSEIPDB_API_KEY", "SECURITYTRAILS_API_KEY")
+
+
+def hermetic_env(servers, state_dir: str, builtwith: bool, iplocate: bool, use_cache: bool) -> Dict[str, str]:
+    """Environment that routes every pipeline call to the stand-ins (as yielded by stand_ins())."""
+    env = {key: "" for key in _PROVIDER_KEYS}
+    env.update({
+        "HTTP_PROXY": servers.proxy_url,
+        "HTTPS_PROXY": servers.proxy_url,
+        "http_proxy": servers.proxy_url,
+        "https_proxy": servers.proxy_url,
+        "NO_PROXY": "",
+        "no_proxy": "",
+        "REQUESTS_CA_BUNDLE": servers.ca_path,
+        "DNS_NAMESERVERS": "127.0.0.1",
+        "DNS_PORT": str(servers.dns_port),
+        # Local state goes to a scratch directory, and the offline IP index
+        # is left out so IP lookups hit the (fake) APIs
+        "CACHE_DB": os.path.join(state_dir, "lookups.sqlite3"),
+        "CACHE_DISABLED": "" if use_cache else "1",
+        "RATE_LIMIT_DB": os.path.join(state_dir, "rate_limits.sqlite3"),
+        "RUN_LEDGER_DB": os.path.join(state_dir, "runs.sqlite3"),
+        "IP_ASN_DB": os.path.join(state_dir, "missing.idx"),
+    })
+    for provider in ("IP_API", "IP_API_BATCH", "IPLOCATE", "BUILTWITH"):
+        env[f"RATE_LIMIT_{provider}"] = "1000000/1"
+    if builtwith:
+        env["BUILTWITH_API_KEY"] = "bench"
+    if iplocate:
+        env["IPLOCATE_API_KEY"] = "bench"
+    return env
+
+
+def _parse_overrides(values: List[str], option: str) -> Dict[str, float]:
+    overrides = {}
+    for value in values or []:
+        name, _, number = value.partition("=")
+        if name not in DEFAULT_LATENCY or not number:
+            raise SystemExit(f"{option} expects SERVICE=NUMBER with SERVICE one of {', '.join(DEFAULT_LATENCY)}")
+        overrides[name] = float(number)
+    return overrides
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _quantile(values: List[float], q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+
+def _coverage(records: List[Dict]) -> Dict[str, float]:
+    """Share of records with each key field filled - catches speedups that drop data."""
+    fields = ("registrar", "ip_address", "asn", "cms", "payment_processor", "http_headers", "ssl_info")
+    if not records:
+        return {}
+    return {field: round(sum(1 for r in records if r.get(field)) / len(records), 3) for field in fields}
+
+
+def run_phase(name: str, run, domain_count: int, verbose: bool, trace_memory: bool) -> Dict:
+    """Time one benchmark phase and collect its metrics."""
+    from src.enrichment import metrics
+
+    metrics.reset()
+    if trace_memory:
+        tracemalloc.start()
+    output = None if verbose else open(os.devnull, "w")
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(output) if output else contextlib.nullcontext():
+            records, latencies, errors = run()
+    finally:
+        if output:
+            output.close()
+    elapsed = time.perf_counter() - start
+    traced_peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    if trace_memory:
+        tracemalloc.stop()
+
+    summary = metrics.summary()
+    return {
+        "phase": name,
+        "domains": domain_count,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "domains_per_sec": round(domain_count / elapsed, 2) if elapsed else None,
+        "domain_p50_seconds": _quantile(latencies, 0.5),
+        "domain_p95_seconds": _quantile(latencies, 0.95),
+        "peak_rss_mb": _peak_rss_mb(),
+        "traced_peak_mb": round(traced_peak / (1024 * 1024), 1) if traced_peak is not None else None,
+        "coverage": _coverage(records),
+        "stages": summary["stages"],
+        "providers": summary["providers"],
+    }
+
+
+def sequential(domains: List[str]):
+    """enrich_domain() one domain at a time."""
+    from src.enrichment.enrichment_pipeline import enrich_domain
+
+    def run():
+        records, latencies, errors = [], [], 0
+        for domain in domains:
+            start = time.perf_counter()
+            try:
+                records.append(enrich_domain(domain))
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+        return records, latencies, errors
+    return run
+
+
+def batch(domains: List[str], workers: int):
+    """The concurrent batch runner."""
+    from src.enrichment.enrichment_pipeline import enrich_domains
+
+    def run():
+        records, errors = [], 0
+        for _, record, error in enrich_domains(domains, concurrency=workers):
+            if error:
+                errors += 1
+            else:
+                records.append(record)
+        # Per-domain latency isn't meaningful when domains overlap
+        return records, [], errors
+    return run
+
+
+def print_report(results: List[Dict], baseline: Dict = None):
+    for result in results:
+        print(f"\n=== {result['phase']}: {result['domains']} domains in {result['seconds']:.2f}s "
+              f"→ {result['domains_per_sec']} domains/sec ({result['errors']} errors)")
+        if result["domain_p50_seconds"] is not None:
+            print(f"  per domain: p50 {result['domain_p50_seconds']}s, p95 {result['domain_p95_seconds']}s")
+        memory = f"  peak RSS {result['peak_rss_mb']} MB"
+        if result["traced_peak_mb"] is not None:
+            memory += f", peak traced Python allocations {result['traced_peak_mb']} MB"
+        print(memory)
+        print("  coverage: " + ", ".join(f"{k}={v:.0%}" for k, v in result["coverage"].items()))
+        for section in ("stages", "providers"):
+            print(f"  {section:<14} {'calls':>6} {'total s':>8} {'mean s':>8}  outcomes")
+            for name, series in result[section].items():
+                outcomes = ", ".join(f"{k}={v}" for k, v in sorted(series["outcomes"].items()))
+                print(f"    {name:<12} {series['count']:>6} {series['total_seconds']:>8.2f} "
+                      f"{series['mean_seconds'] or 0:>8.4f}  {outcomes}")
+
+        previous = (baseline or {}).get(result["phase"])
+        if previous and previous.get("domains_per_sec") and result["domains_per_sec"]:
+            change = result["domains_per_sec"] / previous["domains_per_sec"] - 1
+            print(f"  vs baseline: {previous['domains_per_sec']} → {result['domains_per_sec']} domains/sec ({change:+.1%})")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Hermetic enrichment pipeline benchmark")
+    parser.add_argument("--domains", type=int, default=100, help="Domains in the batch phase (default: 100)")
+    parser.add_argument("--sequential", type=int, default=20,
+                        help="Domains enriched one at a time in the sequential phase (default: 20, 0 to skip)")
+    parser.add_argument("--workers", type=int, default=8, help="Batch runner concurrency (default: 8)")
+    parser.add_argument("--latency", action="append", metavar="SERVICE=SECONDS",
+                        help=f"Per-call latency of a stand-in ({', '.join(DEFAULT_LATENCY)}); repeatable")
+    parser.add_argument("--failure-rate", action="append", metavar="SERVICE=RATE",
+                        help="Fraction of calls to a stand-in that fail (0-1); repeatable")
+    parser.add_argument("--no-builtwith", action="store_true", help="Don't configure a BuiltWith key")
+    parser.add_argument("--iplocate", action="store_true",
+                        help="Configure an IPLocate key (per-IP lookups instead of ip-api batches)")
+    parser.add_argument("--cache", action="store_true", help="Keep the lookup cache enabled (empty at start)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also trace Python allocations (slows the run down)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for latency jitter and failures")
+    parser.add_argument("--json", type=str, default=None, metavar="PATH", help="Write results to this JSON file")
+    parser.add_argument("--baseline", type=str, default=None, metavar="PATH",
+                        help="Earlier --json output to compare throughput against")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    args = parser.parse_args()
+
+    latency = dict(DEFAULT_LATENCY, **_parse_overrides(args.latency, "--latency"))
+    failure_rates = _parse_overrides(args.failure_rate, "--failure-rate")
+    size = max(args.domains, args.sequential) + 1
+    corpus = Corpus(size)
+
+    with stand_ins(size, latency, failure_rates, args.seed) as servers, \
+            tempfile.TemporaryDirectory(prefix="bench-state-") as state_dir:
+        # Settings are read at import time, so the pipeline is imported only
+        # once the environment points at the stand-ins
+        os.environ.update(hermetic_env(servers, state_dir, builtwith=not args.no_builtwith,
+                                       iplocate=args.iplocate, use_cache=args.cache))
+        import urllib3
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        from src.enrichment import enrichment_pipeline, whois_enrichment
+        # WHOIS has no endpoint to redirect, so the client call itself is replaced
+        whois_service = make_services(latency, failure_rates, args.seed)["whois"]
+        whois_enrichment.whois = SimpleNamespace(whois=fake_whois(corpus, whois_service))
+
+        # Warm-up: lazy imports, detector data and connection pools
+        warmup, domains = corpus.domains[0], corpus.domains[1:]
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            enrichment_pipeline.enrich_domain(warmup)
+
+        results = []
+        if args.sequential:
+            results.append(run_phase("sequential", sequential(domains[:args.sequential]), args.sequential,
+                                     args.verbose, args.trace_memory))
+        if args.domains:
+            results.append(run_phase(f"batch (workers={args.workers})", batch(domains[:args.domains], args.workers),
+                                     args.domains, args.verbose, args.trace_memory))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {result["phase"]: result for result in json.load(f)["results"]}
+
+    print_report(results, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "settings": {"latency": latency, "failure_rates": failure_rates, "workers": args.workers,
+                             "builtwith": not args.no_builtwith, "iplocate": args.iplocate, "cache": args.cache},
+                "results": results,
+            }, f, indent=2)
+        print(f"\n✓ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
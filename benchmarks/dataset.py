@@ -0,0 +1,137 @@
+"""
+Synthetic enriched-domain rows for benchmarking the aggregation paths.
+
+Rows have the shape PostgresClient.get_all_enriched_domains() returns.
+Providers follow Zipf-like distributions: a handful of hosts, CDNs,
+registrars and CMSs cover most domains, and a long tail of small providers
+grows with the dataset, as in the real data. Provider names come in the
+spelling variants normalize_provider_name() has to merge.
+"""
+
+import random
+import zlib
+from itertools import accumulate
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# (name, relative weight) heads of each distribution; tails are generated
+HOSTS = [
+    ("Cloudflare, Inc.", 30), ("CLOUDFLARENET", 8), ("Amazon.com, Inc.", 12), ("Google LLC", 6),
+    ("DigitalOcean, LLC", 5), ("OVH SAS", 5), ("Hetzner Online GmbH", 5), ("Namecheap, Inc.", 4),
+    ("NAMECHEAP-NET", 2), ("Akamai Technologies, Inc.", 2), ("Linode, LLC", 2), ("M247 Europe SRL", 2),
+    ("Leaseweb Netherlands B.V.", 2), ("Shopify, Inc.", 2), ("Fastly, Inc.", 1), ("Contabo GmbH", 1),
+]
+CDNS = [
+    (None, 45), ("Cloudflare", 38), ("Cloudflare, Inc.", 4), ("AWS CloudFront", 5), ("Fastly", 3),
+    ("Akamai", 2), ("Google Cloud CDN", 1), ("Incapsula", 1), ("Azure CDN", 1),
+]
+REGISTRARS = [
+    ("NameCheap, Inc.", 25), ("Namecheap", 5), ("GoDaddy.com, LLC", 15), ("Cloudflare, Inc.", 10),
+    ("Tucows Domains Inc.", 6), ("Porkbun LLC", 5), ("NameSilo, LLC", 5), ("Dynadot, LLC", 3),
+    ("PDR Ltd. d/b/a PublicDomainRegistry.com", 3), ("Gandi SAS", 2), ("Key-Systems GmbH", 2),
+    ("Hostinger, UAB", 2), ("Njalla", 1), (None, 6),
+]
+CMSS = [
+    (None, 48), ("WordPress", 30), ("Shopify", 5), ("Wix", 3), ("Squarespace", 2), ("Joomla", 2),
+    ("Drupal", 1), ("Ghost", 1), ("Webflow", 1), ("Magento", 1), ("PrestaShop", 1),
+]
+PAYMENTS = [
+    (None, 65), ("Stripe", 10), ("PayPal", 7), ("Stripe, PayPal", 5), ("Coinbase Commerce", 3),
+    ("CCBill", 3), ("Segpay", 2), ("Verotel", 2), ("Epoch", 1), ("Paddle", 1), ("NOWPayments", 1),
+]
+TLDS = [("com", 50), ("net", 8), ("io", 6), ("ai", 8), ("app", 5), ("org", 4), ("co", 4), ("xyz", 5),
+        ("to", 3), ("cc", 2), ("me", 2), ("tv", 1), ("vip", 1), ("fun", 1)]
+WORDS = ["nude", "undress", "deep", "swap", "face", "gen", "ai", "pic", "art", "dream", "clothoff",
+         "magic", "studio", "lab", "hub", "pro", "x", "bot", "cam", "lens", "vision", "pixel", "free"]
+
+
+class _Sampler:
+    """Weighted sampler over a head of named values plus a Zipf tail of synthetic ones."""
+
+    def __init__(self, head: Sequence[Tuple[Optional[str], float]], tail: int = 0,
+                 tail_share: float = 0.0, tail_name: str = "{}", exponent: float = 1.1):
+        values = [name for name, _ in head]
+        head_total = sum(weight for _, weight in head)
+        weights = [weight * (1 - tail_share) / head_total for _, weight in head]
+        if tail:
+            zipf = [1 / (rank + 1) ** exponent for rank in range(tail)]
+            zipf_total = sum(zipf)
+            values += [tail_name.format(rank + 1) for rank in range(tail)]
+            weights += [w * tail_share / zipf_total for w in zipf]
+        self.values = values
+        self._cum_weights = list(accumulate(weights))
+
+    def sample(self, rng: random.Random, k: int) -> List[Optional[str]]:
+        return rng.choices(self.values, cum_weights=self._cum_weights, k=k)
+
+
+def _host_network(host: Optional[str]) -> Tuple[Optional[str], str]:
+    """Stable (ASN, /16 prefix) for a hosting provider."""
+    if host == "Cloudflare, Inc.":
+        return "13335", "104.21"
+    h = zlib.crc32((host or "").encode())
+    return str(10000 + h % 50000), f"{h % 200 + 20}.{(h >> 8) % 256}"
+
+
+def iter_domains(count: int, seed: int = 0) -> Iterator[Dict]:
+    """Yield ``count`` synthetic enriched-domain rows (deterministic for a seed)."""
+    rng = random.Random(seed)
+    # The long tails grow with the dataset: more domains, more small providers
+    hosts = _Sampler(HOSTS, tail=max(50, count // 25), tail_share=0.3, tail_name="Hosting Provider {} LLC")
+    registrars = _Sampler(REGISTRARS, tail=max(20, count // 500), tail_share=0.1, tail_name="Registrar {} Ltd")
+    cdns = _Sampler(CDNS)
+    cmss = _Sampler(CMSS, tail=max(10, count // 2000), tail_share=0.03, tail_name="CustomCMS {}")
+    payments = _Sampler(PAYMENTS)
+    tlds = _Sampler(TLDS)
+
+    # Sample each column in chunks, which is much faster than row by row
+    chunk = 10000
+    for start in range(0, count, chunk):
+        n = min(chunk, count - start)
+        columns = zip(hosts.sample(rng, n), registrars.sample(rng, n), cdns.sample(rng, n),
+                      cmss.sample(rng, n), payments.sample(rng, n), tlds.sample(rng, n))
+        for offset, (host, registrar, cdn, cms, payment, tld) in enumerate(columns):
+            i = start + offset
+            name = f"{rng.choice(WORDS)}{rng.choice(WORDS)}{i}.{tld}"
+            # A CDN in front usually means the CDN is what WHOIS/IP data shows as host
+            if cdn and "cloudflare" in cdn.lower() and rng.random() < 0.8:
+                host = "Cloudflare, Inc."
+            asn, prefix = _host_network(host)
+            ip = f"{prefix}.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+            yield {
+                "domain": name,
+                "source": "synthetic",
+                "notes": None,
+                "ip_address": ip,
+                "ip_addresses": [ip],
+                "ipv6_addresses": [],
+                "host_name": host,
+                "asn": asn if rng.random() < 0.95 else None,
+                "isp": host,
+                "cdn": cdn,
+                "cms": cms,
+                "payment_processor": payment,
+                "registrar": registrar,
+                "creation_date": None,
+                "expiration_date": None,
+                "updated_date": None,
+                "name_servers": [f"ns{j}.{(cdn or host or 'dns').split(',')[0].lower().replace(' ', '')}.com"
+                                 for j in (1, 2)],
+                "mx_records": [f"10 mail.{name}"] if rng.random() < 0.4 else [],
+                "whois_status": None,
+                "web_server": rng.choice(["nginx", "cloudflare", "Apache", "LiteSpeed", None]),
+                "frameworks": [],
+                "analytics": ["Google Analytics"] if rng.random() < 0.5 else [],
+                "languages": [],
+                "tech_stack": {"cms": cms, "cdn": cdn, "payment_processors": payment.split(", ") if payment else []},
+                "http_headers": {"server": "nginx", "content-type": "text/html; charset=UTF-8"},
+                "ssl_info": None,
+                "whois_data": {"registrar": registrar},
+                "dns_records": {"A": [ip]},
+                "ip_locations": None,
+                "enriched_at": None,
+            }
+
+
+def generate_domains(count: int, seed: int = 0) -> List[Dict]:
+    """``count`` synthetic enriched-domain rows as a list."""
+    return list(iter_domains(count, seed))
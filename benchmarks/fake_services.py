@@ -0,0 +1,447 @@
+"""
+Local stand-ins for every service the enrichment pipeline talks to.
+
+- FakeInternet: an HTTP(S) forward proxy that answers for every host itself.
+  ip-api, IPLocate and BuiltWith hosts get canned API responses; any other
+  host gets its site fixture. HTTPS is intercepted with certificates from a
+  throwaway CA, so clients must trust ``ca_path`` (REQUESTS_CA_BUNDLE).
+- FakeDNS: a UDP DNS server answering from the same corpus.
+- fake_whois(): drop-in for whois.whois().
+
+Each service has a Service profile with an artificial latency and failure
+rate, so slow or flaky providers can be reproduced offline. stand_ins()
+runs the proxy and DNS server in a child process, so they don't compete
+with the code under test for the GIL.
+"""
+
+import datetime
+import hashlib
+import json
+import multiprocessing
+import random
+import socketserver
+import ssl
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import dns.message
+import dns.rcode
+import dns.rdataclass
+import dns.rdatatype
+import dns.rrset
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+# Benchmark domains live under a reserved TLD so nothing can leak out
+DOMAIN_SUFFIX = ".bench.test"
+
+API_HOSTS = {
+    "ip-api.com": "ip-api",
+    "www.iplocate.io": "iplocate",
+    "api.builtwith.com": "builtwith",
+}
+
+_ORGS = ["Bench Hosting Ltd", "Example Cloud Inc.", "Test Networks GmbH", "Sample Datacenter LLC"]
+_COUNTRIES = ["US", "NL", "DE", "SG", "FR", "CA"]
+
+
+class Service:
+    """Latency and failure rate of one fake service."""
+
+    def __init__(self, latency: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def simulate(self) -> bool:
+        """Sleep for one call's latency (±50%). Returns True if this call should fail."""
+        with self._lock:
+            jitter = self._random.uniform(0.5, 1.5)
+            fail = self._random.random() < self.failure_rate
+        if self.latency:
+            time.sleep(self.latency * jitter)
+        return fail
+
+
+def make_services(latency: Dict[str, float], failure_rates: Dict[str, float], seed: int = 0) -> Dict[str, Service]:
+    """Service profiles by name from per-service latency and failure-rate settings."""
+    return {name: Service(latency.get(name, 0.0), failure_rates.get(name, 0.0), seed=seed + i)
+            for i, name in enumerate(sorted(set(latency) | set(failure_rates)))}
+
+
+class Corpus:
+    """
+    Synthetic domains mapped onto the recorded site fixtures.
+
+    Domain i uses fixture i mod len(fixtures), and addresses are spread over
+    the documentation ranges so that some domains share an IP, as they do
+    on real shared hosting.
+    """
+
+    def __init__(self, size: int, fixtures_dir: Path = FIXTURES_DIR):
+        with open(fixtures_dir / "sites.json") as f:
+            self.profiles = json.load(f)
+        for profile in self.profiles.values():
+            profile["body"] = (fixtures_dir / "sites" / profile["page"]).read_bytes()
+        names = sorted(self.profiles)
+        self.domains: List[str] = [f"site{i:05d}{DOMAIN_SUFFIX}" for i in range(size)]
+        self._by_domain = {domain: (i, names[i % len(names)]) for i, domain in enumerate(self.domains)}
+
+    def profile(self, domain: str) -> Optional[Dict]:
+        entry = self._by_domain.get(domain.lower().rstrip("."))
+        return self.profiles[entry[1]] if entry else None
+
+    def ipv4(self, domain: str) -> str:
+        i = self._by_domain[domain][0] % 500
+        return f"{'198.51.100' if i < 250 else '203.0.113'}.{i % 250 + 1}"
+
+    def ipv6(self, domain: str) -> str:
+        return f"2001:db8::{self._by_domain[domain][0] % 500 + 1:x}"
+
+    def dns_records(self, name: str) -> Optional[Dict[str, List[str]]]:
+        """Record values by type for ``name``, or None if it doesn't exist (NXDOMAIN)."""
+        name = name.lower().rstrip(".")
+        profile = self.profile(name)
+        if profile is None:
+            return None
+        records = {
+            "A": [self.ipv4(name)],
+            "MX": [f"10 mail.{name}."],
+            "NS": [ns + "." for ns in profile["name_servers"]],
+        }
+        if profile.get("ipv6"):
+            records["AAAA"] = [self.ipv6(name)]
+        if profile.get("cname"):
+            records["CNAME"] = [profile["cname"] + "."]
+        return records
+
+    def ip_info(self, ip: str) -> Dict:
+        """Stable fake ASN / org / country for an IP."""
+        h = int(hashlib.sha1(ip.encode()).hexdigest(), 16)
+        return {
+            "asn": 64500 + h % 20,
+            "org": _ORGS[h % len(_ORGS)],
+            "country": _COUNTRIES[h % len(_COUNTRIES)],
+        }
+
+
+# ---------------------------------------------------------------------------
+# TLS interception
+# ---------------------------------------------------------------------------
+
+class _CertificateAuthority:
+    """Throwaway CA issuing one leaf certificate per host (one wildcard for the corpus)."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        now = datetime.datetime.now(datetime.timezone.utc)
+        self._validity = (now - datetime.timedelta(days=1), now + datetime.timedelta(days=30))
+        self._key = ec.generate_private_key(ec.SECP256R1())
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "Enrichment Benchmark CA")])
+        self._cert = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(self._key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(self._validity[0])
+            .not_valid_after(self._validity[1])
+            .add_extension(x509.BasicConstraints(ca=True, path_length=0), critical=True)
+            .add_extension(x509.KeyUsage(
+                digital_signature=True, content_commitment=False, key_encipherment=False,
+                data_encipherment=False, key_agreement=False, key_cert_sign=True, crl_sign=True,
+                encipher_only=False, decipher_only=False), critical=True)
+            .add_extension(x509.SubjectKeyIdentifier.from_public_key(self._key.public_key()), critical=False)
+            .sign(self._key, hashes.SHA256())
+        )
+        self.ca_path = directory / "ca.pem"
+        self.ca_path.write_bytes(self._cert.public_bytes(serialization.Encoding.PEM))
+        # All leaves share one key; only the names differ
+        self._leaf_key = ec.generate_private_key(ec.SECP256R1())
+        self._key_path = directory / "leaf.key"
+        self._key_path.write_bytes(self._leaf_key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+        self._contexts: Dict[str, ssl.SSLContext] = {}
+        self._lock = threading.Lock()
+
+    def context_for(self, host: str) -> ssl.SSLContext:
+        name = "*" + DOMAIN_SUFFIX if host.endswith(DOMAIN_SUFFIX) else host
+        with self._lock:
+            context = self._contexts.get(name)
+            if context is None:
+                context = self._contexts[name] = self._issue(name)
+            return context
+
+    def _issue(self, name: str) -> ssl.SSLContext:
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, name)]))
+            .issuer_name(self._cert.subject)
+            .public_key(self._leaf_key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(self._validity[0])
+            .not_valid_after(self._validity[1])
+            .add_extension(x509.SubjectAlternativeName([x509.DNSName(name)]), critical=False)
+            .add_extension(x509.BasicConstraints(ca=False, path_length=None), critical=True)
+            .add_extension(x509.ExtendedKeyUsage([ExtendedKeyUsageOID.SERVER_AUTH]), critical=False)
+            .add_extension(x509.AuthorityKeyIdentifier.from_issuer_public_key(self._key.public_key()), critical=False)
+            .sign(self._key, hashes.SHA256())
+        )
+        cert_path = self.directory / f"{name.replace('*', '_')}.pem"
+        cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_path, self._key_path)
+        return context
+
+
+# ---------------------------------------------------------------------------
+# HTTP(S)
+# ---------------------------------------------------------------------------
+
+class _ProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Idle keep-alive connections are dropped after this many seconds
+    timeout = 30
+
+    def do_CONNECT(self):
+        host = self.path.rsplit(":", 1)[0].lower()
+        self.send_response(200, "Connection established")
+        self.end_headers()
+        self.close_connection = True
+        try:
+            tls = self.server.ca.context_for(host).wrap_socket(self.connection, server_side=True)
+        except (ssl.SSLError, OSError):
+            return
+        try:
+            # Serve the requests inside the tunnel; they carry a Host header
+            _ProxyHandler(tls, self.client_address, self.server)
+        except (ssl.SSLError, OSError):
+            pass
+        finally:
+            tls.close()
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def do_HEAD(self):
+        self._dispatch(head=True)
+
+    def _dispatch(self, head: bool = False):
+        url = urlsplit(self.path)
+        host = (url.hostname or self.headers.get("Host", "").rsplit(":", 1)[0]).lower()
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        response = self.server.internet.respond(self.command, host, url.path, parse_qs(url.query), body)
+        if response is None:
+            # Simulated connection failure
+            self.close_connection = True
+            return
+        status, headers, payload = response
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeInternet:
+    """
+    Forward proxy serving site fixtures and fake API responses.
+
+    Point clients at it with HTTP_PROXY/HTTPS_PROXY=``proxy_url`` and make
+    them trust ``ca_path``.
+    """
+
+    def __init__(self, corpus: Corpus, services: Dict[str, Service]):
+        self.corpus = corpus
+        self.services = services
+        self._tmp = tempfile.TemporaryDirectory(prefix="bench-ca-")
+        self._ca = _CertificateAuthority(Path(self._tmp.name))
+        self.ca_path = str(self._ca.ca_path)
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _ProxyHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.ca = self._ca
+        self._httpd.internet = self
+        self.proxy_url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._tmp.cleanup()
+
+    def respond(self, method: str, host: str, path: str, query: Dict, body: bytes):
+        """(status, headers, payload) for a request, or None to drop the connection."""
+        service = API_HOSTS.get(host, "site")
+        if self.services[service].simulate():
+            # APIs answer with an outage; sites just drop the connection
+            return (503, {"Content-Type": "text/plain"}, b"unavailable") if service != "site" else None
+
+        if service == "ip-api":
+            if path == "/batch" and method == "POST":
+                return self._json([self._ip_api(ip) for ip in json.loads(body or b"[]")])
+            return self._json(self._ip_api(path.rsplit("/", 1)[-1]))
+        if service == "iplocate":
+            ip = path.rsplit("/", 1)[-1]
+            info = self.corpus.ip_info(ip)
+            return self._json({"ip": ip, "country_code": info["country"],
+                               "asn": f"AS{info['asn']}", "org": info["org"]})
+        if service == "builtwith":
+            profile = self.corpus.profile((query.get("LOOKUP") or [""])[0])
+            if profile is None:
+                return self._json({"Results": [], "Errors": [{"Message": "No data"}]})
+            return self._json({"Results": [{"Result": {"Paths": [{"Technologies": profile["technologies"]}]}}]})
+
+        profile = self.corpus.profile(host)
+        if profile is None:
+            return 502, {"Content-Type": "text/plain"}, b"unknown host"
+        headers = {"Content-Type": "text/html; charset=UTF-8"}
+        headers.update(profile["headers"])
+        return 200, headers, profile["body"]
+
+    def _ip_api(self, ip: str) -> Dict:
+        info = self.corpus.ip_info(ip)
+        return {"status": "success", "query": ip, "as": f"AS{info['asn']} {info['org']}",
+                "isp": info["org"], "org": info["org"], "countryCode": info["country"]}
+
+    @staticmethod
+    def _json(data):
+        return 200, {"Content-Type": "application/json"}, json.dumps(data).encode()
+
+
+# ---------------------------------------------------------------------------
+# DNS
+# ---------------------------------------------------------------------------
+
+class _DNSHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        data, sock = self.request
+        try:
+            query = dns.message.from_wire(data)
+        except Exception:
+            return
+        response = dns.message.make_response(query)
+        server = self.server
+
+        if server.service.simulate():
+            response.set_rcode(dns.rcode.SERVFAIL)
+        elif query.question:
+            question = query.question[0]
+            records = server.corpus.dns_records(question.name.to_text())
+            if records is None:
+                response.set_rcode(dns.rcode.NXDOMAIN)
+            else:
+                values = records.get(dns.rdatatype.to_text(question.rdtype))
+                if values:
+                    response.answer.append(dns.rrset.from_text_list(
+                        question.name, 300, dns.rdataclass.IN, question.rdtype, values))
+        sock.sendto(response.to_wire(), self.client_address)
+
+
+class FakeDNS:
+    """UDP DNS server for the corpus; point DNS_NAMESERVERS=127.0.0.1 and DNS_PORT=``port`` at it."""
+
+    def __init__(self, corpus: Corpus, service: Service):
+        self._server = socketserver.ThreadingUDPServer(("127.0.0.1", 0), _DNSHandler)
+        self._server.daemon_threads = True
+        self._server.corpus = corpus
+        self._server.service = service
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# ---------------------------------------------------------------------------
+# WHOIS
+# ---------------------------------------------------------------------------
+
+def fake_whois(corpus: Corpus, service: Service):
+    """A whois.whois() replacement answering for the corpus domains."""
+    def whois(domain: str):
+        if service.simulate():
+            raise ConnectionResetError("simulated WHOIS failure")
+        profile = corpus.profile(domain)
+        if profile is None:
+            return None
+        h = int(hashlib.sha1(domain.encode()).hexdigest(), 16)
+        created = datetime.datetime(2010 + h % 14, 1 + h % 12, 1 + h % 28)
+        return SimpleNamespace(
+            registrar=["Bench Registrar, Inc.", "Example Names LLC", "Test Domains SA"][h % 3],
+            creation_date=created,
+            expiration_date=created.replace(year=2027 + h % 3),
+            updated_date=[created.replace(year=2024), created.replace(year=2025)],
+            name_servers=[ns.upper() for ns in profile["name_servers"]],
+            status=["clientTransferProhibited https://icann.org/epp#clientTransferProhibited"],
+        )
+    return whois
+
+
+# ---------------------------------------------------------------------------
+# Child process
+# ---------------------------------------------------------------------------
+
+def _serve(size: int, latency: Dict[str, float], failure_rates: Dict[str, float], seed: int, conn):
+    corpus = Corpus(size)
+    services = make_services(latency, failure_rates, seed)
+    with FakeInternet(corpus, services) as internet, FakeDNS(corpus, services["dns"]) as dns_server:
+        conn.send({"proxy_url": internet.proxy_url, "ca_path": internet.ca_path, "dns_port": dns_server.port})
+        try:
+            conn.recv()
+        except EOFError:
+            pass
+
+
+@contextmanager
+def stand_ins(size: int, latency: Dict[str, float], failure_rates: Dict[str, float], seed: int = 0):
+    """
+    Run FakeInternet and FakeDNS for a ``size``-domain corpus in a child process.
+
+    Yields:
+        Namespace with proxy_url, ca_path and dns_port
+    """
+    context = multiprocessing.get_context("spawn")
+    parent, child = context.Pipe()
+    process = context.Process(target=_serve, args=(size, latency, failure_rates, seed, child), daemon=True)
+    process.start()
+    try:
+        yield SimpleNamespace(**parent.recv())
+    finally:
+        try:
+            parent.send("stop")
+        except OSError:
+            pass
+        process.join(timeout=5)
+        if process.is_alive():
+            process.terminate()
@@ -0,0 +1,9 @@
+"""Gunicorn hooks for the web app (loaded by the Procfile/render.yaml start command)."""
+
+
+def post_worker_init(worker):
+    # Background job threads don't survive the fork from the --preload
+    # master, so each worker starts its own as soon as the app is loaded;
+    # jobs queued before a restart are picked up without waiting for a submit
+    from src.enrichment import job_queue
+    job_queue.start_workers()
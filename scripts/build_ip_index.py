@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Build the offline IP -> ASN/org/country index from an iptoasn.com dataset."""
+
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import requests
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.enrichment.ip_index import DEFAULT_INDEX_PATH, build_index
+
+IPTOASN_URL = "https://iptoasn.com/data/ip2asn-combined.tsv.gz"
+
+
+def download_dataset(url: str) -> str:
+    """Download the dataset to a temporary file and return its path."""
+    print(f"Downloading {url}...")
+    response = requests.get(url, stream=True, timeout=60)
+    response.raise_for_status()
+    fd, path = tempfile.mkstemp(suffix=".tsv.gz")
+    with os.fdopen(fd, "wb") as f:
+        for chunk in response.iter_content(chunk_size=1 << 20):
+            f.write(chunk)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline IP->ASN index")
+    parser.add_argument("tsv", nargs="?", help="iptoasn TSV (.tsv or .tsv.gz); downloaded if omitted")
+    parser.add_argument("--output", default=os.getenv("IP_ASN_DB", DEFAULT_INDEX_PATH),
+                        help="Index file to write (default: IP_ASN_DB or data/cache/ip2asn.idx)")
+    parser.add_argument("--url", default=IPTOASN_URL, help="Dataset URL used when no TSV is given")
+    args = parser.parse_args()
+
+    if args.output.endswith(".mmdb"):
+        parser.error("--output must not be an .mmdb file; MMDB databases are used as-is")
+
+    tsv_path = args.tsv or download_dataset(args.url)
+    try:
+        count = build_index(tsv_path, args.output)
+    finally:
+        if not args.tsv:
+            os.remove(tsv_path)
+
+    size_mb = os.path.getsize(args.output) / (1 << 20)
+    print(f"✓ Indexed {count:,} ranges into {args.output} ({size_mb:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
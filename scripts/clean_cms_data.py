@@ -13,57 +13,12 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.database.postgres_client import PostgresClient
 from src.database.neo4j_client import Neo4jClient
+# Shared with CMS detection, so cleaned data matches what enrichment stores
+from src.enrichment.tech_categories import is_valid_cms
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Valid CMS platforms (whitelist)
-VALID_CMS_PLATFORMS = [
-    "wordpress", "joomla", "drupal", "shopify", "squarespace", "wix",
-    "magento", "woocommerce", "prestashop", "opencart", "bigcommerce",
-    "ghost", "grav", "strapi", "contentful", "craft cms", "expressionengine",
-    "typo3", "concrete5", "silverstripe", "sitecore", "umbraco", "kentico",
-    "pimcore", "aem", "adobe experience manager", "liferay", "sharepoint",
-    "dnn", "dotnetnuke", "plone", "modx", "processwire", "textpattern",
-    "bolt", "pico", "kirby", "statamic", "wagtail", "django cms", "weebly",
-    "carrd", "webflow", "tumblr", "medium", "blogger", "blogspot"
-]
-
-# Technologies that are NOT CMS (should be removed from CMS field)
-NOT_CMS = [
-    "bootstrap", "jquery", "nginx", "apache", "cloudflare", "react", "vue",
-    "angular", "node.js", "php", "python", "ruby", "java", "javascript",
-    "typescript", "css", "html", "sass", "less", "webpack", "gulp",
-    "babel", "express", "django", "rails", "laravel", "flask", "spring",
-    "asp.net", "symfony", "fastly", "cloudfront", "akamai", "maxcdn",
-    "keycdn", "bunnycdn", "stackpath", "sucuri", "incapsula", "imperva",
-    # Additional non-CMS technologies found in data
-    "amazon s3", "s3", "jsdelivr", "polyfill", "fingerprintjs", "next.js",
-    "netlify", "statcounter", "google cloud", "amazon web services", "aws",
-    "iconicons", "cloud storage", "cdn", "hosting", "platform", "analytics",
-    "counter", "icons", "font awesome", "fontawesome"
-]
-
-
-def is_valid_cms(cms_value):
-    """Check if CMS value is a valid CMS platform."""
-    if not cms_value:
-        return True  # None/empty is valid
-    
-    cms_lower = str(cms_value).lower()
-    
-    # Check if it's explicitly NOT a CMS
-    if any(not_cms in cms_lower for not_cms in NOT_CMS):
-        return False
-    
-    # Check if it's a valid CMS
-    if any(valid_cms in cms_lower for valid_cms in VALID_CMS_PLATFORMS):
-        return True
-    
-    # If not in either list, be conservative and don't remove it
-    # (might be a valid CMS we haven't added to the list)
-    return True
-
 
 def clean_postgres_cms_data():
     """Clean incorrect CMS values from PostgreSQL."""
@@ -8,7 +8,6 @@ import os
 import sys
 import csv
 import json
-import requests
 from pathlib import Path
 from typing import List, Set
 from urllib.parse import urlparse
@@ -19,6 +18,8 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from dotenv import load_dotenv
 
+from src.enrichment import http_client
+
 load_dotenv()
 
 
@@ -40,7 +41,7 @@ def discover_from_google_search(query: str, num_results: int = 100) -> List[str]
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
         
-        response = requests.get(url, headers=headers, timeout=30)
+        response = http_client.get(url, headers=headers, timeout=30)
         
         if response.status_code == 200:
             # Extract domains from links
@@ -118,7 +119,7 @@ def discover_from_api(api_type: str = "urlscan") -> List[str]:
                 }
                 headers = {"API-Key": api_key}
                 
-                response = requests.get(url, params=params, headers=headers, timeout=30)
+                response = http_client.get(url, params=params, headers=headers, timeout=30)
                 
                 if response.status_code == 200:
                     data = response.json()
@@ -150,7 +151,7 @@ def discover_from_reddit(queries: List[str], limit: int = 100) -> List[str]:
                 "fields": "body"
             }
             
-            response = requests.get(url, params=params, timeout=30)
+            response = http_client.get(url, params=params, timeout=30)
             
             if response.status_code == 200:
                 data = response.json()
@@ -193,7 +194,7 @@ def discover_from_research_lists() -> List[str]:
         if source.startswith('http'):
             # Download and parse
             try:
-                response = requests.get(source, timeout=30)
+                response = http_client.get(source, timeout=30)
                 for line in response.text.split('\n'):
                     domain = line.strip()
                     if domain and '.' in domain:
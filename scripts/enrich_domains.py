@@ -2,15 +2,16 @@
 
 import sys
 import os
-import time
 # import pandas as pd  # Optional - use CSV module instead
-import csv
 from pathlib import Path
 
 # Add parent directory to path for imports
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.enrichment.enrichment_pipeline import enrich_domain
+from src.enrichment import metrics, run_ledger
+from src.enrichment.domain_import import read_domain_rows
+from src.enrichment.enrichment_pipeline import enrich_domain, enrich_domains
+from src.enrichment.scheduler import REFRESH_GROUPS, is_dead
 from src.database.postgres_client import PostgresClient
 
 
@@ -31,22 +32,9 @@ def normalize_provider_name(name):
 
 def read_domains_csv(csv_path: str) -> list:
     """Read domains from CSV file."""
-    domains = []
     try:
         with open(csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                # Support both 'domain' and 'url' column names
-                domain = row.get('domain') or row.get('url', '').strip()
-                if domain:
-                    # Remove http:// or https:// if present
-                    domain = domain.replace('http://', '').replace('https://', '').replace('www.', '').split('/')[0].strip()
-                    if domain:
-                        domains.append({
-                            'domain': domain,
-                            'source': row.get('source', 'Unknown'),
-                            'notes': row.get('notes', '')
-                        })
+            domains = [row for row in read_domain_rows(f, "csv") if row['domain']]
         
         if not domains:
             raise ValueError("CSV must contain a 'domain' column with at least one domain")
@@ -57,8 +45,23 @@ def read_domains_csv(csv_path: str) -> list:
         raise
 
 
-def process_domains(csv_path: str, limit: int = None):
-    """Process domains from CSV and enrich them."""
+def process_domains(csv_path: str, limit: int = None, workers: int = 4, resume: str = None,
+                    metrics_json: str = None):
+    """
+    Process domains from CSV and enrich them with ``workers`` concurrent workers.
+    
+    Progress is recorded in the run ledger. Passing a run ID as ``resume``
+    continues that run: stored domains are skipped, and interrupted or
+    failed domains only re-run the stages that didn't finish.
+    """
+    if resume:
+        run = run_ledger.get_run(resume)
+        if run is None:
+            print(f"Error: unknown run ID: {resume}")
+            return
+        csv_path = run["source"]
+        limit = run["options"].get("limit")
+    
     print(f"Reading domains from {csv_path}...")
     domains_data = read_domains_csv(csv_path)
     
@@ -79,45 +82,43 @@ def process_domains(csv_path: str, limit: int = None):
     
     postgres = PostgresClient()
     
+    rows_by_domain = {row["domain"].strip(): row for row in domains_data}
+    
+    if resume:
+        run_id = resume
+        pending = set(run_ledger.pending_domains(run_id))
+        print(f"Resuming run {run_id}: {len(rows_by_domain) - len(pending)} domains already done")
+        rows_by_domain = {domain: row for domain, row in rows_by_domain.items() if domain in pending}
+    else:
+        run_id = run_ledger.start_run(rows_by_domain, source=csv_path, options={"limit": limit})
+    print(f"Run ID: {run_id} (if interrupted, continue with --resume {run_id})")
+    
+    def enrich(domain):
+        # Stages that finished in an earlier attempt are reused, not re-run
+        return enrich_domain(domain, completed=run_ledger.completed_stages(run_id, domain),
+                             on_stage=run_ledger.stage_recorder(run_id, domain))
+    
     try:
-        ip_api_count = 0
-        last_minute_start = time.time()
+        print(f"Enriching with {workers} worker(s)")
         
-        for idx, row in enumerate(domains_data):
-            domain = row["domain"].strip()
+        completed = 0
+        for domain, enrichment_data, error in enrich_domains(rows_by_domain, concurrency=workers, enrich=enrich):
+            completed += 1
+            row = rows_by_domain[domain]
             source = row.get("source", "Unknown")
             notes = row.get("notes", "")
             
-            print(f"\n[{idx + 1}/{len(domains_data)}] Processing: {domain}")
-            
-            # Rate limiting for IP API (45 requests/minute)
-            current_time = time.time()
-            if current_time - last_minute_start >= 60:
-                # Reset counter every minute
-                ip_api_count = 0
-                last_minute_start = current_time
+            print(f"\n[{completed}/{len(rows_by_domain)}] Processed: {domain}")
             
-            if ip_api_count >= 45:
-                # Wait until next minute
-                wait_time = 60 - (current_time - last_minute_start) + 1
-                print(f"  ⏳ Rate limit reached (45/min). Waiting {wait_time:.0f} seconds...")
-                time.sleep(wait_time)
-                ip_api_count = 0
-                last_minute_start = time.time()
-            
-            # Enrich domain
-            enrichment_data = enrich_domain(domain)
-            
-            # Track IP API calls (increment if IP was found and looked up)
-            if enrichment_data.get("ip_address"):
-                ip_api_count += 1
-            
-            # Small delay to avoid overwhelming APIs
-            time.sleep(1)
+            if error:
+                print(f"  ✗ Enrichment failed: {error}")
+                run_ledger.finish_domain(run_id, domain, ok=False)
+                continue
             
             # Store in PostgreSQL
             domain_id = postgres.insert_domain(domain, source, notes)
             postgres.insert_enrichment(domain_id, enrichment_data)
+            postgres.save_refresh_state(domain_id, {group: is_dead(group, enrichment_data) for group in REFRESH_GROUPS})
             
             # Store in Neo4j (optional)
             if neo4j_available:
@@ -164,13 +165,28 @@ def process_domains(csv_path: str, limit: int = None):
                     print(f"  ⚠ Neo4j storage failed (continuing): {e}")
             
             print(f"  ✓ Stored in database")
+            
+            # Domains with failed stages stay pending, so a resume retries those stages
+            failed = run_ledger.failed_stages(run_id, domain)
+            if failed:
+                print(f"  ⚠️  Failed stages (retried on resume): {', '.join(failed)}")
+            run_ledger.finish_domain(run_id, domain, ok=not failed)
+        
+        run_ledger.finish_run(run_id)
     
     finally:
         if neo4j_available and neo4j:
             neo4j.close()
         postgres.close()
     
-    print(f"\n✓ Processing complete! Enriched {len(domains_data)} domains.")
+    print(f"\n✓ Processing complete! Enriched {len(rows_by_domain)} domains.")
+    
+    report = metrics.format_summary()
+    if report:
+        print(f"\n{report}")
+    if metrics_json:
+        metrics.write_summary(metrics_json)
+        print(f"\n✓ Metrics written to {metrics_json}")
 
 
 if __name__ == "__main__":
@@ -189,16 +205,37 @@ if __name__ == "__main__":
         default=None,
         help="Limit number of domains to process (for testing)"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of domains to enrich concurrently"
+    )
+    parser.add_argument(
+        "--resume",
+        type=str,
+        default=None,
+        metavar="RUN_ID",
+        help="Continue an interrupted run, skipping work that already finished"
+    )
+    parser.add_argument(
+        "--metrics-json",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Write per-stage and per-provider timings to this JSON file"
+    )
     
     args = parser.parse_args()
     
     # Check if CSV exists
-    if not os.path.exists(args.csv):
+    if not args.resume and not os.path.exists(args.csv):
         print(f"Error: CSV file not found: {args.csv}")
         print("Please create a CSV file with the following format:")
         print("domain,source,notes")
         print("example.com,NGO list,Known NCII site")
         sys.exit(1)
     
-    process_domains(args.csv, limit=args.limit)
+    process_domains(args.csv, limit=args.limit, workers=args.workers, resume=args.resume,
+                    metrics_json=args.metrics_json)
 
@@ -9,8 +9,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from src.database.postgres_client import PostgresClient
-from src.enrichment.enrichment_pipeline import enrich_domain
-import time
+from src.enrichment.enrichment_pipeline import enrich_domains
 
 # List of domains to enrich (from your previous input)
 DOMAINS = [
@@ -46,8 +45,8 @@ def normalize_provider_name(name):
     return name.strip()
 
 
-def populate_database():
-    """Populate Render database with domains."""
+def populate_database(workers: int = 4):
+    """Populate Render database with domains using ``workers`` concurrent workers."""
     print(f"Connecting to Render PostgreSQL database...")
     print(f"Host: {os.getenv('POSTGRES_HOST', 'localhost')}")
     
@@ -71,41 +70,22 @@ def populate_database():
         
         print(f"\nProcessing {len(domains_to_process)} new domains...")
         
-        ip_api_count = 0
-        last_minute_start = time.time()
-        
-        for idx, domain in enumerate(domains_to_process):
-            print(f"\n[{idx + 1}/{len(domains_to_process)}] Processing: {domain}")
-            
-            # Rate limiting for IP API (45 requests/minute)
-            current_time = time.time()
-            if current_time - last_minute_start >= 60:
-                ip_api_count = 0
-                last_minute_start = current_time
+        completed = 0
+        for domain, enrichment_data, error in enrich_domains(domains_to_process, concurrency=workers):
+            completed += 1
+            print(f"\n[{completed}/{len(domains_to_process)}] Processed: {domain}")
             
-            if ip_api_count >= 45:
-                wait_time = 60 - (current_time - last_minute_start) + 1
-                print(f"  ⏳ Rate limit reached. Waiting {wait_time:.0f} seconds...")
-                time.sleep(wait_time)
-                ip_api_count = 0
-                last_minute_start = time.time()
+            if error:
+                print(f"  ✗ Error: {error}")
+                continue
             
-            # Enrich domain
             try:
-                enrichment_data = enrich_domain(domain)
-                
-                if enrichment_data.get("ip_address"):
-                    ip_api_count += 1
-                
                 # Store in PostgreSQL
                 domain_id = postgres.insert_domain(domain, "Manual import", "")
                 postgres.insert_enrichment(domain_id, enrichment_data)
                 
                 print(f"  ✓ Stored in database")
                 
-                # Small delay to avoid overwhelming APIs
-                time.sleep(1)
-                
             except Exception as e:
                 print(f"  ✗ Error: {e}")
                 continue
@@ -123,6 +103,17 @@ def populate_database():
 
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Populate Render PostgreSQL database with domains")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of domains to enrich concurrently"
+    )
+    args = parser.parse_args()
+    
     # Set Render database connection if not already set
     if not os.getenv("POSTGRES_HOST"):
         print("Set Render PostgreSQL connection:")
@@ -134,5 +125,5 @@ if __name__ == "__main__":
         print("\nOr create a .env file with these values")
         sys.exit(1)
     
-    populate_database()
+    populate_database(workers=args.workers)
 
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Re-enrich only the stale parts of stored domains, most overdue first."""
+
+import sys
+from collections import Counter
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.enrichment import metrics
+from src.enrichment.enrichment_pipeline import enrich_domains
+from src.enrichment.scheduler import plan_refresh, refresh_domain
+from src.database.postgres_client import PostgresClient
+
+
+def refresh_stale(limit: int = None, workers: int = 4, dry_run: bool = False, metrics_json: str = None):
+    """Refresh up to ``limit`` stale domains with ``workers`` concurrent workers."""
+    postgres = PostgresClient()
+
+    try:
+        records = {record["domain"]: record for record in postgres.get_all_enriched_domains()}
+        plan = dict(plan_refresh(records.values(), postgres.get_refresh_state(), limit=limit))
+
+        group_counts = Counter(group for groups in plan.values() for group in groups)
+        print(f"{len(plan)} of {len(records)} domains are due "
+              f"({', '.join(f'{group}: {count}' for group, count in sorted(group_counts.items())) or 'nothing stale'})")
+
+        if dry_run or not plan:
+            return
+
+        domain_ids = postgres.get_domain_ids()
+
+        def refresh(domain):
+            return refresh_domain(domain, plan[domain], records[domain] if records[domain].get("enriched_at") else None)
+
+        print(f"Refreshing with {workers} worker(s)")
+        completed = 0
+        for domain, record, error in enrich_domains(plan, concurrency=workers, enrich=refresh):
+            completed += 1
+            print(f"\n[{completed}/{len(plan)}] Refreshed {', '.join(plan[domain])}: {domain}")
+
+            if error:
+                print(f"  ✗ Refresh failed: {error}")
+                continue
+
+            postgres.insert_enrichment(domain_ids[domain], record)
+            postgres.save_refresh_state(domain_ids[domain], record["refreshed_groups"])
+            dead = [group for group, is_dead in record["refreshed_groups"].items() if is_dead]
+            if dead:
+                print(f"  ⚠️  No answer for {', '.join(dead)}, backing off")
+            print(f"  ✓ Stored in database")
+    finally:
+        postgres.close()
+
+    report = metrics.format_summary()
+    if report:
+        print(f"\n{report}")
+    if metrics_json:
+        metrics.write_summary(metrics_json)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Re-enrich stale domains in priority order")
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="Refresh at most this many domains (most overdue first)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of domains to refresh concurrently (default: 4)"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only report what is due"
+    )
+    parser.add_argument(
+        "--metrics-json",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Write per-stage and per-provider timings to this JSON file"
+    )
+
+    args = parser.parse_args()
+    refresh_stale(limit=args.limit, workers=args.workers, dry_run=args.dry_run, metrics_json=args.metrics_json)
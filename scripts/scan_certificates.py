@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Scan TLS certificates for every stored domain and record shared certificates."""
+
+import sys
+import time
+from pathlib import Path
+
+# Add parent directory to path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.enrichment.ssl_enrichment import SCAN_CONCURRENCY, SCAN_TIMEOUT, scan_certificates
+from src.database.postgres_client import PostgresClient
+
+
+def scan_all(concurrency: int = SCAN_CONCURRENCY, timeout: float = SCAN_TIMEOUT, limit: int = None):
+    """Handshake with every domain in the database and store the certificates."""
+    pg = PostgresClient()
+    try:
+        domain_ids = pg.get_domain_ids()
+        domains = sorted(domain_ids)[:limit] if limit else sorted(domain_ids)
+        print(f"Scanning {len(domains)} domains ({concurrency} concurrent handshakes)...")
+
+        progress = {"done": 0}
+
+        def on_result(domain, cert):
+            progress["done"] += 1
+            if progress["done"] % 100 == 0:
+                print(f"  → {progress['done']}/{len(domains)} scanned")
+
+        start = time.time()
+        results = scan_certificates(domains, concurrency=concurrency, timeout=timeout, on_result=on_result)
+        elapsed = time.time() - start
+
+        certificates = {domain_ids[domain]: cert for domain, cert in results.items() if cert}
+        pg.save_certificates(certificates)
+
+        distinct = len({cert["fingerprint"] for cert in certificates.values()})
+        print(f"\n✓ {len(certificates)}/{len(domains)} domains presented a certificate "
+              f"({distinct} distinct) in {elapsed:.1f}s")
+
+        shared = pg.get_shared_certificates()
+        if shared:
+            print("\nCertificates shared by several domains:")
+            for cert in shared[:20]:
+                print(f"  {cert['fingerprint'][:16]}… {cert['subject'] or '?'} "
+                      f"(issuer: {cert['issuer'] or '?'}) - {len(cert['domains'])} domains: "
+                      f"{', '.join(cert['domains'][:5])}{' …' if len(cert['domains']) > 5 else ''}")
+    finally:
+        pg.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scan TLS certificates for all stored domains")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=SCAN_CONCURRENCY,
+        help=f"Handshakes in flight at once (default: {SCAN_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=SCAN_TIMEOUT,
+        help=f"Seconds allowed per host (default: {SCAN_TIMEOUT:g})"
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="Limit number of domains to scan (for testing)"
+    )
+
+    args = parser.parse_args()
+    scan_all(concurrency=args.concurrency, timeout=args.timeout, limit=args.limit)
@@ -0,0 +1 @@
+"""Aggregations over stored enrichment data."""
@@ -0,0 +1,266 @@
+"""
+Aggregations behind the dashboard endpoints.
+
+Pure functions over the rows returned by
+PostgresClient.get_all_enriched_domains(), so they can be tested and
+benchmarked without a database or a Flask request.
+"""
+
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# Service node types in the graph: (row field, node label, edge type)
+GRAPH_SERVICES = (
+    ("host_name", "Host", "HOSTED_ON"),
+    ("cdn", "CDN", "USES_CDN"),
+    ("cms", "CMS", "HAS_CMS"),
+    ("registrar", "Registrar", "REGISTERED_BY"),
+)
+
+# Columns checked for concentration by domain_analytics()
+OUTLIER_COLUMNS = {
+    'cms': 'CMS',
+    'cdn': 'CDN',
+    'payment_processor': 'Payment Processor',
+    'isp': 'ISP',
+    'host_name': 'Hosting Provider',
+    'registrar': 'Registrar'
+}
+
+
+def normalize_provider_name(name):
+    """Normalize provider names to merge variants (e.g., 'Cloudflare' and 'Cloudflare, Inc.')."""
+    if not name:
+        return name
+    name_lower = name.lower().strip()
+    # Cloudflare variants
+    if 'cloudflare' in name_lower:
+        return 'Cloudflare, Inc.'
+    # Namecheap variants
+    if 'namecheap' in name_lower:
+        return 'Namecheap, Inc.'
+    # Return original if no normalization needed
+    return name
+
+
+def build_service_graph(domains: List[Dict], top_n: int = 20) -> Dict:
+    """
+    Domain -> service graph, limited to the ``top_n`` most used services.
+
+    Args:
+        domains: Enriched domain rows
+
+    Returns:
+        {"nodes", "edges", "stats"} as served by /api/graph
+    """
+    domain_nodes = []
+    service_nodes = {}  # (type, name) -> node
+    edges = []
+    node_counter = 0
+
+    # Service frequency counters
+    service_counts = Counter()
+
+    for domain in domains:
+        domain_name = domain.get('domain', '')
+        if not domain_name:
+            continue
+
+        node_id = f"domain_{domain_name}"
+        domain_nodes.append({
+            "id": node_id,
+            "label": "Domain",
+            "node_type": "domain",
+            "properties": {
+                "domain": domain_name,
+                "name": domain_name
+            }
+        })
+
+        for field, label, edge_type in GRAPH_SERVICES:
+            name = domain.get(field)
+            if not name:
+                continue
+            key = (label.lower(), name)
+            service_counts[key] += 1
+            node = service_nodes.get(key)
+            if node is None:
+                node_counter += 1
+                properties = {"name": name}
+                if field == "host_name":
+                    properties.update({"ip": domain.get('ip_address', ''), "isp": domain.get('isp', '')})
+                node = service_nodes[key] = {
+                    "id": f"{label.lower()}_{node_counter}_{name}",
+                    "label": label,
+                    "node_type": "service",
+                    "properties": properties
+                }
+            edges.append({
+                "source": node_id,
+                "target": node["id"],
+                "type": edge_type
+            })
+
+    # Keep the top services, in the order they were first seen
+    top_services = service_counts.most_common(top_n)
+    top_service_keys = {key for key, _ in top_services}
+    filtered_service_nodes = [node for key, node in service_nodes.items() if key in top_service_keys]
+
+    # Edges always start at a domain node, so only the target needs checking
+    filtered_target_ids = {node["id"] for node in filtered_service_nodes}
+    filtered_edges = [edge for edge in edges if edge["target"] in filtered_target_ids]
+
+    return {
+        "nodes": domain_nodes + filtered_service_nodes,
+        "edges": filtered_edges,
+        "stats": {
+            "total_domains": len(domain_nodes),
+            "total_services": len(filtered_service_nodes),
+            "top_services": [name for (_, name), _ in top_services]
+        }
+    }
+
+
+def graph_stats(graph: Dict) -> Dict:
+    """Node and edge counts for /api/stats."""
+    nodes = graph.get("nodes", [])
+    edges = graph.get("edges", [])
+
+    # Count nodes by type
+    node_counts = {}
+    for node in nodes:
+        label = node.get("label", "Unknown")
+        node_counts[label] = node_counts.get(label, 0) + 1
+
+    return {
+        "total_nodes": len(nodes),
+        "total_edges": len(edges),
+        "node_types": node_counts
+    }
+
+
+def domain_analytics(domains: List[Dict]) -> Dict:
+    """
+    Concentration outliers and coverage statistics for /api/analytics.
+
+    A column is an outlier when one value covers 50%+ of all domains
+    (75%+ is high severity).
+    """
+    if not domains:
+        return {"outliers": [], "statistics": {}}
+
+    total = len(domains)
+    outliers = []
+
+    for col, label in OUTLIER_COLUMNS.items():
+        values = Counter(domain.get(col) for domain in domains)
+        values.pop(None, None)
+        values.pop('', None)
+        if not values:
+            continue
+
+        # Find most common value
+        value, count = values.most_common(1)[0]
+        percentage = (count / total) * 100
+
+        # If 50%+ use the same value, it's an outlier
+        if percentage >= 50:
+            outliers.append({
+                'column': col,
+                'label': label,
+                'value': value,
+                'count': count,
+                'percentage': round(percentage, 1),
+                'severity': 'high' if percentage >= 75 else 'medium'
+            })
+
+    stats = {
+        'total_domains': total,
+        'domains_with_cms': sum(1 for d in domains if d.get('cms')),
+        'domains_with_cdn': sum(1 for d in domains if d.get('cdn')),
+        'domains_with_payment': sum(1 for d in domains if d.get('payment_processor')),
+        'unique_isps': len(set(d.get('isp') for d in domains if d.get('isp'))),
+        'unique_hosts': len(set(d.get('host_name') for d in domains if d.get('host_name')))
+    }
+
+    return {
+        "outliers": outliers,
+        "statistics": stats
+    }
+
+
+def infrastructure_summary(domains: List[Dict]) -> Tuple[str, Dict]:
+    """
+    Provider concentration for the infrastructure analysis.
+
+    Returns:
+        (summary text for the analysis prompt, bad actors data)
+    """
+    total = len(domains)
+
+    # Count providers
+    isps = Counter()
+    hosts = Counter()
+    registrars = Counter()
+    cdns = Counter()
+    cms_platforms = Counter()
+    # Service providers: count unique domains per provider across all roles (CDN/Host/ISP)
+    service_provider_domains = {}
+
+    for domain in domains:
+        domain_id = domain.get('domain') or domain.get('id', '')
+
+        for field, counter, serves in (('isp', isps, True), ('host_name', hosts, True),
+                                       ('registrar', registrars, False), ('cdn', cdns, True)):
+            if domain.get(field):
+                provider = normalize_provider_name(domain[field])
+                counter[provider] += 1
+                if serves:
+                    service_provider_domains.setdefault(provider, set()).add(domain_id)
+
+        if domain.get('cms'):
+            cms_platforms[domain['cms']] += 1
+
+    # Convert service provider domain sets to counts
+    service_providers = Counter({provider: len(domain_set)
+                                 for provider, domain_set in service_provider_domains.items()})
+
+    # Top 10 per category, only entries with 5+ domains
+    def format_summary_items(items, limit=10):
+        return chr(10).join([f"- {name}: {count} domains ({round(count/total*100, 1)}%)"
+                             for name, count in items.most_common(limit) if count >= 5])
+
+    def filter_by_count(items, limit=10):
+        return [{"name": name, "count": count, "percentage": round(count/total*100, 1)}
+                for name, count in items.most_common(limit) if count >= 5]
+
+    summary = f"""
+Total domains analyzed: {total}
+
+Top ISPs:
+{format_summary_items(isps, 10)}
+
+Top Hosting Providers:
+{format_summary_items(hosts, 10)}
+
+Top Registrars:
+{format_summary_items(registrars, 10)}
+
+Top CDNs:
+{format_summary_items(cdns, 10)}
+
+Top Service Providers (CDN + Host + ISP combined):
+{format_summary_items(service_providers, 10)}
+
+"""
+
+    bad_actors_data = {
+        "top_isps": filter_by_count(isps, 10),
+        "top_hosts": filter_by_count(hosts, 10),
+        "top_registrars": filter_by_count(registrars, 10),
+        "top_cdns": filter_by_count(cdns, 10),
+        "top_service_providers": filter_by_count(service_providers, 10),
+        "top_cms": filter_by_count(cms_platforms, 10)
+    }
+
+    return summary, bad_actors_data
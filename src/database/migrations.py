@@ -0,0 +1,245 @@
+"""
+Versioned schema migrations for the PostgreSQL database.
+
+Applied versions are recorded in schema_migrations, so each migration runs
+once per database. The app applies pending migrations at startup, and every
+process checks the version once on its first PostgresClient; scripts can
+run them explicitly with scripts/migrate_database.py. To change the schema,
+append a migration - never edit one that has shipped.
+"""
+
+from typing import List, Tuple
+import psycopg2
+
+# (version, description, statements). Migration 1 is the schema as it was
+# created on connect before versioning, so it is a no-op on existing
+# databases; the ones after it replace the old one-off fix scripts.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, "Baseline schema", [
+        """
+        CREATE TABLE IF NOT EXISTS domains (
+            id SERIAL PRIMARY KEY,
+            domain VARCHAR(255) UNIQUE NOT NULL,
+            source VARCHAR(255),
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS analysis_cache (
+            id SERIAL PRIMARY KEY,
+            analysis_type VARCHAR(50) DEFAULT 'infrastructure',
+            analysis_data JSONB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(analysis_type)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS domain_enrichment (
+            id SERIAL PRIMARY KEY,
+            domain_id INTEGER REFERENCES domains(id),
+            ip_address VARCHAR(45),
+            ip_addresses JSONB,
+            ipv6_addresses JSONB,
+            host_name TEXT,
+            asn VARCHAR(50),
+            isp TEXT,
+            cdn TEXT,
+            cms TEXT,
+            payment_processor TEXT,
+            registrar TEXT,
+            creation_date DATE,
+            expiration_date TEXT,
+            updated_date TEXT,
+            name_servers JSONB,
+            mx_records JSONB,
+            whois_status TEXT,
+            web_server TEXT,
+            frameworks JSONB,
+            analytics JSONB,
+            languages JSONB,
+            tech_stack JSONB,
+            http_headers JSONB,
+            ssl_info JSONB,
+            whois_data JSONB,
+            dns_records JSONB,
+            ip_locations JSONB,
+            enriched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(domain_id)
+        )
+        """,
+        # TLS certificates, one row per distinct certificate (by SHA-256 fingerprint)
+        """
+        CREATE TABLE IF NOT EXISTS ssl_certificates (
+            fingerprint CHAR(64) PRIMARY KEY,
+            subject TEXT,
+            issuer TEXT,
+            sans JSONB,
+            not_before TIMESTAMP,
+            not_after TIMESTAMP,
+            serial_number TEXT,
+            first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        # Certificate each domain currently serves
+        """
+        CREATE TABLE IF NOT EXISTS domain_certificates (
+            domain_id INTEGER PRIMARY KEY REFERENCES domains(id),
+            fingerprint CHAR(64) NOT NULL REFERENCES ssl_certificates(fingerprint),
+            tls_version TEXT,
+            cipher TEXT,
+            scanned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE INDEX IF NOT EXISTS idx_domain_certificates_fingerprint
+        ON domain_certificates (fingerprint)
+        """,
+        # Per-group refresh bookkeeping for the staleness scheduler
+        """
+        CREATE TABLE IF NOT EXISTS domain_refresh_state (
+            domain_id INTEGER REFERENCES domains(id),
+            refresh_group VARCHAR(20) NOT NULL,
+            refreshed_at TIMESTAMP NOT NULL,
+            failures INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (domain_id, refresh_group)
+        )
+        """,
+    ]),
+    # Formerly scripts/migrate_database.py, for tables created before these columns existed
+    (2, "Enrichment columns added after the first release", [
+        f"ALTER TABLE domain_enrichment ADD COLUMN IF NOT EXISTS {column} {column_type}"
+        for column, column_type in [
+            ("ip_addresses", "JSONB"),
+            ("ipv6_addresses", "JSONB"),
+            ("expiration_date", "TEXT"),
+            ("updated_date", "TEXT"),
+            ("name_servers", "JSONB"),
+            ("mx_records", "JSONB"),
+            ("whois_status", "TEXT"),
+            ("web_server", "TEXT"),
+            ("frameworks", "JSONB"),
+            ("analytics", "JSONB"),
+            ("languages", "JSONB"),
+            ("tech_stack", "JSONB"),
+            ("http_headers", "JSONB"),
+            ("ssl_info", "JSONB"),
+            ("whois_data", "JSONB"),
+            ("dns_records", "JSONB"),
+            ("ip_locations", "JSONB"),
+        ]
+    ]),
+    # Formerly scripts/fix_column_sizes.py, fix_all_column_sizes.py and
+    # fix_all_columns_to_text.py: free-text fields were truncated as VARCHARs
+    (3, "Store free-text enrichment fields as TEXT", [
+        f"ALTER TABLE domain_enrichment ALTER COLUMN {column} TYPE TEXT"
+        for column in ["host_name", "isp", "cdn", "cms", "payment_processor", "registrar",
+                       "expiration_date", "updated_date", "whois_status", "web_server"]
+    ]),
+    # Country of the primary IP, which enrichment results carry alongside
+    # host_name/asn/isp; backfilled from ip_locations where it is known
+    (4, "Store the primary IP's country", [
+        "ALTER TABLE domain_enrichment ADD COLUMN IF NOT EXISTS country TEXT",
+        """
+        UPDATE domain_enrichment SET country = ip_locations -> ip_address ->> 'country'
+        WHERE country IS NULL AND ip_address IS NOT NULL
+        """,
+    ]),
+    # Stored domains are looked up case-insensitively
+    (5, "Index domain names case-insensitively", [
+        "CREATE INDEX IF NOT EXISTS idx_domains_lower_domain ON domains (lower(domain))",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# pg_advisory_lock key, so concurrent app instances don't migrate at the same time
+_LOCK_KEY = 0x5348_4144  # "SHAD"
+
+
+def current_version(conn) -> int:
+    """Newest migration applied to the database (0 if none)."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT to_regclass('schema_migrations') IS NOT NULL")
+    if cursor.fetchone()[0]:
+        cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+        version = cursor.fetchone()[0]
+    else:
+        version = 0
+    cursor.close()
+    conn.commit()
+    return version
+
+
+def migrate(conn) -> List[int]:
+    """
+    Apply pending migrations, each in its own transaction.
+
+    A database that is already current costs two catalog reads and no
+    locks, so this is cheap to call on every startup.
+
+    Returns:
+        Versions applied
+    """
+    if current_version(conn) >= LATEST_VERSION:
+        return []
+
+    applied = []
+    cursor = conn.cursor()
+    cursor.execute("SELECT pg_advisory_lock(%s)", (_LOCK_KEY,))
+    try:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        conn.commit()
+        # Another instance may have migrated while we waited for the lock
+        cursor.execute("SELECT version FROM schema_migrations")
+        done = {row[0] for row in cursor.fetchall()}
+        for version, description, statements in MIGRATIONS:
+            if version in done:
+                continue
+            print(f"  → Migration {version}: {description}")
+            for statement in statements:
+                cursor.execute(statement)
+            cursor.execute("INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                           (version, description))
+            conn.commit()
+            applied.append(version)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute("SELECT pg_advisory_unlock(%s)", (_LOCK_KEY,))
+        conn.commit()
+        cursor.close()
+    return applied
+
+
+def run() -> bool:
+    """
+    Migrate the configured database over a dedicated connection.
+
+    Returns False (after printing why) if the database can't be reached;
+    failing migrations raise.
+    """
+    from .postgres_client import connect_params
+
+    try:
+        conn = psycopg2.connect(connect_timeout=10, **connect_params())
+    except psycopg2.OperationalError as e:
+        print(f"  ⚠️  Database unavailable, schema migrations not run: {e}")
+        return False
+    try:
+        applied = migrate(conn)
+    finally:
+        conn.close()
+    if applied:
+        print(f"✓ Database schema migrated to version {LATEST_VERSION}")
+    return True
@@ -1,132 +1,175 @@
 """PostgreSQL client for storing enriched domain metadata."""
 
+import functools
 import os
 import json
+import threading
 import psycopg2
-from psycopg2.extras import RealDictCursor, Json
-from typing import Dict, List, Optional
+from psycopg2 import extensions
+from psycopg2.extras import RealDictCursor, Json, execute_values
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+from typing import Dict, List, Optional, Set, Tuple
 from dotenv import load_dotenv
 
+from . import migrations
+
 load_dotenv()
 
+# Connections each process may have open to the database; idle ones are kept
+# for the next PostgresClient. Should cover web threads plus job workers.
+POOL_SIZE = int(os.getenv("POSTGRES_POOL_SIZE", "8"))
+# Seconds to wait for a free connection when all are in use
+POOL_TIMEOUT = float(os.getenv("POSTGRES_POOL_TIMEOUT", "30"))
+
+
+class _ConnectionPool(ThreadedConnectionPool):
+    """
+    Thread-safe pool that connects lazily, keeps every returned connection,
+    and makes callers wait (rather than fail) when all connections are in use.
+    """
+
+    def __init__(self, size: int, **connect_params):
+        self._slots = threading.BoundedSemaphore(size)
+        # minconn=0 opens nothing up front; raising it afterwards keeps up to
+        # ``size`` idle connections instead of closing those above minconn
+        super().__init__(0, size, **connect_params)
+        self.minconn = size
+
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=POOL_TIMEOUT):
+            raise PoolError(f"no database connection free after {POOL_TIMEOUT:.0f}s")
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+    def discard_idle(self):
+        """Close the idle connections (after one of them turned out to be dead)."""
+        with self._lock:
+            idle, self._pool = self._pool, []
+        for conn in idle:
+            conn.close()
+
+
+_pools: Dict[Tuple, _ConnectionPool] = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+# Pools inherited from the parent of a fork. The parent still uses their
+# sockets, so they are kept referenced here and never closed by this process.
+_inherited_pools = []
+# Databases whose schema version this process has already checked
+_schema_ready: Set[Tuple] = set()
+
+
+def connect_params() -> Dict:
+    """psycopg2.connect() arguments for the configured database."""
+    # Render PostgreSQL requires SSL connections
+    connect_params = {
+        "host": os.getenv("POSTGRES_HOST", "localhost"),
+        "port": os.getenv("POSTGRES_PORT", "5432"),
+        "user": os.getenv("POSTGRES_USER", "ncii_user"),
+        "password": os.getenv("POSTGRES_PASSWORD", "ncii123password"),
+        "database": os.getenv("POSTGRES_DB", "ncii_infra")
+    }
+    # Add SSL for Render PostgreSQL (required for external connections)
+    if os.getenv("POSTGRES_HOST", "").endswith(".render.com"):
+        connect_params["sslmode"] = "require"
+    return connect_params
+
+
+def _pool(key: Tuple) -> _ConnectionPool:
+    """This process's pool for the connection parameters ``key``."""
+    global _pools, _pools_pid
+    if _pools_pid != os.getpid():
+        with _pools_lock:
+            if _pools_pid != os.getpid():
+                if _pools:
+                    _inherited_pools.append(_pools)
+                _pools = {}
+                _pools_pid = os.getpid()
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = _ConnectionPool(POOL_SIZE, **dict(key))
+    return pool
+
+
+def _retry_if_disconnected(method):
+    """
+    Run ``method`` once more on a fresh connection if the connection was dead.
+
+    Pooled connections aren't pinged before use: one that dropped while idle
+    fails on its first statement, and the call is retried. The server rolls
+    back whatever the dead connection had not committed, and the writes are
+    upserts, so running the method again is safe.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            if not self.conn.closed:
+                raise
+            self._reconnect()
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class PostgresClient:
-    """Client for interacting with PostgreSQL database."""
+    """
+    Client for interacting with PostgreSQL database.
+    
+    Each client borrows a connection from a process-wide pool; close()
+    returns it. Clients are cheap, but not thread-safe: use one per thread
+    (or per request).
+    """
     
     def __init__(self):
-        # Render PostgreSQL requires SSL connections
-        connect_params = {
-            "host": os.getenv("POSTGRES_HOST", "localhost"),
-            "port": os.getenv("POSTGRES_PORT", "5432"),
-            "user": os.getenv("POSTGRES_USER", "ncii_user"),
-            "password": os.getenv("POSTGRES_PASSWORD", "ncii123password"),
-            "database": os.getenv("POSTGRES_DB", "ncii_infra")
-        }
-        # Add SSL for Render PostgreSQL (required for external connections)
-        if os.getenv("POSTGRES_HOST", "").endswith(".render.com"):
-            connect_params["sslmode"] = "require"
-        
-        self.conn = psycopg2.connect(**connect_params)
-        self._create_tables()
+        self._pool_key = tuple(sorted(connect_params().items()))
+        self.conn = _pool(self._pool_key).getconn()
+        if self._pool_key not in _schema_ready:
+            try:
+                migrations.migrate(self.conn)
+            except Exception:
+                self.close()
+                raise
+            _schema_ready.add(self._pool_key)
     
     def close(self):
-        """Close the database connection."""
-        self.conn.close()
-    
-    def _ensure_connection(self):
-        """Ensure database connection is alive, reconnect if needed."""
-        try:
-            # Try a simple query to check if connection is alive
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT 1")
-            cursor.close()
-        except (psycopg2.OperationalError, psycopg2.InterfaceError, AttributeError):
-            # Connection is dead, reconnect
-            print("  ⚠️  Database connection lost, reconnecting...")
+        """Return the connection to the pool, rolling back anything uncommitted."""
+        if self.conn is None:
+            return
+        conn, self.conn = self.conn, None
+        broken = bool(conn.closed)
+        if not broken and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
             try:
-                self.conn.close()
-            except:
-                pass
-            # Render PostgreSQL requires SSL connections
-            connect_params = {
-                "host": os.getenv("POSTGRES_HOST", "localhost"),
-                "port": os.getenv("POSTGRES_PORT", "5432"),
-                "user": os.getenv("POSTGRES_USER", "ncii_user"),
-                "password": os.getenv("POSTGRES_PASSWORD", "ncii123password"),
-                "database": os.getenv("POSTGRES_DB", "ncii_infra")
-            }
-            # Add SSL for Render PostgreSQL (required for external connections)
-            if os.getenv("POSTGRES_HOST", "").endswith(".render.com"):
-                connect_params["sslmode"] = "require"
-            
-            self.conn = psycopg2.connect(**connect_params)
+                conn.rollback()
+            except psycopg2.Error:
+                broken = True
+        _pool(self._pool_key).putconn(conn, close=broken)
     
-    def _create_tables(self):
-        """Create necessary tables if they don't exist."""
-        cursor = self.conn.cursor()
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS domains (
-                id SERIAL PRIMARY KEY,
-                domain VARCHAR(255) UNIQUE NOT NULL,
-                source VARCHAR(255),
-                notes TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS analysis_cache (
-                id SERIAL PRIMARY KEY,
-                analysis_type VARCHAR(50) DEFAULT 'infrastructure',
-                analysis_data JSONB NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(analysis_type)
-            )
-        """)
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS domain_enrichment (
-                id SERIAL PRIMARY KEY,
-                domain_id INTEGER REFERENCES domains(id),
-                ip_address VARCHAR(45),
-                ip_addresses JSONB,
-                ipv6_addresses JSONB,
-                host_name TEXT,
-                asn VARCHAR(50),
-                isp TEXT,
-                cdn TEXT,
-                cms TEXT,
-                payment_processor TEXT,
-                registrar TEXT,
-                creation_date DATE,
-                expiration_date TEXT,
-                updated_date TEXT,
-                name_servers JSONB,
-                mx_records JSONB,
-                whois_status TEXT,
-                web_server TEXT,
-                frameworks JSONB,
-                analytics JSONB,
-                languages JSONB,
-                tech_stack JSONB,
-                http_headers JSONB,
-                ssl_info JSONB,
-                whois_data JSONB,
-                dns_records JSONB,
-                enriched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(domain_id)
-            )
-        """)
-        
-        self.conn.commit()
-        cursor.close()
+    def _reconnect(self):
+        """Replace a dead connection with a new one."""
+        print("  ⚠️  Database connection lost, reconnecting...")
+        pool = _pool(self._pool_key)
+        pool.putconn(self.conn, close=True)
+        self.conn = None
+        # Idle connections opened before the drop are most likely dead too
+        pool.discard_idle()
+        self.conn = pool.getconn()
     
+    @_retry_if_disconnected
     def insert_domain(self, domain: str, source: str, notes: str = "") -> int:
         """Insert or update a domain and return its ID."""
-        self._ensure_connection()
         cursor = self.conn.cursor()
         
         cursor.execute("""
@@ -145,9 +188,9 @@ class PostgresClient:
         cursor.close()
         return domain_id
     
+    @_retry_if_disconnected
     def insert_enrichment(self, domain_id: int, enrichment_data: Dict):
         """Insert or update enrichment data for a domain."""
-        self._ensure_connection()
         cursor = self.conn.cursor()
         
         # Convert dict/list fields to JSON for PostgreSQL
@@ -158,12 +201,12 @@ class PostgresClient:
         
         cursor.execute("""
             INSERT INTO domain_enrichment (
-                domain_id, ip_address, ip_addresses, ipv6_addresses, host_name, asn, isp,
+                domain_id, ip_address, ip_addresses, ipv6_addresses, host_name, asn, isp, country,
                 cdn, cms, payment_processor, registrar, creation_date, expiration_date, updated_date,
                 name_servers, mx_records, whois_status, web_server, frameworks, analytics, languages,
-                tech_stack, http_headers, ssl_info, whois_data, dns_records
+                tech_stack, http_headers, ssl_info, whois_data, dns_records, ip_locations
             )
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             ON CONFLICT (domain_id)
             DO UPDATE SET
                 ip_address = EXCLUDED.ip_address,
@@ -172,6 +215,7 @@ class PostgresClient:
                 host_name = EXCLUDED.host_name,
                 asn = EXCLUDED.asn,
                 isp = EXCLUDED.isp,
+                country = EXCLUDED.country,
                 cdn = EXCLUDED.cdn,
                 cms = EXCLUDED.cms,
                 payment_processor = EXCLUDED.payment_processor,
@@ -191,6 +235,7 @@ class PostgresClient:
                 ssl_info = EXCLUDED.ssl_info,
                 whois_data = EXCLUDED.whois_data,
                 dns_records = EXCLUDED.dns_records,
+                ip_locations = EXCLUDED.ip_locations,
                 enriched_at = CURRENT_TIMESTAMP
         """, (
             domain_id,
@@ -200,6 +245,7 @@ class PostgresClient:
             enrichment_data.get("host_name"),
             enrichment_data.get("asn"),
             enrichment_data.get("isp"),
+            enrichment_data.get("country"),
             enrichment_data.get("cdn"),
             enrichment_data.get("cms"),
             enrichment_data.get("payment_processor"),
@@ -218,18 +264,15 @@ class PostgresClient:
             to_json(enrichment_data.get("http_headers")),
             to_json(enrichment_data.get("ssl_info")),
             to_json(enrichment_data.get("whois_data")),
-            to_json(enrichment_data.get("dns_records"))
+            to_json(enrichment_data.get("dns_records")),
+            to_json(enrichment_data.get("ip_locations"))
         ))
         
         self.conn.commit()
         cursor.close()
     
-    def get_all_enriched_domains(self) -> List[Dict]:
-        """Get all domains with their enrichment data."""
-        cursor = self.conn.cursor(cursor_factory=RealDictCursor)
-        
-        cursor.execute("""
-            SELECT 
+    # Columns returned for an enriched domain (domains joined to domain_enrichment)
+    _ENRICHED_DOMAIN_COLUMNS = """
                 d.domain,
                 d.source,
                 d.notes,
@@ -239,6 +282,7 @@ class PostgresClient:
                 de.host_name,
                 de.asn,
                 de.isp,
+                de.country,
                 de.cdn,
                 de.cms,
                 de.payment_processor,
@@ -258,7 +302,42 @@ class PostgresClient:
                 de.ssl_info,
                 de.whois_data,
                 de.dns_records,
+                de.ip_locations,
                 de.enriched_at
+    """
+    
+    @staticmethod
+    def _parse_enriched_row(row) -> Dict:
+        """Convert a result row to a dict and parse JSONB fields."""
+        domain_dict = dict(row)
+        
+        # Parse JSONB fields that might be strings or already dicts
+        jsonb_fields = [
+            'ip_addresses', 'ipv6_addresses', 'name_servers', 'mx_records',
+            'frameworks', 'analytics', 'languages', 'tech_stack',
+            'http_headers', 'ssl_info', 'whois_data', 'dns_records', 'ip_locations'
+        ]
+        
+        for field in jsonb_fields:
+            value = domain_dict.get(field)
+            if value is not None:
+                # If it's a string, try to parse as JSON
+                if isinstance(value, str):
+                    try:
+                        domain_dict[field] = json.loads(value)
+                    except (json.JSONDecodeError, TypeError):
+                        pass  # Keep as string if not valid JSON
+                # If it's already a dict/list, keep it
+        
+        return domain_dict
+    
+    @_retry_if_disconnected
+    def get_all_enriched_domains(self) -> List[Dict]:
+        """Get all domains with their enrichment data."""
+        cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute(f"""
+            SELECT {self._ENRICHED_DOMAIN_COLUMNS}
             FROM domains d
             LEFT JOIN domain_enrichment de ON d.id = de.domain_id
             ORDER BY d.domain
@@ -268,33 +347,164 @@ class PostgresClient:
         cursor.close()
         
         # Convert results to dicts and parse JSONB fields
-        domains = []
-        for row in results:
-            domain_dict = dict(row)
-            
-            # Parse JSONB fields that might be strings or already dicts
-            jsonb_fields = [
-                'ip_addresses', 'ipv6_addresses', 'name_servers', 'mx_records',
-                'frameworks', 'analytics', 'languages', 'tech_stack',
-                'http_headers', 'ssl_info', 'whois_data', 'dns_records'
-            ]
-            
-            for field in jsonb_fields:
-                value = domain_dict.get(field)
-                if value is not None:
-                    # If it's a string, try to parse as JSON
-                    if isinstance(value, str):
-                        try:
-                            import json
-                            domain_dict[field] = json.loads(value)
-                        except (json.JSONDecodeError, TypeError):
-                            pass  # Keep as string if not valid JSON
-                    # If it's already a dict/list, keep it
-            
-            domains.append(domain_dict)
-        
-        return domains
+        return [self._parse_enriched_row(row) for row in results]
+    
+    @_retry_if_disconnected
+    def get_enriched_domain(self, domain: str) -> Optional[Dict]:
+        """
+        Get one domain with its enrichment data, or None if it isn't stored.
+        
+        The name is compared case-insensitively, as in get_existing_domains().
+        """
+        cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute(f"""
+            SELECT {self._ENRICHED_DOMAIN_COLUMNS}
+            FROM domains d
+            LEFT JOIN domain_enrichment de ON d.id = de.domain_id
+            WHERE lower(d.domain) = %s
+            ORDER BY d.id
+            LIMIT 1
+        """, (domain.lower(),))
+        
+        row = cursor.fetchone()
+        cursor.close()
+        
+        return self._parse_enriched_row(row) if row else None
+    
+    @_retry_if_disconnected
+    def get_existing_domains(self, domains: List[str]) -> Set[str]:
+        """
+        Which of ``domains`` are already stored, in one query.
+        
+        Names are compared case-insensitively, as uploads dedupe them;
+        the matches are returned as spelled in ``domains``.
+        """
+        if not domains:
+            return set()
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT lower(domain) FROM domains WHERE lower(domain) = ANY(%s)",
+                       (list({domain.lower() for domain in domains}),))
+        stored = {row[0] for row in cursor.fetchall()}
+        cursor.close()
+        return {domain for domain in domains if domain.lower() in stored}
+    
+    @_retry_if_disconnected
+    def get_domain_ids(self) -> Dict[str, int]:
+        """Map every stored domain name to its ID."""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT domain, id FROM domains")
+        domain_ids = dict(cursor.fetchall())
+        cursor.close()
+        return domain_ids
+    
+    @_retry_if_disconnected
+    def save_certificates(self, certificates: Dict[int, Dict]):
+        """
+        Store scanned certificates, keyed by domain ID.
+        
+        Each distinct certificate is stored once, however many domains
+        serve it; domain_certificates points every domain at its current one.
+        
+        Args:
+            certificates: {domain_id: ssl_enrichment.scan_certificate() result}
+        """
+        if not certificates:
+            return
+        cursor = self.conn.cursor()
+        
+        unique_certs = {cert["fingerprint"]: cert for cert in certificates.values()}
+        execute_values(cursor, """
+            INSERT INTO ssl_certificates (fingerprint, subject, issuer, sans, not_before, not_after, serial_number)
+            VALUES %s
+            ON CONFLICT (fingerprint)
+            DO UPDATE SET last_seen = CURRENT_TIMESTAMP
+        """, [
+            (fp, cert.get("subject"), cert.get("issuer"), Json(cert.get("sans") or []),
+             cert.get("not_before"), cert.get("not_after"), cert.get("serial_number"))
+            for fp, cert in unique_certs.items()
+        ])
+        
+        execute_values(cursor, """
+            INSERT INTO domain_certificates (domain_id, fingerprint, tls_version, cipher)
+            VALUES %s
+            ON CONFLICT (domain_id)
+            DO UPDATE SET
+                fingerprint = EXCLUDED.fingerprint,
+                tls_version = EXCLUDED.tls_version,
+                cipher = EXCLUDED.cipher,
+                scanned_at = CURRENT_TIMESTAMP
+        """, [
+            (domain_id, cert["fingerprint"], cert.get("tls_version"), cert.get("cipher"))
+            for domain_id, cert in certificates.items()
+        ])
+        
+        self.conn.commit()
+        cursor.close()
+    
+    @_retry_if_disconnected
+    def get_shared_certificates(self, min_domains: int = 2) -> List[Dict]:
+        """Certificates served by at least ``min_domains`` domains, most shared first."""
+        cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute("""
+            SELECT c.fingerprint, c.subject, c.issuer, c.not_after,
+                   array_agg(d.domain ORDER BY d.domain) AS domains
+            FROM ssl_certificates c
+            JOIN domain_certificates dc ON dc.fingerprint = c.fingerprint
+            JOIN domains d ON d.id = dc.domain_id
+            GROUP BY c.fingerprint
+            HAVING COUNT(*) >= %s
+            ORDER BY COUNT(*) DESC
+        """, (min_domains,))
+        
+        results = [dict(row) for row in cursor.fetchall()]
+        cursor.close()
+        return results
+    
+    @_retry_if_disconnected
+    def get_refresh_state(self) -> Dict[str, Dict[str, Dict]]:
+        """Refresh history per domain: {domain: {group: {"refreshed_at", "failures"}}}."""
+        cursor = self.conn.cursor(cursor_factory=RealDictCursor)
+        
+        cursor.execute("""
+            SELECT d.domain, s.refresh_group, s.refreshed_at, s.failures
+            FROM domain_refresh_state s
+            JOIN domains d ON d.id = s.domain_id
+        """)
+        
+        states = {}
+        for row in cursor.fetchall():
+            states.setdefault(row["domain"], {})[row["refresh_group"]] = {
+                "refreshed_at": row["refreshed_at"],
+                "failures": row["failures"],
+            }
+        cursor.close()
+        return states
+    
+    @_retry_if_disconnected
+    def save_refresh_state(self, domain_id: int, groups: Dict[str, bool]):
+        """
+        Record a refresh of ``groups`` ({group: came back dead?}) for a domain.
+        
+        Dead results increment the group's failure count; live ones reset it.
+        """
+        cursor = self.conn.cursor()
+        
+        for group, dead in groups.items():
+            cursor.execute("""
+                INSERT INTO domain_refresh_state (domain_id, refresh_group, refreshed_at, failures)
+                VALUES (%s, %s, CURRENT_TIMESTAMP, %s)
+                ON CONFLICT (domain_id, refresh_group)
+                DO UPDATE SET
+                    refreshed_at = EXCLUDED.refreshed_at,
+                    failures = CASE WHEN %s THEN domain_refresh_state.failures + 1 ELSE 0 END
+            """, (domain_id, group, int(dead), dead))
+        
+        self.conn.commit()
+        cursor.close()
     
+    @_retry_if_disconnected
     def save_analysis(self, analysis_data: Dict, analysis_type: str = 'infrastructure'):
         """Save analysis data to cache."""
         cursor = self.conn.cursor()
@@ -311,6 +521,7 @@ class PostgresClient:
         self.conn.commit()
         cursor.close()
     
+    @_retry_if_disconnected
     def delete_analysis(self, analysis_type: str = 'infrastructure'):
         """Delete cached analysis data."""
         cursor = self.conn.cursor()
@@ -321,6 +532,7 @@ class PostgresClient:
         self.conn.commit()
         cursor.close()
     
+    @_retry_if_disconnected
     def get_analysis(self, analysis_type: str = 'infrastructure') -> Optional[Dict]:
         """Get cached analysis data."""
         cursor = self.conn.cursor(cursor_factory=RealDictCursor)
@@ -0,0 +1,203 @@
+"""Persistent TTL cache for network lookups (WHOIS, DNS, IP geo, tech stack)."""
+
+import contextlib
+import functools
+import json
+import os
+import sqlite3
+import time
+from contextvars import ContextVar
+from datetime import date, datetime
+from typing import Any, Callable, Dict, Optional
+from dotenv import load_dotenv
+
+from . import local_store
+
+load_dotenv()
+
+# Seconds a successful lookup stays fresh, per source.
+# Override with CACHE_TTL_<SOURCE>, e.g. CACHE_TTL_DNS=600
+SOURCE_TTLS: Dict[str, float] = {
+    "whois": 3 * 86400,        # registration data changes rarely
+    "dns": 15 * 60,
+    "ip_geo": 7 * 86400,
+    "tech_stack": 86400,
+}
+
+# Seconds an empty/failed lookup is cached, so dead domains aren't retried on every call
+NEGATIVE_TTL = float(os.getenv("CACHE_NEGATIVE_TTL", "600"))
+
+# Upper bound on stored entries; least recently used entries are evicted past it
+MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "50000"))
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS cache_entries (
+        source TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        negative INTEGER NOT NULL DEFAULT 0,
+        expires_at REAL NOT NULL,
+        accessed_at REAL NOT NULL,
+        PRIMARY KEY (source, key)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_cache_entries_accessed ON cache_entries (accessed_at)",
+]
+
+# Evict at most once per this many writes (per process) to keep writes cheap
+_EVICT_EVERY = 100
+_writes_since_evict = 0
+
+# Set while lookups must go to the network (forced enrichments); a context
+# variable so it follows the work into asyncio.to_thread() stage threads
+_refreshing: ContextVar[bool] = ContextVar("cache_refreshing", default=False)
+
+
+def enabled() -> bool:
+    """False when CACHE_DISABLED is set."""
+    return os.getenv("CACHE_DISABLED", "").lower() not in ("1", "true", "yes")
+
+
+def refreshing() -> bool:
+    """True inside refresh(): cached values must not be read."""
+    return _refreshing.get()
+
+
+@contextlib.contextmanager
+def refresh(active: bool = True):
+    """
+    Skip cache reads for lookups made in this context (and in threads
+    started from it with asyncio.to_thread). Fresh values are still
+    written, so later unforced lookups see them.
+    """
+    token = _refreshing.set(active or _refreshing.get())
+    try:
+        yield
+    finally:
+        _refreshing.reset(token)
+
+
+def _connection() -> sqlite3.Connection:
+    return local_store.connect(os.getenv("CACHE_DB", local_store.default_path("lookups.sqlite3")), _SCHEMA)
+
+
+def ttl_for(source: str) -> float:
+    """Positive TTL for ``source`` in seconds."""
+    override = os.getenv(f"CACHE_TTL_{source.upper()}")
+    return float(override) if override else SOURCE_TTLS.get(source, 3600)
+
+
+def _encode_default(value: Any):
+    # Lookup results carry dates (e.g. WHOIS creation_date); tag them so they round-trip
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    return str(value)
+
+
+def _decode_hook(obj: Dict):
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__date__" in obj:
+        return date.fromisoformat(obj["__date__"])
+    return obj
+
+
+def dumps(value: Any) -> str:
+    """JSON-encode a lookup result, preserving date and datetime values."""
+    return json.dumps(value, default=_encode_default)
+
+
+def loads(text: str) -> Any:
+    """Inverse of dumps()."""
+    return json.loads(text, object_hook=_decode_hook)
+
+
+def get(source: str, key: str) -> Optional[Any]:
+    """Return the cached value for (source, key), or None if missing or expired."""
+    try:
+        conn = _connection()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value FROM cache_entries WHERE source = ? AND key = ? AND expires_at > ?",
+            (source, key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE cache_entries SET accessed_at = ? WHERE source = ? AND key = ?",
+            (now, source, key)
+        )
+        return loads(row[0])
+    except (sqlite3.Error, ValueError) as e:
+        print(f"  ⚠️  Cache read failed for {source}:{key}: {e}")
+        return None
+
+
+def put(source: str, key: str, value: Any, negative: bool = False):
+    """Store a value; negative (empty/failed) results get the short NEGATIVE_TTL."""
+    global _writes_since_evict
+    try:
+        conn = _connection()
+        now = time.time()
+        ttl = NEGATIVE_TTL if negative else ttl_for(source)
+        conn.execute("""
+            INSERT OR REPLACE INTO cache_entries (source, key, value, negative, expires_at, accessed_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (source, key, dumps(value), int(negative), now + ttl, now))
+
+        _writes_since_evict += 1
+        if _writes_since_evict >= _EVICT_EVERY:
+            _writes_since_evict = 0
+            evict(conn)
+    except sqlite3.Error as e:
+        print(f"  ⚠️  Cache write failed for {source}:{key}: {e}")
+
+
+def evict(conn: Optional[sqlite3.Connection] = None):
+    """Drop expired entries, then the least recently used ones beyond MAX_ENTRIES."""
+    conn = conn or _connection()
+    conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+    conn.execute("""
+        DELETE FROM cache_entries WHERE rowid IN (
+            SELECT rowid FROM cache_entries
+            ORDER BY accessed_at DESC
+            LIMIT -1 OFFSET ?
+        )
+    """, (MAX_ENTRIES,))
+
+
+def cached(source: str, is_negative: Callable[[Any], bool] = lambda value: not value):
+    """
+    Cache a lookup function keyed on its first argument.
+
+    ``is_negative`` decides whether a result counts as a failure (the
+    lookups here swallow errors and return empty results), in which case it
+    is cached for NEGATIVE_TTL instead of the source TTL. The undecorated
+    function stays available as ``func.uncached`` and the predicate as
+    ``func.is_negative``. Inside refresh() the
+    lookup always runs and overwrites the cached value. Set CACHE_DISABLED=1
+    to bypass the cache entirely.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(key, *args, **kwargs):
+            if not enabled():
+                return func(key, *args, **kwargs)
+
+            cache_key = str(key).lower()
+            value = None if refreshing() else get(source, cache_key)
+            if value is not None:
+                return value
+
+            value = func(key, *args, **kwargs)
+            if value is not None:
+                put(source, cache_key, value, negative=is_negative(value))
+            return value
+
+        wrapper.uncached = func
+        wrapper.is_negative = is_negative
+        return wrapper
+    return decorator
@@ -1,37 +1,142 @@
 """CMS and tech stack detection module."""
 
 import os
-import requests
+import re
 from typing import Dict, Optional, List
 from dotenv import load_dotenv
 
+from . import http_client
+from .fingerprints import PatternMatcher, join_fields
+from .page_fetch import PageSnapshot, fetch_page
+from .rate_limiter import acquire
+from .tech_categories import pick_cms
+from .wappalyzer_engine import WAPPALYZER_AVAILABLE, analyze_snapshot
+
 load_dotenv()
 
-# Try to import Wappalyzer (free open-source library)
-try:
-    from wappalyzer import Wappalyzer, WebPage
-    WAPPALYZER_AVAILABLE = True
-except ImportError:
-    try:
-        # Alternative import path
-        from Wappalyzer import Wappalyzer, WebPage
-        WAPPALYZER_AVAILABLE = True
-    except ImportError:
-        WAPPALYZER_AVAILABLE = False
-        print("Note: python-wappalyzer not installed. Install with: pip install python-wappalyzer")
+# Page fingerprints for detect_cms_enhanced(), per CMS; the first matching
+# pattern in this order wins
+CMS_PATTERNS = {
+    # WordPress
+    "wordpress": [
+        ("wp-content", "WordPress"),
+        ("wp-includes", "WordPress"),
+        ("wp-json", "WordPress"),
+        ("/wp-admin/", "WordPress"),
+        ("wordpress", "WordPress"),
+    ],
+    # Joomla
+    "joomla": [
+        ("joomla", "Joomla"),
+        ("/administrator/", "Joomla"),
+        ("com_content", "Joomla"),
+        ("option=com_", "Joomla"),
+    ],
+    # Drupal
+    "drupal": [
+        ("drupal", "Drupal"),
+        ("sites/all/", "Drupal"),
+        ("/sites/default/", "Drupal"),
+        ("drupal.js", "Drupal"),
+    ],
+    # Shopify
+    "shopify": [
+        ("shopify", "Shopify"),
+        ("cdn.shopify.com", "Shopify"),
+        ("myshopify.com", "Shopify"),
+        ("shopify-analytics", "Shopify"),
+    ],
+    # Squarespace
+    "squarespace": [
+        ("squarespace", "Squarespace"),
+        ("sqs-cdn", "Squarespace"),
+        ("squarespace.com", "Squarespace"),
+    ],
+    # Magento (more specific patterns first to avoid false positives)
+    "magento": [
+        ("/skin/frontend/", "Magento"),  # Very specific Magento path - check first
+        ("/skin/adminhtml/", "Magento"),  # Magento admin skin
+        ("mage/translate.js", "Magento"),  # Specific Magento JS files
+        ("mage/cookies.js", "Magento"),
+        ("mage.js", "Magento"),
+        ("mage/adminhtml", "Magento"),
+        ("/mage/", "Magento"),  # More specific - must be at path boundary
+        ("magento", "Magento"),  # Generic check last
+    ],
+    # PrestaShop
+    "prestashop": [
+        ("prestashop", "PrestaShop"),
+        ("/themes/prestashop/", "PrestaShop"),  # More specific
+        ("prestashop.js", "PrestaShop"),
+    ],
+    # Ghost (more specific to avoid false positives)
+    "ghost": [
+        ("ghost.org", "Ghost"),  # Ghost CMS domain - very specific
+        ("/ghost/", "Ghost"),  # Ghost admin path
+        ("ghost.min.js", "Ghost"),  # Ghost JS file
+        ("content/themes/ghost", "Ghost"),  # Ghost theme path
+    ],
+    # Wix
+    "wix": [
+        ("wix.com", "Wix"),
+        ("wixstatic.com", "Wix"),
+        ("wixpress.com", "Wix"),
+    ],
+    # Weebly
+    "weebly": [
+        ("weebly.com", "Weebly"),
+        ("weeblycdn.com", "Weebly"),
+    ],
+    # BigCommerce
+    "bigcommerce": [
+        ("bigcommerce.com", "BigCommerce"),
+        ("bigcommerceapi", "BigCommerce"),
+    ],
+    # OpenCart
+    "opencart": [
+        ("opencart", "OpenCart"),
+        ("/catalog/view/theme/", "OpenCart"),  # More specific - OpenCart theme path
+        ("/catalog/controller/", "OpenCart"),  # More specific - OpenCart controller path
+        ("opencart.js", "OpenCart"),
+    ],
+}
+
+# Scan table: every fingerprint in priority order, then the bare CMS names.
+# A bare name alone is not a detection, it only means X-Powered-By or a
+# generator meta tag might name the CMS and is worth checking.
+_CMS_FINGERPRINTS = [fingerprint for patterns in CMS_PATTERNS.values() for fingerprint in patterns]
+_CMS_MATCHER = PatternMatcher(_CMS_FINGERPRINTS + [(cms_name, patterns[0][1])
+                                                    for cms_name, patterns in CMS_PATTERNS.items()])
 
+# Canonical names for CMSs Wappalyzer reports under a longer name
+CMS_KEYWORDS = [
+    "WordPress", "Joomla", "Drupal", "Shopify", "Squarespace", "Wix",
+    "Magento", "WooCommerce", "PrestaShop", "OpenCart", "BigCommerce",
+    "Ghost", "Grav", "Strapi", "Contentful", "Craft CMS", "ExpressionEngine",
+    "TYPO3", "Concrete5", "SilverStripe", "Sitecore", "Umbraco", "Kentico",
+    "Pimcore", "AEM", "Liferay", "SharePoint", "DNN", "Plone", "MODX",
+    "ProcessWire", "Textpattern", "Bolt", "Pico", "Kirby", "Statamic"
+]
 
-def detect_cms(domain: str) -> Optional[str]:
+META_GENERATOR_RE = re.compile(r'<meta[^>]+name=["\']generator["\'][^>]+content=["\']([^"\']+)["\']')
+
+
+def detect_cms(domain: str, snapshot: Optional[PageSnapshot] = None) -> Optional[str]:
     """
     Detect CMS using multiple methods in order of preference.
     Uses free open-source Wappalyzer library first (comprehensive, no API key needed).
     Falls back to APIs if keys available, then basic header detection.
+    
+    Page-based methods share one fetched snapshot; pass ``snapshot`` to reuse
+    a page the caller already fetched.
     """
     cms = None
+    if snapshot is None:
+        snapshot = fetch_page(domain)
     
     # Method 1: Wappalyzer open-source library (FREE, comprehensive, no API key needed!)
     if WAPPALYZER_AVAILABLE:
-        cms = detect_with_wappalyzer_library(domain)
+        cms = detect_with_wappalyzer_library(domain, snapshot)
         if cms:
             return cms
     
@@ -57,25 +162,27 @@ def detect_cms(domain: str) -> Optional[str]:
             return cms
     
     # Method 5: Enhanced pattern detection (no API needed)
-    cms = detect_cms_enhanced(domain)
+    cms = detect_cms_enhanced(domain, snapshot)
     if cms:
         return cms
     
     # Method 6: Basic HTTP header detection (last resort)
-    cms = detect_cms_from_headers(domain)
+    cms = detect_cms_from_headers(domain, snapshot)
     
     return cms
 
 
 def detect_with_builtwith(domain: str, api_key: str) -> Optional[str]:
     """Detect CMS using BuiltWith API (free tier: 10 requests/day)."""
+    if not acquire("builtwith"):
+        return None
     try:
         url = f"https://api.builtwith.com/v20/api.json"
         params = {
             "KEY": api_key,
             "LOOKUP": domain
         }
-        response = requests.get(url, params=params, timeout=10)
+        response = http_client.get(url, params=params, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
@@ -105,7 +212,7 @@ def detect_with_builtwith(domain: str, api_key: str) -> Optional[str]:
     return None
 
 
-def detect_with_wappalyzer_library(domain: str) -> Optional[str]:
+def detect_with_wappalyzer_library(domain: str, snapshot: Optional[PageSnapshot] = None) -> Optional[str]:
     """
     Detect CMS using Wappalyzer open-source library (FREE, no API key needed!).
     Uses Wappalyzer's comprehensive detection patterns.
@@ -114,78 +221,24 @@ def detect_with_wappalyzer_library(domain: str) -> Optional[str]:
     if not WAPPALYZER_AVAILABLE:
         return None
     
+    if snapshot is None:
+        snapshot = fetch_page(domain)
+    
     try:
-        url = f"http://{domain}" if not domain.startswith("http") else domain
-        # Ensure https if http fails
-        if not url.startswith("http"):
-            url = f"https://{domain}"
-        
-        wappalyzer = Wappalyzer.latest()
-        webpage = WebPage.new_from_url(url, timeout=10)
-        technologies = wappalyzer.analyze(webpage)
-        
-        # Look for CMS technologies (category 1)
-        cms_keywords = [
-            "WordPress", "Joomla", "Drupal", "Shopify", "Squarespace", "Wix",
-            "Magento", "WooCommerce", "PrestaShop", "OpenCart", "BigCommerce",
-            "Ghost", "Grav", "Strapi", "Contentful", "Craft CMS", "ExpressionEngine",
-            "TYPO3", "Concrete5", "SilverStripe", "Sitecore", "Umbraco", "Kentico",
-            "Pimcore", "AEM", "Liferay", "SharePoint", "DNN", "Plone", "MODX",
-            "ProcessWire", "Textpattern", "Bolt", "Pico", "Kirby", "Statamic"
-        ]
-        
-        # Valid CMS platforms whitelist (strict)
-        valid_cms_platforms = [
-            "wordpress", "joomla", "drupal", "shopify", "squarespace", "wix",
-            "magento", "woocommerce", "prestashop", "opencart", "bigcommerce",
-            "ghost", "grav", "strapi", "contentful", "craft cms", "expressionengine",
-            "typo3", "concrete5", "silverstripe", "sitecore", "umbraco", "kentico",
-            "pimcore", "aem", "adobe experience manager", "liferay", "sharepoint", 
-            "dnn", "dotnetnuke", "plone", "modx", "processwire", "textpattern", 
-            "bolt", "pico", "kirby", "statamic", "wagtail", "django cms", "weebly",
-            "carrd", "webflow", "tumblr", "medium", "blogger", "blogspot"
-        ]
-        
-        # Technologies that are NOT CMS (should never be classified as CMS)
-        not_cms = [
-            "bootstrap", "jquery", "nginx", "apache", "cloudflare", "react", "vue",
-            "angular", "node.js", "php", "python", "ruby", "java", "javascript",
-            "typescript", "css", "html", "sass", "less", "webpack", "gulp",
-            "babel", "express", "django", "rails", "laravel", "flask", "spring",
-            "asp.net", "symfony", "fastly", "cloudfront", "akamai", "maxcdn",
-            "keycdn", "bunnycdn", "stackpath", "sucuri", "incapsula", "imperva"
-        ]
+        # Shared with the tech stack detector: one analysis per page
+        technologies = analyze_snapshot(snapshot)
+        if not technologies:
+            return None
         
-        for tech in technologies:
-            tech_name = str(tech)
-            tech_lower = tech_name.lower()
-            
-            # Skip if it's explicitly NOT a CMS
-            if any(not_cms_item in tech_lower for not_cms_item in not_cms):
-                continue
-            
-            # Check if it's a known CMS (strict matching)
-            for keyword in cms_keywords:
-                if keyword.lower() in tech_lower:
-                    # Double-check it's actually a CMS platform
-                    if any(valid_cms in tech_lower for valid_cms in valid_cms_platforms):
-                        return keyword
-            
-            # Check by category if available (but verify it's actually a CMS)
-            if hasattr(tech, 'categories'):
-                categories = tech.categories
-                if isinstance(categories, list):
-                    for cat in categories:
-                        cat_id = None
-                        if isinstance(cat, dict):
-                            cat_id = cat.get('id')
-                        elif hasattr(cat, 'id'):
-                            cat_id = cat.id
-                        
-                        if cat_id == 1:  # Category 1 = CMS
-                            # Verify it's actually a CMS platform
-                            if any(valid_cms in tech_lower for valid_cms in valid_cms_platforms):
-                                return tech_name
+        # Same whitelist and precedence as the tech stack's CMS field
+        cms = pick_cms(technologies)
+        if cms:
+            # Report well-known platforms under their canonical name
+            cms_lower = cms.lower()
+            for keyword in CMS_KEYWORDS:
+                if keyword.lower() in cms_lower:
+                    return keyword
+            return cms
         
         # Don't return anything if no valid CMS found
         return None
@@ -206,7 +259,7 @@ def detect_with_wappalyzer_api(domain: str, api_key: str) -> Optional[str]:
         params = {
             "urls": domain
         }
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        response = http_client.get(url, headers=headers, params=params, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
@@ -226,9 +279,11 @@ def detect_with_wappalyzer_api(domain: str, api_key: str) -> Optional[str]:
 
 def detect_with_whatcms(domain: str, api_key: str) -> Optional[str]:
     """Detect CMS using WhatCMS API."""
+    if not acquire("whatcms"):
+        return None
     try:
         url = f"https://whatcms.org/API/Tech?key={api_key}&url={domain}"
-        response = requests.get(url, timeout=10)
+        response = http_client.get(url, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
@@ -243,126 +298,40 @@ def detect_with_whatcms(domain: str, api_key: str) -> Optional[str]:
     return None
 
 
-def detect_cms_enhanced(domain: str) -> Optional[str]:
+def detect_cms_enhanced(domain: str, snapshot: Optional[PageSnapshot] = None) -> Optional[str]:
     """
     Enhanced CMS detection using multiple patterns and indicators.
     More comprehensive than basic header detection.
     """
+    if snapshot is None:
+        snapshot = fetch_page(domain)
+    if not snapshot.ok:
+        return None
+    
     try:
-        url = f"http://{domain}" if not domain.startswith("http") else domain
-        response = requests.get(url, timeout=10, allow_redirects=True, headers={
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+        headers = snapshot.headers
+        content = snapshot.body_lower
+        url_lower = snapshot.final_url.lower()
         
-        headers = response.headers
-        content = response.text.lower()
-        url_lower = url.lower()
-        
-        # Comprehensive CMS detection patterns
-        cms_patterns = {
-            # WordPress
-            "wordpress": [
-                ("wp-content", "WordPress"),
-                ("wp-includes", "WordPress"),
-                ("wp-json", "WordPress"),
-                ("/wp-admin/", "WordPress"),
-                ("wordpress", "WordPress"),
-            ],
-            # Joomla
-            "joomla": [
-                ("joomla", "Joomla"),
-                ("/administrator/", "Joomla"),
-                ("com_content", "Joomla"),
-                ("option=com_", "Joomla"),
-            ],
-            # Drupal
-            "drupal": [
-                ("drupal", "Drupal"),
-                ("sites/all/", "Drupal"),
-                ("/sites/default/", "Drupal"),
-                ("drupal.js", "Drupal"),
-            ],
-            # Shopify
-            "shopify": [
-                ("shopify", "Shopify"),
-                ("cdn.shopify.com", "Shopify"),
-                ("myshopify.com", "Shopify"),
-                ("shopify-analytics", "Shopify"),
-            ],
-            # Squarespace
-            "squarespace": [
-                ("squarespace", "Squarespace"),
-                ("sqs-cdn", "Squarespace"),
-                ("squarespace.com", "Squarespace"),
-            ],
-            # Magento (more specific patterns first to avoid false positives)
-            "magento": [
-                ("/skin/frontend/", "Magento"),  # Very specific Magento path - check first
-                ("/skin/adminhtml/", "Magento"),  # Magento admin skin
-                ("mage/translate.js", "Magento"),  # Specific Magento JS files
-                ("mage/cookies.js", "Magento"),
-                ("mage.js", "Magento"),
-                ("mage/adminhtml", "Magento"),
-                ("/mage/", "Magento"),  # More specific - must be at path boundary
-                ("magento", "Magento"),  # Generic check last
-            ],
-            # PrestaShop
-            "prestashop": [
-                ("prestashop", "PrestaShop"),
-                ("/themes/prestashop/", "PrestaShop"),  # More specific
-                ("prestashop.js", "PrestaShop"),
-            ],
-            # Ghost (more specific to avoid false positives)
-            "ghost": [
-                ("ghost.org", "Ghost"),  # Ghost CMS domain - very specific
-                ("/ghost/", "Ghost"),  # Ghost admin path
-                ("ghost.min.js", "Ghost"),  # Ghost JS file
-                ("content/themes/ghost", "Ghost"),  # Ghost theme path
-            ],
-            # Wix
-            "wix": [
-                ("wix.com", "Wix"),
-                ("wixstatic.com", "Wix"),
-                ("wixpress.com", "Wix"),
-            ],
-            # Weebly
-            "weebly": [
-                ("weebly.com", "Weebly"),
-                ("weeblycdn.com", "Weebly"),
-            ],
-            # BigCommerce
-            "bigcommerce": [
-                ("bigcommerce.com", "BigCommerce"),
-                ("bigcommerceapi", "BigCommerce"),
-            ],
-            # OpenCart
-            "opencart": [
-                ("opencart", "OpenCart"),
-                ("/catalog/view/theme/", "OpenCart"),  # More specific - OpenCart theme path
-                ("/catalog/controller/", "OpenCart"),  # More specific - OpenCart controller path
-                ("opencart.js", "OpenCart"),
-            ],
-        }
-        
-        # Check all patterns
-        for cms_name, patterns in cms_patterns.items():
-            for pattern, detected_name in patterns:
-                if pattern in content or pattern in str(headers).lower() or pattern in url_lower:
-                    return detected_name
+        # Body, headers and URL in one pass; hits come back in priority order
+        hits = _CMS_MATCHER.scan(join_fields(content, str(headers).lower(), url_lower))
+        if not hits:
+            return None
+        if hits[0] < len(_CMS_FINGERPRINTS):
+            return _CMS_MATCHER.table[hits[0]][1]
         
         # Check X-Powered-By header
         powered_by = headers.get("X-Powered-By", "").lower()
         if powered_by:
-            for cms_name, patterns in cms_patterns.items():
+            for cms_name, patterns in CMS_PATTERNS.items():
                 if cms_name in powered_by:
                     return patterns[0][1]  # Return CMS name
         
         # Check meta tags
-        import re
-        meta_tags = re.findall(r'<meta[^>]+name=["\']generator["\'][^>]+content=["\']([^"\']+)["\']', content)
+        meta_tags = META_GENERATOR_RE.findall(content)
         for meta_content in meta_tags:
             meta_lower = meta_content.lower()
-            for cms_name, patterns in cms_patterns.items():
+            for cms_name, patterns in CMS_PATTERNS.items():
                 if cms_name in meta_lower:
                     return patterns[0][1]
     
@@ -372,14 +341,15 @@ def detect_cms_enhanced(domain: str) -> Optional[str]:
     return None
 
 
-def detect_cms_from_headers(domain: str) -> Optional[str]:
+def detect_cms_from_headers(domain: str, snapshot: Optional[PageSnapshot] = None) -> Optional[str]:
     """Basic CMS detection from HTTP headers (fallback method)."""
+    if snapshot is None:
+        snapshot = fetch_page(domain)
+    if not snapshot.ok:
+        return None
+    
     try:
-        url = f"http://{domain}" if not domain.startswith("http") else domain
-        response = requests.get(url, timeout=10, allow_redirects=True)
-        
-        headers = response.headers
-        content = response.text.lower()
+        content = snapshot.body_lower
         
         # Quick checks
         if "wp-content" in content or "wp-includes" in content:
@@ -0,0 +1,105 @@
+"""Shared DNS resolver with an answer cache and concurrent queries."""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Tuple
+import dns.asyncresolver
+import dns.resolver
+from dotenv import load_dotenv
+
+from . import metrics
+
+load_dotenv()
+
+# Comma-separated nameserver IPs; empty uses the system resolver config
+NAMESERVERS = [ns.strip() for ns in os.getenv("DNS_NAMESERVERS", "").split(",") if ns.strip()]
+PORT = int(os.getenv("DNS_PORT", "53"))
+# Seconds per nameserver attempt, and for a whole query including retries
+TIMEOUT = float(os.getenv("DNS_TIMEOUT", "2"))
+LIFETIME = float(os.getenv("DNS_LIFETIME", "5"))
+# Answers (including NXDOMAIN/no-data) kept in memory, honouring record TTLs
+CACHE_SIZE = int(os.getenv("DNS_CACHE_SIZE", "10000"))
+# Queries in flight at once across all enrichment workers
+MAX_PARALLEL = int(os.getenv("DNS_MAX_PARALLEL", "32"))
+
+# Answers that mean "no such record" rather than a failed lookup
+NOT_FOUND = (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer)
+
+_resolver = None
+_async_resolver = None
+_executor = None
+_pid = None
+_lock = threading.Lock()
+
+
+def _configure(resolver, cache):
+    if NAMESERVERS:
+        resolver.nameservers = NAMESERVERS
+    resolver.port = PORT
+    resolver.timeout = TIMEOUT
+    resolver.lifetime = LIFETIME
+    resolver.cache = cache
+    return resolver
+
+
+def _init():
+    global _resolver, _async_resolver, _executor, _pid
+    with _lock:
+        if _pid == os.getpid():
+            return
+        # Sync and async resolvers share one answer cache
+        cache = dns.resolver.LRUCache(CACHE_SIZE)
+        _resolver = _configure(dns.resolver.Resolver(configure=not NAMESERVERS), cache)
+        _async_resolver = _configure(dns.asyncresolver.Resolver(configure=not NAMESERVERS), cache)
+        _executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL, thread_name_prefix="dns")
+        _pid = os.getpid()
+
+
+def get_resolver() -> dns.resolver.Resolver:
+    """
+    The process-wide resolver.
+
+    Resolver objects are safe to share between threads as long as nobody
+    changes their settings, and the LRU cache is locked internally, so every
+    worker shares one cache.
+    """
+    if _pid != os.getpid():
+        _init()
+    return _resolver
+
+
+def get_async_resolver() -> dns.asyncresolver.Resolver:
+    """The process-wide asyncio resolver (same settings and cache as get_resolver())."""
+    if _pid != os.getpid():
+        _init()
+    return _async_resolver
+
+
+def resolve(qname, rdtype: str = "A", **kwargs) -> dns.resolver.Answer:
+    """Drop-in for dns.resolver.resolve() using the shared resolver."""
+    with metrics.track_provider("dns", not_found=NOT_FOUND):
+        return get_resolver().resolve(qname, rdtype, **kwargs)
+
+
+def _records(qname: str, rdtype: str) -> List[str]:
+    try:
+        return [str(rdata) for rdata in resolve(qname, rdtype)]
+    except Exception:
+        return []
+
+
+def resolve_many(queries: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], List[str]]:
+    """
+    Run several queries concurrently.
+
+    Args:
+        queries: (name, record type) pairs
+
+    Returns:
+        {(name, record type): [record text, ...]}; failed or empty lookups map to []
+    """
+    get_resolver()
+    queries = list(dict.fromkeys(queries))
+    futures = {query: _executor.submit(_records, *query) for query in queries}
+    return {query: future.result() for query, future in futures.items()}
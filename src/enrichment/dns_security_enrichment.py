@@ -1,8 +1,12 @@
 """DNS security records enrichment (SPF, DMARC, DKIM)."""
 
-import dns.resolver
 from typing import Dict, List
 
+from .dns_resolver import resolve_many
+
+# Common DKIM selectors: default, mail, google, selector1, selector2
+DKIM_SELECTORS = ['default', 'mail', 'google', 'selector1', 'selector2', 'dkim']
+
 
 def enrich_dns_security(domain: str) -> Dict:
     """
@@ -22,9 +26,16 @@ def enrich_dns_security(domain: str) -> Dict:
     }
     
     try:
+        # All TXT lookups (apex, _dmarc, DKIM selectors) go out at once
+        dmarc_domain = f"_dmarc.{domain}"
+        dkim_domains = {selector: f"{selector}._domainkey.{domain}" for selector in DKIM_SELECTORS}
+        answers = resolve_many(
+            [(domain, 'TXT'), (dmarc_domain, 'TXT')] + [(name, 'TXT') for name in dkim_domains.values()]
+        )
+        
         # SPF record (usually in TXT record)
         try:
-            txt_records = dns.resolver.resolve(domain, 'TXT')
+            txt_records = answers[(domain, 'TXT')]
             for txt in txt_records:
                 txt_str = str(txt).strip('"')
                 result["txt_records"].append(txt_str)
@@ -43,8 +54,7 @@ def enrich_dns_security(domain: str) -> Dict:
         
         # DMARC record (usually at _dmarc subdomain)
         try:
-            dmarc_domain = f"_dmarc.{domain}"
-            dmarc_records = dns.resolver.resolve(dmarc_domain, 'TXT')
+            dmarc_records = answers[(dmarc_domain, 'TXT')]
             for dmarc in dmarc_records:
                 dmarc_str = str(dmarc).strip('"')
                 if dmarc_str.startswith("v=DMARC1"):
@@ -54,12 +64,9 @@ def enrich_dns_security(domain: str) -> Dict:
             pass
         
         # DKIM records (usually at selector._domainkey subdomain)
-        # Common selectors: default, mail, google, selector1, selector2
-        common_selectors = ['default', 'mail', 'google', 'selector1', 'selector2', 'dkim']
-        for selector in common_selectors:
+        for selector, dkim_domain in dkim_domains.items():
             try:
-                dkim_domain = f"{selector}._domainkey.{domain}"
-                dkim_records = dns.resolver.resolve(dkim_domain, 'TXT')
+                dkim_records = answers[(dkim_domain, 'TXT')]
                 for dkim in dkim_records:
                     dkim_str = str(dkim).strip('"')
                     if dkim_str.startswith("v=DKIM1"):
@@ -0,0 +1,54 @@
+"""Reading domain lists (CSV or NDJSON) for enrichment."""
+
+import csv
+import json
+from typing import Dict, Iterable, Iterator
+
+
+def normalize_domain(value: str) -> str:
+    """Bare host name from a domain or URL: no scheme, "www." or path."""
+    return value.strip().replace('http://', '').replace('https://', '').replace('www.', '').split('/')[0].strip()
+
+
+def _row(record: Dict, default_source: str) -> Dict:
+    # Support both 'domain' and 'url' column names
+    value = record.get('domain') or record.get('url') or ''
+    return {
+        'domain': normalize_domain(str(value)),
+        'source': record.get('source', default_source),
+        'notes': record.get('notes', '')
+    }
+
+
+def read_domain_rows(lines: Iterable[str], fmt: str = "csv", default_source: str = "Unknown") -> Iterator[Dict]:
+    """
+    Domains from a CSV (with a header row) or NDJSON stream, one row at a time.
+
+    ``lines`` is consumed lazily, so an upload of any size can be read
+    straight from the request body. NDJSON lines are objects with the same
+    keys as the CSV columns (domain or url, source, notes), or a bare
+    domain string.
+
+    Yields:
+        {"domain", "source", "notes"} per row; "domain" is empty if the row
+        has none. Rows that can't be parsed also carry an "error".
+    """
+    if fmt == "csv":
+        for record in csv.DictReader(lines):
+            yield _row(record, default_source)
+        return
+
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield {'domain': '', 'source': default_source, 'notes': '', 'error': f"Invalid JSON: {e}"}
+            continue
+        if isinstance(record, str):
+            record = {'domain': record}
+        if not isinstance(record, dict):
+            yield {'domain': '', 'source': default_source, 'notes': '', 'error': "Expected an object or a string"}
+            continue
+        yield _row(record, default_source)
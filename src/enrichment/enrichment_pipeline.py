@@ -1,37 +1,22 @@
 """Main enrichment pipeline that orchestrates all enrichment steps."""
 
-from typing import Dict, List
+import asyncio
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from .whois_enrichment import enrich_whois, enrich_dns
-from .ip_enrichment import enrich_ip_location
+from .ip_enrichment import enrich_ip_locations
 from .cms_enrichment import detect_cms
 from .payment_detection import detect_payment_processors
 from .tech_stack_enrichment import detect_full_tech_stack
+from . import cache, metrics
+from .page_fetch import PageSnapshot, fetch_page
+from .ssl_enrichment import certificate_fields, parse_certificate
 
-# Try to import Wappalyzer for full tech stack
-try:
-    from Wappalyzer import Wappalyzer, WebPage
-    WAPPALYZER_AVAILABLE = True
-except ImportError:
-    try:
-        from wappalyzer import Wappalyzer, WebPage
-        WAPPALYZER_AVAILABLE = True
-    except ImportError:
-        WAPPALYZER_AVAILABLE = False
 
-
-def enrich_domain(domain: str) -> Dict:
-    """
-    Enrich a domain with all available data sources.
-    
-    Args:
-        domain: Domain name to enrich
-        
-    Returns:
-        Dictionary containing all enrichment data
-    """
-    print(f"Enriching domain: {domain}")
-    
-    result = {
+def _empty_result(domain: str) -> Dict:
+    """Result skeleton returned for every domain."""
+    return {
         "domain": domain,
         "ip_address": None,
         "ip_addresses": [],  # All IPs
@@ -39,6 +24,7 @@ def enrich_domain(domain: str) -> Dict:
         "host_name": None,
         "asn": None,
         "isp": None,
+        "country": None,
         "cdn": None,
         "cms": None,
         "payment_processor": None,
@@ -57,20 +43,99 @@ def enrich_domain(domain: str) -> Dict:
         "http_headers": {},
         "ssl_info": {},
         "whois_data": {},
-        "dns_records": {}
+        "dns_records": {},
+        "ip_locations": {}  # ip -> {host_name, asn, isp, country} for every A/AAAA record
     }
-    
-    # Step 1: WHOIS enrichment
+
+
+def _page(domain: str, outputs: Dict) -> PageSnapshot:
+    """Shared homepage snapshot, or an empty one if the fetch stage failed."""
+    return outputs.get("page") or PageSnapshot(domain)
+
+
+# ---------------------------------------------------------------------------
+# Stage runners: each does the (blocking) work for one stage and returns its
+# raw output. ``outputs`` holds the outputs of the stages it depends on.
+# ---------------------------------------------------------------------------
+
+def _run_whois(domain: str, outputs: Dict) -> Dict:
     print(f"  → WHOIS lookup...")
-    whois_data = enrich_whois(domain)
+    return enrich_whois(domain)
+
+
+def _run_dns(domain: str, outputs: Dict) -> Dict:
+    print(f"  → DNS lookup...")
+    return enrich_dns(domain)
+
+
+def _run_ip(domain: str, outputs: Dict) -> Dict:
+    dns_records = (outputs.get("dns") or {}).get("dns_records") or {}
+    ip_addresses = (dns_records.get("A") or []) + (dns_records.get("AAAA") or [])
+    if not ip_addresses:
+        return None
+    print(f"  → IP location lookup for {len(ip_addresses)} IPs...")
+    # Deduplicated and batched with the lookups of other concurrent domains
+    return enrich_ip_locations(ip_addresses)
+
+
+def _run_page(domain: str, outputs: Dict) -> PageSnapshot:
+    print(f"  → Fetching homepage...")
+    return fetch_page(domain)
+
+
+def _run_tech_stack(domain: str, outputs: Dict) -> Dict:
+    print(f"  → Full tech stack detection...")
+    return detect_full_tech_stack(domain, _page(domain, outputs))
+
+
+def _run_cms(domain: str, outputs: Dict) -> str:
+    # Fallback only: skip if the tech stack already identified the CMS
+    if (outputs.get("tech_stack") or {}).get("cms"):
+        return None
+    print(f"  → CMS detection...")
+    return detect_cms(domain, _page(domain, outputs))
+
+
+def _run_payment(domain: str, outputs: Dict) -> List[str]:
+    # Fallback only: skip if the tech stack already found processors
+    if (outputs.get("tech_stack") or {}).get("payment_processors"):
+        return None
+    print(f"  → Payment processor detection...")
+    return detect_payment_processors(domain, _page(domain, outputs))
+
+
+def _run_headers(domain: str, outputs: Dict) -> Dict:
+    print(f"  → HTTP headers analysis...")
+    snapshot = _page(domain, outputs)
+    if not snapshot.ok:
+        # Silently skip - some domains may not be accessible
+        return None
+    return {
+        "http_headers": snapshot.header_summary(),
+        "server": snapshot.headers.get("Server")
+    }
+
+
+def _run_ssl(domain: str, outputs: Dict) -> Dict:
+    # Certificate captured during the homepage fetch - no extra handshake
+    snapshot = _page(domain, outputs)
+    if not snapshot.peer_cert:
+        return None
+    return certificate_fields(parse_certificate(snapshot.peer_cert))
+
+
+# ---------------------------------------------------------------------------
+# Merge functions: fold one stage's output into the result dict.
+# ---------------------------------------------------------------------------
+
+def _merge_whois(result: Dict, whois_data: Dict):
     result.update(whois_data)
-    
+
     # Extract additional WHOIS fields
     if whois_data.get("whois_data"):
         whois_info = whois_data["whois_data"]
         if whois_info.get("expiration_date"):
             try:
-                from datetime import datetime
                 exp_str = str(whois_info["expiration_date"])
                 # Try to parse expiration date
                 if isinstance(whois_info["expiration_date"], list):
@@ -85,12 +150,11 @@ def enrich_domain(domain: str) -> Dict:
         if whois_info.get("status"):
             status_list = whois_info["status"] if isinstance(whois_info["status"], list) else [whois_info["status"]]
             result["whois_status"] = ", ".join(str(s) for s in status_list) if status_list else None
-    
-    # Step 2: DNS enrichment
-    print(f"  → DNS lookup...")
-    dns_data = enrich_dns(domain)
+
+
+def _merge_dns(result: Dict, dns_data: Dict):
     result.update(dns_data)
-    
+
     # Extract all IPs and DNS records
     if dns_data.get("dns_records"):
         dns_recs = dns_data["dns_records"]
@@ -104,89 +168,296 @@ def enrich_domain(domain: str) -> Dict:
         if dns_recs.get("NS"):
             if not result.get("name_servers"):
                 result["name_servers"] = dns_recs["NS"]
-    
-    # Step 3: IP location and hosting (if IP found)
-    if result.get("ip_address"):
-        print(f"  → IP location lookup for {result['ip_address']}...")
-        ip_data = enrich_ip_location(result["ip_address"])
-        # Ensure ASN is a string, not a dict
-        if isinstance(ip_data.get("asn"), dict):
-            ip_data["asn"] = str(ip_data["asn"].get("asn", ""))
-        elif ip_data.get("asn"):
-            ip_data["asn"] = str(ip_data["asn"]).replace("AS", "").strip()
-        result.update(ip_data)
-    
-    # Step 4: Full tech stack detection (using Wappalyzer library if available)
-    print(f"  → Full tech stack detection...")
-    try:
-        tech_stack = detect_full_tech_stack(domain)
-        if tech_stack:
-            result["tech_stack"] = tech_stack
-            # Extract key fields from tech stack
-            if tech_stack.get("cms") and not result.get("cms"):
-                result["cms"] = tech_stack["cms"]
-            if tech_stack.get("cdn") and not result.get("cdn"):
-                result["cdn"] = tech_stack["cdn"]
-            if tech_stack.get("frameworks"):
-                result["frameworks"] = tech_stack["frameworks"]
-            if tech_stack.get("analytics"):
-                result["analytics"] = tech_stack["analytics"]
-            if tech_stack.get("javascript_frameworks"):
-                result["frameworks"].extend(tech_stack["javascript_frameworks"])
-            if tech_stack.get("web_servers"):
-                result["web_server"] = tech_stack["web_servers"][0] if tech_stack["web_servers"] else None
-            if tech_stack.get("payment_processors"):
-                processors = tech_stack["payment_processors"]
-                if result.get("payment_processor"):
-                    existing = result["payment_processor"].split(", ")
-                    all_processors = list(set(existing + processors))
-                    result["payment_processor"] = ", ".join(all_processors)
-                else:
-                    result["payment_processor"] = ", ".join(processors)
-            if tech_stack.get("programming_languages"):
-                result["languages"] = tech_stack["programming_languages"]
-    except Exception as e:
-        print(f"  ⚠️  Full tech stack detection failed: {e}")
-    
-    # Step 5: CMS detection (fallback if tech stack didn't provide it)
-    if not result.get("cms"):
-        print(f"  → CMS detection...")
-        cms = detect_cms(domain)
-        if cms:
-            result["cms"] = cms
-    
-    # Step 6: Payment processor detection (fallback)
-    if not result.get("payment_processor"):
-        print(f"  → Payment processor detection...")
-        processors = detect_payment_processors(domain)
-        if processors:
+
+
+def _merge_ip(result: Dict, ip_locations: Dict):
+    result["ip_locations"] = ip_locations
+    # Primary IP's details populate the flat fields
+    ip_data = dict(ip_locations.get(result.get("ip_address")) or next(iter(ip_locations.values()), {}))
+    # Ensure ASN is a string, not a dict
+    if isinstance(ip_data.get("asn"), dict):
+        ip_data["asn"] = str(ip_data["asn"].get("asn", ""))
+    elif ip_data.get("asn"):
+        ip_data["asn"] = str(ip_data["asn"]).replace("AS", "").strip()
+    result.update(ip_data)
+
+
+def _merge_tech_stack(result: Dict, tech_stack: Dict):
+    if not tech_stack:
+        return
+    result["tech_stack"] = tech_stack
+    # Extract key fields from tech stack
+    if tech_stack.get("cms") and not result.get("cms"):
+        result["cms"] = tech_stack["cms"]
+    if tech_stack.get("cdn") and not result.get("cdn"):
+        result["cdn"] = tech_stack["cdn"]
+    if tech_stack.get("frameworks"):
+        result["frameworks"] = list(tech_stack["frameworks"])
+    if tech_stack.get("analytics"):
+        result["analytics"] = tech_stack["analytics"]
+    if tech_stack.get("javascript_frameworks"):
+        result["frameworks"].extend(tech_stack["javascript_frameworks"])
+    if tech_stack.get("web_servers"):
+        result["web_server"] = tech_stack["web_servers"][0] if tech_stack["web_servers"] else None
+    if tech_stack.get("payment_processors"):
+        processors = tech_stack["payment_processors"]
+        if result.get("payment_processor"):
+            existing = result["payment_processor"].split(", ")
+            all_processors = list(set(existing + processors))
+            result["payment_processor"] = ", ".join(all_processors)
+        else:
             result["payment_processor"] = ", ".join(processors)
-    
-    # Step 7: HTTP headers and server info
-    print(f"  → HTTP headers analysis...")
-    try:
-        import requests
-        url = f"https://{domain}" if not domain.startswith("http") else domain
-        response = requests.get(url, timeout=10, allow_redirects=True, verify=False)
-        
-        # Extract HTTP headers
-        headers = dict(response.headers)
-        result["http_headers"] = {
-            "server": headers.get("Server"),
-            "x_powered_by": headers.get("X-Powered-By"),
-            "content_type": headers.get("Content-Type"),
-            "status_code": response.status_code
-        }
-        
-        # Detect web server from headers
-        if headers.get("Server") and not result.get("web_server"):
-            result["web_server"] = headers.get("Server")
-            
-    except Exception as e:
-        # Silently fail - some domains may not be accessible
-        pass
-    
+    if tech_stack.get("programming_languages"):
+        result["languages"] = tech_stack["programming_languages"]
+
+
+def _merge_cms(result: Dict, cms: str):
+    if cms and not result.get("cms"):
+        result["cms"] = cms
+
+
+def _merge_payment(result: Dict, processors: List[str]):
+    if processors and not result.get("payment_processor"):
+        result["payment_processor"] = ", ".join(processors)
+
+
+def _merge_headers(result: Dict, headers: Dict):
+    result["http_headers"] = headers["http_headers"]
+    # Detect web server from headers
+    if headers.get("server") and not result.get("web_server"):
+        result["web_server"] = headers["server"]
+
+
+def _merge_ssl(result: Dict, ssl_info: Dict):
+    result["ssl_info"] = ssl_info
+
+
+# Stage graph: name -> (runner, dependencies, merge).
+# Stages without a dependency path between them run concurrently; only
+# DNS -> IP and page fetch -> detectors are serialized. Dict order is the
+# order outputs are merged, which reproduces the original sequential
+# pipeline's precedence rules (e.g. a CDN from DNS beats one from the tech
+# stack) no matter which stage finishes first.
+STAGES = {
+    "whois": (_run_whois, (), _merge_whois),
+    "dns": (_run_dns, (), _merge_dns),
+    "ip": (_run_ip, ("dns",), _merge_ip),
+    "page": (_run_page, (), None),
+    "tech_stack": (_run_tech_stack, ("page",), _merge_tech_stack),
+    "cms": (_run_cms, ("page", "tech_stack"), _merge_cms),
+    "payment": (_run_payment, ("page", "tech_stack"), _merge_payment),
+    "headers": (_run_headers, ("page",), _merge_headers),
+    "ssl": (_run_ssl, ("page",), _merge_ssl),
+}
+
+
+def merge_outputs(domain: str, outputs: Dict) -> Dict:
+    """Result dict for ``domain`` from the stage outputs so far, merged in STAGES order."""
+    result = _empty_result(domain)
+    for name, (_, _, merge) in STAGES.items():
+        if merge and outputs.get(name) is not None:
+            merge(result, outputs[name])
+    return result
+
+
+# Provider stages, and how to tell that one came back empty. The lookups
+# swallow provider errors (timeouts, rate limits) and return empty results,
+# so an empty output may well be a failure; these are the same tests that
+# make the lookup cache keep such results only briefly.
+EMPTY_OUTPUT: Dict[str, Callable[[object], bool]] = {
+    "whois": enrich_whois.is_negative,
+    "dns": enrich_dns.is_negative,
+    "ip": lambda locations: not any(found.get("asn") or found.get("isp") for found in locations.values()),
+    "tech_stack": detect_full_tech_stack.is_negative,
+}
+
+
+def is_empty_output(stage: str, output) -> bool:
+    """True if provider stage ``stage`` ran but got nothing back (see EMPTY_OUTPUT)."""
+    test = EMPTY_OUTPUT.get(stage)
+    return output is not None and test is not None and test(output)
+
+
+def stage_closure(stages: Iterable[str], completed: Optional[Dict] = None) -> Set[str]:
+    """
+    ``stages`` plus every stage they depend on, directly or indirectly.
+
+    Stages in ``completed`` ({stage: output}) already have outputs: they are
+    left out, and so are dependencies only they needed - except that a
+    completed stage with no output (e.g. the IP lookup after an empty DNS
+    answer) runs again when a stage it depends on does. Stages that feed
+    other stages without contributing fields themselves (the page fetch)
+    are only included when a selected stage needs them.
+    """
+    completed = dict(completed or {})
+    selected = set()
+    pending = [name for name in stages if name not in completed and STAGES[name][2] is not None]
+    while pending:
+        while pending:
+            name = pending.pop()
+            if name not in selected:
+                selected.add(name)
+                pending.extend(dep for dep in STAGES[name][1] if dep not in completed)
+        for name, output in list(completed.items()):
+            if output is None and name in STAGES and any(dep in selected for dep in STAGES[name][1]):
+                del completed[name]
+                pending.append(name)
+    return selected
+
+
+async def enrich_domain_async(domain: str, stages: Optional[Iterable[str]] = None,
+                              completed: Optional[Dict] = None,
+                              on_stage: Optional[Callable[[str, object, Optional[Exception]], None]] = None,
+                              force: bool = False) -> Dict:
+    """
+    Enrich a domain, running independent stages concurrently.
+
+    Each stage runs in a worker thread as soon as the stages it depends on
+    have finished, so wall time is the slowest dependency chain rather than
+    the sum of all stages.
+
+    Args:
+        domain: Domain name to enrich
+        stages: Run only these stages (and their dependencies); default all.
+            Fields of stages that don't run keep their empty values.
+        completed: {stage: output} saved from an earlier attempt; these
+            stages are not run again and their outputs are reused
+        on_stage: Called as (stage, output, error) when each stage finishes
+        force: Look everything up live, ignoring the lookup cache (fresh
+            results are still cached)
+
+    Returns:
+        Dictionary containing all enrichment data (same shape as enrich_domain)
+    """
+    print(f"Enriching domain: {domain}")
+
+    completed = completed or {}
+    selected = stage_closure(stages if stages is not None else STAGES, completed)
+    outputs = dict(completed)
+    tasks = {}
+
+    async def run_stage(name: str):
+        runner, dependencies, _ = STAGES[name]
+        waiting_on = [tasks[dep] for dep in dependencies if dep in tasks]
+        if waiting_on:
+            await asyncio.gather(*waiting_on)
+        error = None
+        start = time.perf_counter()
+        try:
+            outputs[name] = await asyncio.to_thread(runner, domain, outputs)
+        except Exception as e:
+            error = e
+            print(f"  ⚠️  {name} stage failed: {e}")
+        metrics.record_stage(name, time.perf_counter() - start, error)
+        if on_stage:
+            on_stage(name, outputs.get(name), error)
+
+    # Tasks and their to_thread() calls inherit the refresh flag
+    with cache.refresh(force):
+        for name in STAGES:
+            if name in selected:
+                tasks[name] = asyncio.create_task(run_stage(name))
+    await asyncio.gather(*tasks.values())
+
+    result = merge_outputs(domain, outputs)
+
     print(f"  ✓ Enrichment complete for {domain}")
-    
+
     return result
 
+
+def enrich_domain(domain: str, stages: Optional[Iterable[str]] = None,
+                  completed: Optional[Dict] = None,
+                  on_stage: Optional[Callable[[str, object, Optional[Exception]], None]] = None,
+                  force: bool = False) -> Dict:
+    """
+    Enrich a domain with all available data sources.
+
+    Synchronous entry point for scripts and Flask handlers; runs
+    enrich_domain_async() on a private event loop. Code that already has a
+    running loop should await enrich_domain_async() directly.
+
+    Args:
+        domain: Domain name to enrich
+        stages: Run only these stages (and their dependencies); default all
+        completed: Stage outputs from an earlier attempt (see enrich_domain_async)
+        on_stage: Called as (stage, output, error) when each stage finishes
+        force: Skip the lookup cache (see enrich_domain_async)
+
+    Returns:
+        Dictionary containing all enrichment data
+    """
+    return asyncio.run(enrich_domain_async(domain, stages, completed, on_stage, force))
+
+
+def stage_reporter(domain: str, report: Callable[[Dict], None]) -> Callable[[str, object, Optional[Exception]], None]:
+    """
+    on_stage callback for enrich_domain() that reports each stage's progress.
+
+    ``report`` is called with {"stage", "fields", "error"} as each stage
+    finishes, where fields are the result fields the stage set or changed
+    (merged with the same precedence as the final result), e.g. to stream
+    them to a client.
+    """
+    outputs = {}
+    sent = _empty_result(domain)
+
+    def on_stage(name, output, error):
+        nonlocal sent
+        if output is not None:
+            outputs[name] = output
+        current = merge_outputs(domain, outputs)
+        fields = {key: value for key, value in current.items() if value != sent.get(key)}
+        sent = current
+        report({"stage": name, "fields": fields, "error": str(error) if error else None})
+
+    return on_stage
+
+
+def enrich_domains(domains: Iterable[str], concurrency: int = 4,
+                   enrich: Callable[[str], Dict] = enrich_domain) -> Iterator[Tuple[str, Optional[Dict], Optional[Exception]]]:
+    """
+    Enrich many domains with a bounded worker pool.
+
+    Domains are pulled from ``domains`` lazily (at most ``2 * concurrency``
+    are in flight), so arbitrarily long iterables are fine. Results are
+    yielded in completion order, not input order. Provider quotas are
+    enforced inside the individual lookups, so they hold across workers.
+
+    Args:
+        domains: Iterable of domain names
+        concurrency: Number of domains enriched at the same time
+        enrich: Function run for each domain (default enrich_domain)
+
+    Yields:
+        (domain, result, error) tuples; ``result`` is None when ``error`` is set
+    """
+    concurrency = max(1, concurrency)
+    domain_iter = iter(domains)
+    pending = {}
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="enrich") as pool:
+        def submit_next() -> bool:
+            for domain in domain_iter:
+                pending[pool.submit(enrich, domain)] = domain
+                return True
+            return False
+
+        try:
+            for _ in range(concurrency * 2):
+                if not submit_next():
+                    break
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    domain = pending.pop(future)
+                    try:
+                        yield domain, future.result(), None
+                    except Exception as e:
+                        yield domain, None, e
+                    submit_next()
+        finally:
+            # Consumer stopped early: don't start work nobody will read
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,64 @@
+"""Multi-pattern substring matching for the page fingerprint tables."""
+
+from typing import List, Sequence, Tuple
+import ahocorasick
+
+# Below this many distinct patterns a handful of C substring searches is
+# faster than walking the automaton
+MIN_AUTOMATON_PATTERNS = 24
+
+
+class PatternMatcher:
+    """
+    A fingerprint table compiled once for repeated scans.
+
+    ``table`` is a sequence of (pattern, label) pairs in priority order, with
+    lowercase patterns. Larger tables share one Aho-Corasick automaton, so a
+    scan is a single pass over the text however many fingerprints there
+    are; small ones look each distinct pattern up with ``in``.
+    """
+
+    def __init__(self, table: Sequence[Tuple[str, str]]):
+        self.table = list(table)
+        # pattern -> indices of the table entries using it
+        self._entries = {}
+        for index, (pattern, _) in enumerate(self.table):
+            self._entries.setdefault(pattern, []).append(index)
+
+        self._automaton = None
+        if len(self._entries) >= MIN_AUTOMATON_PATTERNS:
+            self._automaton = ahocorasick.Automaton()
+            for pattern, indices in self._entries.items():
+                self._automaton.add_word(pattern, tuple(indices))
+            self._automaton.make_automaton()
+
+    def scan(self, text: str) -> List[int]:
+        """Indices of every table entry found in ``text``, in priority order."""
+        if self._automaton is not None:
+            found = set()
+            for _, indices in self._automaton.iter(text):
+                found.update(indices)
+            return sorted(found)
+        return sorted(index for pattern, indices in self._entries.items() if pattern in text
+                      for index in indices)
+
+    def matches(self, text: str) -> List[Tuple[str, str]]:
+        """Every (pattern, label) entry found in ``text``, in priority order."""
+        return [self.table[index] for index in self.scan(text)]
+
+    def labels(self, text: str) -> List[str]:
+        """Distinct labels found in ``text``, ordered by their best entry."""
+        seen = []
+        for _, label in self.matches(text):
+            if label not in seen:
+                seen.append(label)
+        return seen
+
+
+def join_fields(*fields: str) -> str:
+    """
+    Join texts for one scan.
+
+    The NUL separator keeps a pattern from matching across two fields.
+    """
+    return "\0".join(fields)
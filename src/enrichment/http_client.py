@@ -0,0 +1,135 @@
+"""Shared HTTP client with keep-alive connection pools for all outbound requests."""
+
+import os
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
+from dotenv import load_dotenv
+
+from . import metrics
+
+load_dotenv()
+
+# Number of hosts that keep a connection pool, and connections kept per host.
+# POOL_MAXSIZE should be at least the number of enrichment workers.
+POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "32"))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+
+# Retries for API calls on connection errors and 5xx responses. 429s are not
+# retried here - the rate limiter is what keeps us under provider quotas.
+RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+
+# gzip/deflate, plus br/zstd when the decoders are installed
+ACCEPT_ENCODING = make_headers(accept_encoding=True)["accept-encoding"]
+
+# Hosts of the APIs we call, for per-provider metrics
+PROVIDER_HOSTS = {
+    "ip-api.com": "ip-api",
+    "www.iplocate.io": "iplocate",
+    "api.builtwith.com": "builtwith",
+    "whatcms.org": "whatcms",
+    "www.virustotal.com": "virustotal",
+    "api.abuseipdb.com": "abuseipdb",
+    "api.securitytrails.com": "securitytrails",
+}
+
+_local = threading.local()
+_adapters = {}
+_adapters_pid = None
+_adapters_lock = threading.Lock()
+
+
+def _new_adapter(retry: bool) -> HTTPAdapter:
+    max_retries = Retry(
+        total=RETRIES,
+        backoff_factor=BACKOFF,
+        status_forcelist=(500, 502, 503, 504),
+        # Every POST we make is a read-only lookup (e.g. ip-api batch)
+        allowed_methods=frozenset(["GET", "HEAD", "POST"]),
+        raise_on_status=False,
+    ) if retry else Retry(0, read=False)
+    return HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                       max_retries=max_retries)
+
+
+def _adapter(retry: bool) -> HTTPAdapter:
+    # Adapters own the connection pools and are shared by every thread (urllib3
+    # pools are thread-safe). Pools must not cross a fork, so each process
+    # builds its own.
+    global _adapters, _adapters_pid
+    if _adapters_pid != os.getpid():
+        with _adapters_lock:
+            if _adapters_pid != os.getpid():
+                _adapters = {True: _new_adapter(True), False: _new_adapter(False)}
+                _adapters_pid = os.getpid()
+    return _adapters[retry]
+
+
+def session(retry: bool = True) -> requests.Session:
+    """
+    Session for the current thread, backed by the process-wide connection pools.
+
+    Sessions hold cookies and aren't safe to share between threads, so each
+    thread gets its own; the pooled connections underneath are shared.
+
+    Args:
+        retry: Retry connection errors and 5xx responses with backoff. Use
+            False for fetching arbitrary sites, where a failure is an answer.
+    """
+    sessions = getattr(_local, "sessions", None)
+    if sessions is None or _local.pid != os.getpid():
+        sessions = _local.sessions = {}
+        _local.pid = os.getpid()
+
+    s = sessions.get(retry)
+    if s is None:
+        s = requests.Session()
+        s.headers["Accept-Encoding"] = ACCEPT_ENCODING
+        adapter = _adapter(retry)
+        s.mount("https://", adapter)
+        s.mount("http://", adapter)
+        sessions[retry] = s
+    return s
+
+
+def provider_for(url: str, retry: bool = True) -> str:
+    """Metrics label for a request: the API's name, or "site" for fetches of enriched sites."""
+    host = (urlsplit(url).hostname or "").lower()
+    if host in PROVIDER_HOSTS:
+        return PROVIDER_HOSTS[host]
+    return host if retry else "site"
+
+
+def request(method: str, url: str, retry: bool = True, provider: Optional[str] = None, **kwargs) -> requests.Response:
+    """
+    Send a request over the shared pools and record its latency and outcome.
+
+    For streamed responses only the time to headers is measured and the
+    body isn't counted; callers add it with metrics.add_bytes().
+    """
+    provider = provider or provider_for(url, retry)
+    start = time.perf_counter()
+    try:
+        response = session(retry).request(method, url, **kwargs)
+    except Exception as e:
+        metrics.record_provider(provider, time.perf_counter() - start, metrics.outcome_of(e))
+        raise
+    size = 0 if kwargs.get("stream") else len(response.content)
+    metrics.record_provider(provider, time.perf_counter() - start,
+                            "success" if response.status_code < 400 else "http_error", size)
+    return response
+
+
+def get(url: str, retry: bool = True, **kwargs) -> requests.Response:
+    """requests.get() over the shared pools."""
+    return request("GET", url, retry=retry, **kwargs)
+
+
+def post(url: str, retry: bool = True, **kwargs) -> requests.Response:
+    """requests.post() over the shared pools."""
+    return request("POST", url, retry=retry, **kwargs)
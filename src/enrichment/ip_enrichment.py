@@ -1,19 +1,80 @@
 """IP location and hosting enrichment module."""
 
 import os
-import requests
-from typing import Dict, Optional
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
 from dotenv import load_dotenv
 
+from . import cache, http_client, ip_index, rate_limiter
+from .cache import cached
+from .rate_limiter import acquire
+
 load_dotenv()
 
+# ip-api.com batch endpoint: up to 100 IPs per request (free tier, HTTP only)
+IP_API_BATCH_URL = "http://ip-api.com/batch"
+IP_API_BATCH_SIZE = 100
+IP_API_FIELDS = "status,message,query,as,isp,org,countryCode"
+IP_API_BATCH_TIMEOUT = 15
+
+# How long concurrent lookups are collected before a batch is sent (seconds)
+IP_BATCH_WINDOW = float(os.getenv("IP_BATCH_WINDOW", "0.2"))
+
+
+def _is_negative(result: Dict) -> bool:
+    return not result.get("asn") and not result.get("isp")
+
+
+def _from_ip_api(data: Dict) -> Dict:
+    """
+    Map an ip-api.com response object to our IP enrichment fields.
+
+    Same shape as the IPLocate lookup in _lookup_remote(): ``isp`` is the
+    organisation and ``host_name`` its first word, so stored hosts group the
+    same way whichever API answered.
+    """
+    asn_str = data.get("as", "")
+    org = data.get("org", "") or data.get("isp", "")
+    return {
+        "host_name": org.split()[0] if org.split() else None,
+        "asn": asn_str.replace("AS", "").strip() if asn_str else None,
+        "isp": org or None,
+        "country": data.get("countryCode") or None
+    }
+
+
+def _from_ip_index(data: Dict) -> Dict:
+    """Map an offline index hit to our IP enrichment fields."""
+    return {
+        "host_name": data["org"],
+        "asn": data["asn"],
+        "isp": data["org"],
+        "country": data["country"]
+    }
+
 
 def enrich_ip_location(ip_address: str) -> Dict:
+    """
+    Enrich IP address with hosting data.
+
+    Answers from the offline IP index (see ip_index) when it covers the IP,
+    and only falls back to the remote APIs on a miss.
+    """
+    offline = ip_index.lookup(ip_address) if ip_address else None
+    if offline:
+        return _from_ip_index(offline)
+    return _lookup_remote(ip_address)
+
+
+@cached("ip_geo", is_negative=_is_negative)
+def _lookup_remote(ip_address: str) -> Dict:
     """Enrich IP address with location and hosting data using IPLocate.io."""
     result = {
         "host_name": None,
         "asn": None,
-        "isp": None
+        "isp": None,
+        "country": None
     }
     
     if not ip_address:
@@ -27,9 +88,9 @@ def enrich_ip_location(ip_address: str) -> Dict:
         if api_key:
             url += f"?apikey={api_key}"
         
-        response = requests.get(url, timeout=10)
+        response = http_client.get(url, timeout=10) if acquire("iplocate") else None
         
-        if response.status_code == 200:
+        if response is not None and response.status_code == 200:
             data = response.json()
             
             asn_data = data.get("asn", "")
@@ -42,6 +103,7 @@ def enrich_ip_location(ip_address: str) -> Dict:
                 result["asn"] = str(asn_data) if asn_data else None
             
             result["isp"] = data.get("org", "")  # IPLocate uses 'org' for ISP
+            result["country"] = data.get("country_code") or None
             
             # Try to extract hostname from org field
             org = data.get("org", "")
@@ -49,11 +111,12 @@ def enrich_ip_location(ip_address: str) -> Dict:
                 result["host_name"] = org.split()[0] if org.split() else None
         
         # Fallback: Try ip-api.com (free, no key required, 45 req/min)
-        if not api_key:
+        # only if IPLocate came back empty - no need to ask twice
+        if not api_key and _is_negative(result):
             url = f"http://ip-api.com/json/{ip_address}"
-            response = requests.get(url, timeout=10)
+            response = http_client.get(url, timeout=10) if acquire("ip-api") else None
             
-            if response.status_code == 200:
+            if response is not None and response.status_code == 200:
                 data = response.json()
                 if data.get("status") == "success":
                     asn_str = data.get("as", "")
@@ -61,6 +124,7 @@ def enrich_ip_location(ip_address: str) -> Dict:
                         result["asn"] = asn_str.replace("AS", "").strip()
                     result["isp"] = result.get("isp") or data.get("isp", "")
                     result["host_name"] = result.get("host_name") or data.get("org", "")
+                    result["country"] = result.get("country") or data.get("countryCode")
     
     except Exception as e:
         print(f"IP location lookup failed for {ip_address}: {e}")
@@ -68,30 +132,158 @@ def enrich_ip_location(ip_address: str) -> Dict:
     return result
 
 
-def enrich_with_alternate_api(ip_address: str) -> Dict:
-    """Fallback IP enrichment using ip-api.com."""
-    result = {
-        "host_name": None,
-        "asn": None,
-        "isp": None
-    }
-    
-    if not ip_address:
-        return result
+def _ip_api_batch(ip_addresses: List[str]) -> Dict[str, Dict]:
+    """Look up to IP_API_BATCH_SIZE IPs with one ip-api.com batch request."""
+    results = {}
+    if not acquire("ip-api-batch"):
+        return results
     
     try:
-        url = f"http://ip-api.com/json/{ip_address}"
-        response = requests.get(url, timeout=10)
+        response = http_client.post(IP_API_BATCH_URL, params={"fields": IP_API_FIELDS},
+                                    json=ip_addresses, timeout=IP_API_BATCH_TIMEOUT)
         
         if response.status_code == 200:
-            data = response.json()
-            if data.get("status") == "success":
-                result["asn"] = data.get("as", "").replace("AS", "") if data.get("as") else None
-                result["isp"] = data.get("isp", "")
-                result["host_name"] = data.get("org", "")
+            for data in response.json():
+                if data.get("status") == "success" and data.get("query"):
+                    results[data["query"]] = _from_ip_api(data)
     
     except Exception as e:
-        print(f"Alternate IP lookup failed for {ip_address}: {e}")
+        print(f"Batch IP lookup failed for {len(ip_addresses)} IPs: {e}")
     
-    return result
+    return results
 
+
+class _PendingLookup:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class IPBatcher:
+    """
+    Coalesces IP lookups from concurrent callers into ip-api batch requests.
+
+    Every IP is looked up at most once while in flight: callers asking for an
+    IP that is already queued wait for the same answer. The first caller to
+    queue work waits IP_BATCH_WINDOW seconds for other workers to add theirs,
+    then sends the queue in batches of up to IP_API_BATCH_SIZE. A full batch
+    is sent immediately by whoever fills it.
+
+    Sending a batch can take as long as the rate limiter's longest wait plus
+    the request timeout, so callers wait that long for every batch queued
+    ahead of theirs before giving up on an IP.
+    """
+    
+    def __init__(self, window: float = IP_BATCH_WINDOW, batch_size: int = IP_API_BATCH_SIZE):
+        self.window = window
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pending = {}  # ip -> _PendingLookup
+        self._queue = []
+        self._flushing = False
+    
+    def lookup(self, ip_addresses: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Return {ip: result or None} for the given IPs.
+
+        IPs whose batch didn't finish in time are left out, as their
+        answer is unknown rather than empty.
+        """
+        waiting = {}
+        full_batches = []
+        lead_flush = False
+        
+        with self._lock:
+            for ip in ip_addresses:
+                pending = self._pending.get(ip)
+                if pending is None:
+                    pending = self._pending[ip] = _PendingLookup()
+                    self._queue.append(ip)
+                waiting[ip] = pending
+            while len(self._queue) >= self.batch_size:
+                full_batches.append(self._queue[:self.batch_size])
+                del self._queue[:self.batch_size]
+            if self._queue and not self._flushing:
+                self._flushing = lead_flush = True
+            batches = len(full_batches) + -(-len(self._queue) // self.batch_size)
+        
+        for batch in full_batches:
+            self._send(batch)
+        
+        if lead_flush:
+            time.sleep(self.window)
+            while True:
+                with self._lock:
+                    batch = self._queue[:self.batch_size]
+                    del self._queue[:self.batch_size]
+                    if not batch:
+                        self._flushing = False
+                        break
+                self._send(batch)
+        
+        batch_wait = rate_limiter.DEFAULT_MAX_WAIT + IP_API_BATCH_TIMEOUT
+        deadline = time.monotonic() + self.window + max(batches, 1) * batch_wait
+        return {ip: pending.result for ip, pending in waiting.items()
+                if pending.done.wait(timeout=max(deadline - time.monotonic(), 0))}
+    
+    def _send(self, batch: List[str]):
+        results = {}
+        try:
+            results = _ip_api_batch(batch)
+        finally:
+            with self._lock:
+                for ip in batch:
+                    pending = self._pending.pop(ip, None)
+                    if pending:
+                        pending.result = results.get(ip)
+                        pending.done.set()
+
+
+_batcher = IPBatcher()
+
+
+def enrich_ip_locations(ip_addresses: Iterable[str]) -> Dict[str, Dict]:
+    """
+    Enrich many IPs at once, deduplicated.
+
+    IPs covered by the offline index never leave the process, and cached
+    IPs are served from the lookup cache (except inside cache.refresh()).
+    Without an IPLocate key the rest go through ip-api's batch endpoint,
+    coalesced with lookups from other concurrent workers; with a key each
+    uncached IP gets one IPLocate call.
+
+    Returns:
+        {ip: {"host_name", "asn", "isp", "country"}} for every distinct input IP
+    """
+    unique_ips = list(dict.fromkeys(ip for ip in ip_addresses if ip))
+    results = {}
+    misses = []
+    
+    for ip in unique_ips:
+        offline = ip_index.lookup(ip)
+        if offline:
+            results[ip] = _from_ip_index(offline)
+            continue
+        hit = cache.get("ip_geo", ip.lower()) if cache.enabled() and not cache.refreshing() else None
+        if hit is not None:
+            results[ip] = hit
+        else:
+            misses.append(ip)
+    
+    if not misses:
+        return results
+    
+    if os.getenv("IPLOCATE_API_KEY", ""):
+        for ip in misses:
+            results[ip] = _lookup_remote(ip)
+        return results
+    
+    found = _batcher.lookup(misses)
+    for ip in misses:
+        value = found.get(ip) or {"host_name": None, "asn": None, "isp": None, "country": None}
+        # A lookup that timed out says nothing about the IP; don't cache it
+        if cache.enabled() and ip in found:
+            cache.put("ip_geo", ip.lower(), value, negative=_is_negative(value))
+        results[ip] = value
+    
+    return results
@@ -0,0 +1,222 @@
+"""Offline IP -> ASN/org/country lookups from a local prefix dataset."""
+
+import bisect
+import gzip
+import ipaddress
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from dotenv import load_dotenv
+
+from .local_store import default_path
+
+load_dotenv()
+
+# Optional: MaxMind-format databases (e.g. GeoLite2-ASN.mmdb)
+try:
+    import maxminddb
+    MAXMINDDB_AVAILABLE = True
+except ImportError:
+    MAXMINDDB_AVAILABLE = False
+
+# Index file built by scripts/build_ip_index.py, or an .mmdb file
+DEFAULT_INDEX_PATH = default_path("ip2asn.idx")
+
+# File layout (all integers big-endian):
+#   header:  magic, record count, string table offset
+#   records: sorted, non-overlapping ranges; IPv4 is stored in the
+#            ::ffff:0:0/96 IPv4-mapped block so one index covers both families
+#   strings: length-prefixed UTF-8 AS descriptions, deduplicated
+MAGIC = b"IPASNv1\0"
+_HEADER = struct.Struct(">8sQQ")
+_RECORD = struct.Struct(">16s16sII2s")  # start, end, asn, org offset, country
+_STRING_LEN = struct.Struct(">H")
+
+_IPV4_MAPPED = 0xFFFF << 32
+
+
+def _ip_key(ip: str) -> bytes:
+    """16-byte sort key for an IPv4 or IPv6 address."""
+    addr = ipaddress.ip_address(ip)
+    if addr.version == 4:
+        return (_IPV4_MAPPED | int(addr)).to_bytes(16, "big")
+    return addr.packed
+
+
+def parse_iptoasn(lines: Iterable[str]) -> Iterator[Tuple[str, str, int, str, str]]:
+    """
+    Parse iptoasn.com TSV rows (range_start, range_end, AS number, country, AS description).
+
+    Unrouted ranges (AS 0) are skipped.
+    """
+    for line in lines:
+        parts = line.rstrip("\n").split("\t")
+        if len(parts) < 5 or not parts[2].isdigit():
+            continue
+        asn = int(parts[2])
+        if asn == 0:
+            continue
+        yield parts[0], parts[1], asn, parts[3], parts[4]
+
+
+def build_index(tsv_path: str, output_path: str) -> int:
+    """
+    Build an index file from an iptoasn-style TSV (plain or .gz).
+
+    Args:
+        tsv_path: Path to ip2asn-v4.tsv, ip2asn-v6.tsv or ip2asn-combined.tsv
+        output_path: Where to write the index
+
+    Returns:
+        Number of ranges in the index
+    """
+    opener = gzip.open if tsv_path.endswith(".gz") else open
+    with opener(tsv_path, "rt", encoding="utf-8", errors="replace") as f:
+        rows = sorted(
+            (_ip_key(start), _ip_key(end), asn, country, org)
+            for start, end, asn, country, org in parse_iptoasn(f)
+        )
+
+    strings = bytearray()
+    string_offsets = {}
+    records = bytearray()
+    for start, end, asn, country, org in rows:
+        if org not in string_offsets:
+            string_offsets[org] = len(strings)
+            encoded = org.encode("utf-8")[:0xFFFF]
+            strings += _STRING_LEN.pack(len(encoded)) + encoded
+        country_code = country.encode("ascii", "replace")[:2] if country not in ("None", "") else b""
+        records += _RECORD.pack(start, end, asn, string_offsets[org], country_code.ljust(2, b"\0"))
+
+    tmp_path = output_path + ".tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(rows), _HEADER.size + len(records)))
+        f.write(records)
+        f.write(strings)
+    # Atomic swap, so running workers never map a half-written file
+    os.replace(tmp_path, output_path)
+    return len(rows)
+
+
+class IPIndex:
+    """
+    Read-only view of an index file.
+
+    The file is memory-mapped rather than loaded, so every process using
+    the same file (e.g. gunicorn workers) shares one copy in the page cache,
+    and opening it costs nothing regardless of size.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self._strings_offset = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an IP index file")
+        self._starts = _RangeStarts(self._mmap, self.count)
+
+    def lookup(self, ip: str) -> Optional[Dict]:
+        """Return {"asn", "org", "country"} for ``ip``, or None if no range covers it."""
+        try:
+            key = _ip_key(ip)
+        except ValueError:
+            return None
+        i = bisect.bisect_right(self._starts, key) - 1
+        if i < 0:
+            return None
+        _, end, asn, org_offset, country = _RECORD.unpack_from(self._mmap, _HEADER.size + i * _RECORD.size)
+        if key > end:
+            return None
+        offset = self._strings_offset + org_offset
+        (length,) = _STRING_LEN.unpack_from(self._mmap, offset)
+        start = offset + _STRING_LEN.size
+        return {
+            "asn": str(asn),
+            "org": self._mmap[start:start + length].decode("utf-8") or None,
+            "country": country.rstrip(b"\0").decode("ascii") or None,
+        }
+
+    def close(self):
+        self._mmap.close()
+
+
+class _RangeStarts:
+    """Sequence of range start keys, read straight from the mapped records (for bisect)."""
+
+    def __init__(self, buffer, count: int):
+        self._buffer = buffer
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i: int) -> bytes:
+        offset = _HEADER.size + i * _RECORD.size
+        return self._buffer[offset:offset + 16]
+
+
+class MMDBIndex:
+    """Lookups against a MaxMind-format database (needs the maxminddb package)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._reader = maxminddb.open_database(path, maxminddb.MODE_MMAP)
+
+    def lookup(self, ip: str) -> Optional[Dict]:
+        try:
+            record = self._reader.get(ip)
+        except ValueError:
+            return None
+        if not record or not record.get("autonomous_system_number"):
+            return None
+        country = (record.get("country") or {}).get("iso_code")
+        return {
+            "asn": str(record["autonomous_system_number"]),
+            "org": record.get("autonomous_system_organization"),
+            "country": country,
+        }
+
+    def close(self):
+        self._reader.close()
+
+
+_index = None
+_index_pid = None
+_index_lock = threading.Lock()
+
+
+def _load_index():
+    path = os.getenv("IP_ASN_DB", DEFAULT_INDEX_PATH)
+    if not os.path.exists(path):
+        return None
+    try:
+        if path.endswith(".mmdb"):
+            if not MAXMINDDB_AVAILABLE:
+                print(f"  ⚠️  {path} needs the maxminddb package; offline IP lookups disabled")
+                return None
+            return MMDBIndex(path)
+        return IPIndex(path)
+    except (OSError, ValueError) as e:
+        print(f"  ⚠️  Could not open IP index {path}: {e}")
+        return None
+
+
+def get_index():
+    """The process-wide index (opened on first use), or None if no dataset is installed."""
+    global _index, _index_pid
+    if _index_pid != os.getpid():
+        with _index_lock:
+            if _index_pid != os.getpid():
+                _index = _load_index()
+                _index_pid = os.getpid()
+    return _index
+
+
+def lookup(ip: str) -> Optional[Dict]:
+    """Offline ASN/org/country for ``ip``, or None on a miss or without a dataset."""
+    index = get_index()
+    return index.lookup(ip) if index else None
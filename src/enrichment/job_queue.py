@@ -0,0 +1,351 @@
+"""
+Background job queue for work the web API hands off.
+
+Jobs live in a SQLite file, so every gunicorn worker process on the host
+shares one queue: a job queued by one process may be run by another, and
+its status can be read from any of them. Each process runs a few worker
+threads, started by start_workers() when the process starts serving (see
+gunicorn.conf.py) and otherwise on its first submit(). Running jobs are
+kept alive by a heartbeat, so jobs of a process that died are picked up
+again however long a live one takes. Handlers can record progress events
+(add_event) that clients tail while the job runs (job_events).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from . import local_store
+from .cache import dumps, loads
+
+load_dotenv()
+
+# Worker threads per process
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Processes refresh the heartbeat of the jobs they are running this often (seconds)
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "15"))
+# A running job without a heartbeat for this many seconds is assumed lost
+# (process killed) and is handed to another worker
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", "120"))
+# Times a job is started before it is given up as failed
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+# Finished jobs (and their results) are kept this many seconds
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+# Idle workers check for jobs queued by other processes this often (seconds)
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        key TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL,
+        result TEXT,
+        error TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)",
+    "CREATE INDEX IF NOT EXISTS jobs_kind_key ON jobs (kind, key)",
+    # Last sign of life from the process running a job
+    """
+    CREATE TABLE IF NOT EXISTS job_heartbeats (
+        job_id TEXT PRIMARY KEY,
+        beat_at REAL NOT NULL
+    )
+    """,
+    # Progress reported by running jobs, in order
+    """
+    CREATE TABLE IF NOT EXISTS job_events (
+        event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_id TEXT NOT NULL,
+        event TEXT NOT NULL,
+        data TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, event_id)",
+]
+
+_handlers: Dict[str, Callable] = {}
+# Jobs this process is running, kept alive by its heartbeat thread
+_running = set()
+# Job the current worker thread is running
+_current = threading.local()
+_wakeup = threading.Event()
+_workers_lock = threading.Lock()
+_workers_pid = None
+
+
+def _connection() -> sqlite3.Connection:
+    return local_store.connect(os.getenv("JOB_QUEUE_DB", local_store.default_path("jobs.sqlite3")), _SCHEMA)
+
+
+def register(kind: str, handler: Callable):
+    """Run jobs of ``kind`` as ``handler(**payload)``; its return value is the job result."""
+    _handlers[kind] = handler
+
+
+def enqueue(kind: str, key: str, payload: Dict) -> Tuple[str, bool]:
+    """
+    Queue a job, unless one of the same kind and key is already queued or running.
+
+    Returns:
+        (job ID, whether a new job was created). When the job already
+        existed, its ID is returned and ``payload`` is dropped.
+    """
+    return enqueue_many(kind, [(key, payload)])[0]
+
+
+def enqueue_many(kind: str, jobs: Iterable[Tuple[str, Dict]]) -> List[Tuple[str, bool]]:
+    """enqueue() for several (key, payload) pairs, in one transaction."""
+    conn = _connection()
+    now = time.time()
+    queued = []
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+                     (now - JOB_RESULT_TTL,))
+        conn.execute("DELETE FROM job_events WHERE job_id NOT IN (SELECT job_id FROM jobs)")
+        for key, payload in jobs:
+            row = conn.execute(
+                "SELECT job_id FROM jobs WHERE kind = ? AND key = ? AND status IN ('queued', 'running')",
+                (kind, key)
+            ).fetchone()
+            if row is not None:
+                queued.append((row[0], False))
+                continue
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, key, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, key, json.dumps(payload), now)
+            )
+            queued.append((job_id, True))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return queued
+
+
+def claim() -> Optional[Tuple[str, str, Dict]]:
+    """
+    Take the oldest runnable job, or None if there is none.
+
+    Runnable means queued, or running without a heartbeat for JOB_TIMEOUT
+    seconds (its process is gone). Lost jobs that have used up
+    JOB_MAX_ATTEMPTS are failed instead. BEGIN IMMEDIATE holds the write lock from the SELECT to
+    the UPDATE, so concurrent workers never claim the same job.
+
+    Returns:
+        (job ID, kind, payload)
+    """
+    conn = _connection()
+    now = time.time()
+    lost_before = now - JOB_TIMEOUT
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        lost = [row[0] for row in conn.execute("""
+            SELECT job_id FROM jobs LEFT JOIN job_heartbeats USING (job_id)
+            WHERE status = 'running' AND COALESCE(beat_at, started_at) < ?
+        """, (lost_before,))]
+        conn.executemany(
+            """UPDATE jobs SET status = 'failed', finished_at = ?, error = 'Worker lost while running the job'
+               WHERE job_id = ? AND attempts >= ?""",
+            ((now, job_id, JOB_MAX_ATTEMPTS) for job_id in lost)
+        )
+        conn.execute("DELETE FROM job_heartbeats WHERE job_id NOT IN (SELECT job_id FROM jobs WHERE status = 'running')")
+        row = conn.execute("""
+            SELECT job_id, kind, payload FROM jobs LEFT JOIN job_heartbeats USING (job_id)
+            WHERE status = 'queued' OR (status = 'running' AND COALESCE(beat_at, started_at) < ?)
+            ORDER BY created_at LIMIT 1
+        """, (lost_before,)).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ?, attempts = attempts + 1 WHERE job_id = ?",
+                (now, row[0])
+            )
+            conn.execute("INSERT OR REPLACE INTO job_heartbeats (job_id, beat_at) VALUES (?, ?)", (row[0], now))
+            # A retried job reports its progress afresh
+            conn.execute("DELETE FROM job_events WHERE job_id = ?", (row[0],))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    if row is None:
+        return None
+    return row[0], row[1], json.loads(row[2])
+
+
+def finish(job_id: str, result=None, error: Optional[str] = None):
+    """Store a job's result, or mark it failed with ``error``."""
+    conn = _connection()
+    conn.execute(
+        "UPDATE jobs SET status = ?, finished_at = ?, result = ?, error = ? WHERE job_id = ?",
+        ("failed" if error else "done", time.time(), None if error else dumps(result), error, job_id)
+    )
+    conn.execute("DELETE FROM job_heartbeats WHERE job_id = ?", (job_id,))
+
+
+def heartbeat(job_ids: Iterable[str]):
+    """Mark running jobs as still alive."""
+    now = time.time()
+    _connection().executemany(
+        "UPDATE job_heartbeats SET beat_at = ? WHERE job_id = ?", ((now, job_id) for job_id in job_ids)
+    )
+
+
+def current_job() -> Optional[str]:
+    """ID of the job the calling worker thread is running, if any."""
+    return getattr(_current, "job_id", None)
+
+
+def add_event(job_id: str, event: str, data):
+    """Record a progress event for a running job."""
+    _connection().execute("INSERT INTO job_events (job_id, event, data) VALUES (?, ?, ?)",
+                          (job_id, event, dumps(data)))
+
+
+def job_events(job_id: str, after: int = 0) -> List[Tuple[int, str, object]]:
+    """
+    A job's progress events recorded after event ID ``after``, oldest first.
+
+    Returns:
+        [(event ID, event, data)]; pass the last event ID back as ``after``
+        to get only newer ones
+    """
+    rows = _connection().execute(
+        "SELECT event_id, event, data FROM job_events WHERE job_id = ? AND event_id > ? ORDER BY event_id",
+        (job_id, after)
+    )
+    return [(event_id, event, loads(data)) for event_id, event, data in rows]
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    """Status of a job, with its result once done; None if the job is unknown (or purged)."""
+    row = _connection().execute("""
+        SELECT job_id, kind, key, status, attempts, created_at, started_at, finished_at, result, error
+        FROM jobs WHERE job_id = ?
+    """, (job_id,)).fetchone()
+    if row is None:
+        return None
+    return {
+        "job_id": row[0],
+        "kind": row[1],
+        "key": row[2],
+        "status": row[3],
+        "attempts": row[4],
+        "created_at": row[5],
+        "started_at": row[6],
+        "finished_at": row[7],
+        "result": loads(row[8]) if row[8] is not None else None,
+        "error": row[9],
+    }
+
+
+def job_statuses(job_ids: Iterable[str]) -> Dict[str, Tuple[str, Optional[str]]]:
+    """{job ID: (status, error)} for many jobs at once; unknown IDs are left out."""
+    job_ids = list(job_ids)
+    statuses = {}
+    for i in range(0, len(job_ids), 500):
+        chunk = job_ids[i:i + 500]
+        rows = _connection().execute(
+            f"SELECT job_id, status, error FROM jobs WHERE job_id IN ({','.join('?' * len(chunk))})", chunk
+        )
+        for job_id, status, error in rows:
+            statuses[job_id] = (status, error)
+    return statuses
+
+
+def run_one() -> bool:
+    """Claim and run a single job. Returns False if there was nothing to run."""
+    job = claim()
+    if job is None:
+        return False
+    job_id, kind, payload = job
+    handler = _handlers.get(kind)
+    if handler is None:
+        finish(job_id, error=f"No handler registered for {kind} jobs")
+        return True
+    _running.add(job_id)
+    _current.job_id = job_id
+    try:
+        result = handler(**payload)
+    except Exception as e:
+        traceback.print_exc()
+        finish(job_id, error=str(e) or type(e).__name__)
+        return True
+    finally:
+        _current.job_id = None
+        _running.discard(job_id)
+    try:
+        finish(job_id, result)
+    except (TypeError, ValueError) as e:
+        finish(job_id, error=f"Job result could not be stored: {e}")
+    return True
+
+
+def _work():
+    # Runs until this process's workers are reset (in tests)
+    pid = os.getpid()
+    while _workers_pid == pid:
+        try:
+            if run_one():
+                continue
+        except sqlite3.Error as e:
+            print(f"  ⚠️  Job queue error: {e}")
+        _wakeup.wait(JOB_POLL_INTERVAL)
+        _wakeup.clear()
+
+
+def _beat():
+    pid = os.getpid()
+    while _workers_pid == pid:
+        time.sleep(JOB_HEARTBEAT_INTERVAL)
+        try:
+            if _running:
+                heartbeat(list(_running))
+        except sqlite3.Error as e:
+            print(f"  ⚠️  Job heartbeat failed: {e}")
+
+
+def start_workers():
+    """
+    Start this process's worker and heartbeat threads, if they aren't running yet.
+
+    Threads don't survive fork, so each server process calls this once it
+    has started (and again after forking).
+    """
+    global _workers_pid
+    if _workers_pid == os.getpid():
+        return
+    with _workers_lock:
+        if _workers_pid != os.getpid():
+            _workers_pid = os.getpid()
+            _running.clear()
+            for i in range(JOB_WORKERS):
+                threading.Thread(target=_work, name=f"job-worker-{i}", daemon=True).start()
+            threading.Thread(target=_beat, name="job-heartbeat", daemon=True).start()
+
+
+def submit(kind: str, key: str, payload: Dict) -> Tuple[str, bool]:
+    """enqueue() a job and make sure there are workers to run it."""
+    return submit_many(kind, [(key, payload)])[0]
+
+
+def submit_many(kind: str, jobs: Iterable[Tuple[str, Dict]]) -> List[Tuple[str, bool]]:
+    """enqueue_many() and make sure there are workers to run the jobs."""
+    queued = enqueue_many(kind, jobs)
+    start_workers()
+    _wakeup.set()
+    return queued
@@ -0,0 +1,41 @@
+"""SQLite files under data/cache/ for state shared by local threads and processes."""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable
+
+CACHE_DIR = Path(__file__).parent.parent.parent / "data" / "cache"
+
+_local = threading.local()
+
+
+def default_path(filename: str) -> str:
+    """Path of a state file in the local cache directory."""
+    return str(CACHE_DIR / filename)
+
+
+def connect(path: str, schema: Iterable[str]) -> sqlite3.Connection:
+    """
+    Connection to ``path`` for the current thread, creating the file and schema on first use.
+
+    SQLite connections can't be shared between threads or survive a fork, so
+    one is kept per (thread, process, path). Connections are in autocommit
+    mode; callers issue BEGIN IMMEDIATE themselves when they need a
+    read-modify-write to be atomic across processes.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None or _local.pid != os.getpid():
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+
+    conn = connections.get(path)
+    if conn is None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        for statement in schema:
+            conn.execute(statement)
+        connections[path] = conn
+    return conn
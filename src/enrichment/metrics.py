@@ -0,0 +1,382 @@
+"""
+Latency and outcome metrics for pipeline stages and external providers.
+
+Metrics are recorded in memory. Processes that call share() (the web app's
+gunicorn workers) also add what they record to a SQLite file every few
+seconds, and render_prometheus() then reports the totals of all of them,
+so every scrape sees the same monotonic counters whichever worker serves it.
+"""
+
+import atexit
+import bisect
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple, Type
+from dotenv import load_dotenv
+
+from . import local_store
+
+load_dotenv()
+
+# Histogram bucket upper bounds in seconds (+Inf is implicit)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Seconds between a sharing process's writes to the metrics file
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS metric_totals (
+        name TEXT NOT NULL,
+        labels TEXT NOT NULL,
+        field TEXT NOT NULL,
+        value REAL NOT NULL,
+        PRIMARY KEY (name, labels, field)
+    )
+    """,
+]
+
+_lock = threading.Lock()
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return BUCKETS[i] if i < len(BUCKETS) else float("inf")
+        return float("inf")
+
+
+# name -> {label tuple -> value}
+_histograms: Dict[str, Dict[Tuple, _Histogram]] = {}
+_counters: Dict[str, Dict[Tuple, float]] = {}
+
+# Metric name -> (help text, label names)
+METRICS = {
+    "enrichment_stage_duration_seconds": ("Time spent in each pipeline stage", ("stage",)),
+    "enrichment_stage_total": ("Pipeline stage runs by outcome", ("stage", "outcome")),
+    "provider_request_duration_seconds": ("Latency of external provider calls", ("provider",)),
+    "provider_requests_total": ("External provider calls by outcome", ("provider", "outcome")),
+    "provider_response_bytes_total": ("Response bytes received from external providers", ("provider",)),
+}
+
+
+def observe(name: str, labels: Tuple, value: float):
+    """Add an observation to a histogram."""
+    if _shared and _flusher_pid != os.getpid():
+        _start_flusher()
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        histogram = series.get(labels)
+        if histogram is None:
+            histogram = series[labels] = _Histogram()
+        histogram.observe(value)
+
+
+def inc(name: str, labels: Tuple, amount: float = 1):
+    """Increment a counter."""
+    if _shared and _flusher_pid != os.getpid():
+        _start_flusher()
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[labels] = series.get(labels, 0) + amount
+
+
+def outcome_of(error: Optional[BaseException]) -> str:
+    """'success', 'timeout' or 'error' for an exception (or None)."""
+    if error is None:
+        return "success"
+    if isinstance(error, TimeoutError) or "Timeout" in type(error).__name__:
+        return "timeout"
+    return "error"
+
+
+def record_stage(stage: str, seconds: float, error: Optional[BaseException] = None):
+    observe("enrichment_stage_duration_seconds", (stage,), seconds)
+    inc("enrichment_stage_total", (stage, outcome_of(error)))
+
+
+def record_provider(provider: str, seconds: float, outcome: str, response_bytes: int = 0):
+    observe("provider_request_duration_seconds", (provider,), seconds)
+    inc("provider_requests_total", (provider, outcome))
+    if response_bytes:
+        inc("provider_response_bytes_total", (provider,), response_bytes)
+
+
+def add_bytes(provider: str, response_bytes: int):
+    """Count bytes read after the call was recorded (streamed bodies)."""
+    if response_bytes:
+        inc("provider_response_bytes_total", (provider,), response_bytes)
+
+
+@contextmanager
+def track_provider(provider: str, not_found: Iterable[Type[BaseException]] = ()):
+    """
+    Time a provider call made inside the block and record its outcome.
+
+    Exceptions propagate unchanged. Those listed in ``not_found`` (e.g.
+    NXDOMAIN) are recorded as outcome "not_found" rather than errors.
+    """
+    not_found = tuple(not_found)
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        outcome = "not_found" if not_found and isinstance(e, not_found) else outcome_of(e)
+        record_provider(provider, time.perf_counter() - start, outcome)
+        raise
+    record_provider(provider, time.perf_counter() - start, "success")
+
+
+def reset():
+    """Drop all recorded metrics (this process's; the shared totals stay)."""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _flushed.clear()
+
+
+# ---------------------------------------------------------------------------
+# Sharing between processes
+# ---------------------------------------------------------------------------
+
+_shared = False
+_flush_lock = threading.Lock()
+_flusher_pid = None
+# (name, labels, field) -> value already added to the shared totals
+_flushed: Dict[Tuple[str, str, str], float] = {}
+
+
+def _connection() -> sqlite3.Connection:
+    return local_store.connect(os.getenv("METRICS_DB", local_store.default_path("metrics.sqlite3")), _SCHEMA)
+
+
+def share():
+    """
+    Add this process's metrics, and those of processes forked from it, to
+    the totals in METRICS_DB. Call before forking workers.
+    """
+    global _shared
+    _shared = True
+
+
+def _values() -> Dict[Tuple[str, str, str], float]:
+    """Every recorded number, keyed by (metric name, JSON labels, field). Call with _lock held."""
+    values = {}
+    for name, series in _histograms.items():
+        for labels, histogram in series.items():
+            key = json.dumps(list(labels))
+            for i, n in enumerate(histogram.counts):
+                values[(name, key, f"bucket{i}")] = n
+            values[(name, key, "sum")] = histogram.sum
+            values[(name, key, "count")] = histogram.count
+    for name, series in _counters.items():
+        for labels, value in series.items():
+            values[(name, json.dumps(list(labels)), "")] = value
+    return values
+
+
+def flush():
+    """Add what this process recorded since its last flush to the shared totals."""
+    with _flush_lock:
+        with _lock:
+            current = _values()
+        deltas = [(name, labels, field, value - _flushed.get((name, labels, field), 0))
+                  for (name, labels, field), value in current.items()
+                  if value != _flushed.get((name, labels, field), 0)]
+        if not deltas:
+            return
+        conn = _connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany("""
+                INSERT INTO metric_totals (name, labels, field, value) VALUES (?, ?, ?, ?)
+                ON CONFLICT (name, labels, field) DO UPDATE SET value = value + excluded.value
+            """, deltas)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        _flushed.update(current)
+
+
+def _flush_quietly():
+    try:
+        flush()
+    except sqlite3.Error as e:
+        print(f"  ⚠️  Could not write shared metrics: {e}")
+
+
+def _flush_periodically():
+    pid = os.getpid()
+    while _flusher_pid == pid:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        _flush_quietly()
+
+
+def _start_flusher():
+    """Start this process's flush thread (once per process, as threads don't survive fork)."""
+    global _flusher_pid
+    with _flush_lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+        # Anything inherited from the parent process is the parent's to report
+        with _lock:
+            _flushed.clear()
+            _flushed.update(_values())
+    threading.Thread(target=_flush_periodically, name="metrics-flush", daemon=True).start()
+    atexit.register(_flush_quietly)
+
+
+def _shared_totals() -> Tuple[Dict[str, Dict[Tuple, _Histogram]], Dict[str, Dict[Tuple, float]]]:
+    """(histograms, counters) summed over every process sharing METRICS_DB."""
+    histograms, counters = {}, {}
+    for name, labels, field, value in _connection().execute(
+        "SELECT name, labels, field, value FROM metric_totals"
+    ):
+        labels = tuple(json.loads(labels))
+        if field == "":
+            counters.setdefault(name, {})[labels] = value
+            continue
+        histogram = histograms.setdefault(name, {}).get(labels)
+        if histogram is None:
+            histogram = histograms[name][labels] = _Histogram()
+        if field == "sum":
+            histogram.sum = value
+        elif field == "count":
+            histogram.count = int(value)
+        else:
+            histogram.counts[int(field[len("bucket"):])] = int(value)
+    return histograms, counters
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def render_prometheus() -> str:
+    """
+    All metrics in the Prometheus text exposition format: the totals of all
+    sharing processes after share(), else this process's.
+    """
+    if _shared:
+        _flush_quietly()
+        histograms, counters = _shared_totals()
+        return _render(histograms, counters)
+    with _lock:
+        return _render(_histograms, _counters)
+
+
+def _render(histograms: Dict[str, Dict[Tuple, _Histogram]], counters: Dict[str, Dict[Tuple, float]]) -> str:
+    lines = []
+    for name, (help_text, label_names) in METRICS.items():
+        if name in histograms:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in sorted(histograms[name].items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS + (float("inf"),), histogram.counts):
+                    cumulative += n
+                    le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                    lines.append(f"{name}_bucket{_format_labels(label_names, labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(label_names, labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_format_labels(label_names, labels)} {histogram.count}")
+        elif name in counters:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in sorted(counters[name].items()):
+                lines.append(f"{name}{_format_labels(label_names, labels)} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def _series_summary(histogram: _Histogram, outcomes: Dict[str, float]) -> Dict:
+    return {
+        "count": histogram.count,
+        "total_seconds": round(histogram.sum, 3),
+        "mean_seconds": round(histogram.sum / histogram.count, 4) if histogram.count else None,
+        "p50_seconds": histogram.quantile(0.5),
+        "p95_seconds": histogram.quantile(0.95),
+        "outcomes": outcomes,
+    }
+
+
+def summary() -> Dict:
+    """
+    Per-stage and per-provider totals, slowest (by total time) first.
+
+    Quantiles are bucket upper bounds, so they are approximate.
+    """
+    def outcomes_by_key(counter_name):
+        grouped = {}
+        for (key, outcome), value in _counters.get(counter_name, {}).items():
+            grouped.setdefault(key, {})[outcome] = int(value)
+        return grouped
+
+    with _lock:
+        stage_outcomes = outcomes_by_key("enrichment_stage_total")
+        provider_outcomes = outcomes_by_key("provider_requests_total")
+        provider_bytes = {key[0]: int(value) for key, value in _counters.get("provider_response_bytes_total", {}).items()}
+
+        stages = {
+            labels[0]: _series_summary(histogram, stage_outcomes.get(labels[0], {}))
+            for labels, histogram in _histograms.get("enrichment_stage_duration_seconds", {}).items()
+        }
+        providers = {}
+        for labels, histogram in _histograms.get("provider_request_duration_seconds", {}).items():
+            providers[labels[0]] = _series_summary(histogram, provider_outcomes.get(labels[0], {}))
+            providers[labels[0]]["bytes"] = provider_bytes.get(labels[0], 0)
+
+    by_total = lambda items: dict(sorted(items.items(), key=lambda item: item[1]["total_seconds"], reverse=True))
+    return {"stages": by_total(stages), "providers": by_total(providers)}
+
+
+def format_summary() -> str:
+    """summary() as a short table for script output."""
+    data = summary()
+    lines = []
+    for section in ("stages", "providers"):
+        if not data[section]:
+            continue
+        lines.append(f"{section.capitalize():<16} {'calls':>7} {'total s':>9} {'mean s':>8} {'p95 s':>7}  outcomes")
+        for name, series in data[section].items():
+            outcomes = ", ".join(f"{k}={v}" for k, v in sorted(series["outcomes"].items()))
+            p95 = series["p95_seconds"]
+            lines.append(f"  {name:<14} {series['count']:>7} {series['total_seconds']:>9.1f} "
+                         f"{series['mean_seconds'] or 0:>8.3f} {p95 if p95 is not None else '-':>7}  {outcomes}")
+    return "\n".join(lines)
+
+
+def write_summary(path: str):
+    """Write summary() as JSON to ``path``."""
+    with open(path, "w") as f:
+        json.dump(summary(), f, indent=2)
@@ -0,0 +1,119 @@
+"""Single homepage fetch shared by every page-based detector."""
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from typing import Dict, List, Optional, Set
+
+from . import http_client, metrics
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+
+class PageSnapshot:
+    """
+    One fetched copy of a site's homepage.
+
+    Tech stack, CMS, payment and header detection all read from the same
+    snapshot so a domain costs one HTTP round trip instead of one per detector.
+    A snapshot with ``ok == False`` means the site could not be fetched and
+    detectors should not try again.
+    """
+
+    def __init__(self, domain: str):
+        self.domain = domain
+        self.url = None  # URL that was requested
+        self.final_url = None  # URL after following redirects
+        self.redirect_chain: List[str] = []
+        self.status_code: Optional[int] = None
+        self.headers = CaseInsensitiveDict()
+        self.body = ""
+        self.peer_cert: Optional[bytes] = None  # DER-encoded TLS certificate
+        self.error: Optional[str] = None
+        self.technologies: Optional[Set[str]] = None  # set by wappalyzer_engine.analyze_snapshot()
+        self._body_lower = None
+
+    @property
+    def ok(self) -> bool:
+        """True if a response (of any status) was received."""
+        return self.status_code is not None
+
+    @property
+    def body_lower(self) -> str:
+        """Lowercased body, computed once."""
+        if self._body_lower is None:
+            self._body_lower = self.body.lower()
+        return self._body_lower
+
+    def header_summary(self) -> Dict:
+        """Header fields stored in ``http_headers`` by the pipeline."""
+        return {
+            "server": self.headers.get("Server"),
+            "x_powered_by": self.headers.get("X-Powered-By"),
+            "content_type": self.headers.get("Content-Type"),
+            "status_code": self.status_code
+        }
+
+
+def _peer_certificate(response) -> Optional[bytes]:
+    """Read the DER peer certificate off the live connection, if any."""
+    try:
+        raw = response.raw
+        connection = getattr(raw, "connection", None) or getattr(raw, "_connection", None)
+        sock = getattr(connection, "sock", None)
+        if sock is None:
+            # http.client detaches the socket from the connection when the
+            # server closes after this response; it still hangs off the body
+            sock = response.raw._fp.fp.raw._sock
+        if sock is not None and hasattr(sock, "getpeercert"):
+            return sock.getpeercert(binary_form=True)
+    except Exception:
+        pass
+    return None
+
+
+def fetch_page(domain: str, timeout: int = 10) -> PageSnapshot:
+    """
+    Fetch a domain's homepage once.
+
+    Tries HTTPS first and falls back to plain HTTP when the TLS connection
+    fails. A timeout is not retried over HTTP since the host is unlikely to
+    answer there either.
+    """
+    snapshot = PageSnapshot(domain)
+
+    if domain.startswith("http"):
+        urls = [domain]
+    else:
+        urls = [f"https://{domain}", f"http://{domain}"]
+
+    for url in urls:
+        snapshot.url = url
+        try:
+            # stream=True keeps the socket attached until the body is read,
+            # so the TLS certificate can be captured from the same connection
+            response = http_client.get(url, retry=False, timeout=timeout, allow_redirects=True,
+                                       verify=False, stream=True, headers={'User-Agent': USER_AGENT})
+        except requests.exceptions.Timeout as e:
+            snapshot.error = str(e)
+            break
+        except Exception as e:
+            snapshot.error = str(e)
+            continue
+
+        try:
+            snapshot.peer_cert = _peer_certificate(response)
+            snapshot.body = response.text
+            metrics.add_bytes("site", len(response.content))
+            snapshot.final_url = response.url
+            snapshot.redirect_chain = [r.url for r in response.history]
+            snapshot.headers = response.headers
+            snapshot.status_code = response.status_code
+            snapshot.error = None
+        except Exception as e:
+            snapshot.error = str(e)
+            continue
+        finally:
+            response.close()
+        break
+
+    return snapshot
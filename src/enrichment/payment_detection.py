@@ -1,53 +1,50 @@
 """Payment processor detection module."""
 
-import requests
 from typing import List, Optional
 
+from .fingerprints import PatternMatcher
+from .page_fetch import PageSnapshot, fetch_page
 
-def detect_payment_processors(domain: str) -> List[str]:
+# Known payment processor indicators
+PAYMENT_INDICATORS = {
+    "stripe": ["stripe.com", "js.stripe.com", "checkout.stripe.com"],
+    "paypal": ["paypal.com", "paypalobjects.com"],
+    "square": ["square.com", "squareup.com"],
+    "braintree": ["braintreegateway.com"],
+    "coinbase": ["coinbase.com", "commerce.coinbase.com"],
+    "bitpay": ["bitpay.com"],
+    "crypto": ["crypto.com", "binance.com", "bitcoin.org"]
+}
+
+# Common payment button classes/IDs; could be various processors
+PAYMENT_PATTERNS = [
+    "paypal-button",
+    "stripe-button",
+    "checkout-button",
+    "payment-button"
+]
+
+# Processors in table order, then the generic buttons reported as "unknown"
+_PAYMENT_MATCHER = PatternMatcher(
+    [(indicator, processor) for processor, indicators in PAYMENT_INDICATORS.items() for indicator in indicators]
+    + [(pattern, "unknown") for pattern in PAYMENT_PATTERNS]
+)
+
+
+def detect_payment_processors(domain: str, snapshot: Optional[PageSnapshot] = None) -> List[str]:
     """Detect payment processors used by a domain."""
     processors = []
     
-    # Known payment processor indicators
-    payment_indicators = {
-        "stripe": ["stripe.com", "js.stripe.com", "checkout.stripe.com"],
-        "paypal": ["paypal.com", "paypalobjects.com"],
-        "square": ["square.com", "squareup.com"],
-        "braintree": ["braintreegateway.com"],
-        "coinbase": ["coinbase.com", "commerce.coinbase.com"],
-        "bitpay": ["bitpay.com"],
-        "crypto": ["crypto.com", "binance.com", "bitcoin.org"]
-    }
+    if snapshot is None:
+        snapshot = fetch_page(domain)
+    if not snapshot.ok:
+        return processors
     
     try:
-        url = f"http://{domain}" if not domain.startswith("http") else domain
-        response = requests.get(url, timeout=10, allow_redirects=True)
-        
-        content = response.text.lower()
-        
-        # Check for payment processor references in HTML
-        for processor, indicators in payment_indicators.items():
-            for indicator in indicators:
-                if indicator in content:
-                    if processor not in processors:
-                        processors.append(processor)
-        
-        # Check for common payment button classes/IDs
-        payment_patterns = [
-            "paypal-button",
-            "stripe-button",
-            "checkout-button",
-            "payment-button"
-        ]
-        
-        for pattern in payment_patterns:
-            if pattern in content:
-                # Could be various processors, mark as detected but unknown
-                if "unknown" not in processors:
-                    processors.append("unknown")
+        # Every processor referenced in the HTML, in one scan
+        processors = _PAYMENT_MATCHER.labels(snapshot.body_lower)
     
     except Exception as e:
         print(f"Payment processor detection failed for {domain}: {e}")
     
     return processors
-
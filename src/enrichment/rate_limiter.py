@@ -0,0 +1,124 @@
+"""Per-provider rate limiting for external APIs, shared across threads and processes."""
+
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from . import local_store
+
+load_dotenv()
+
+# Provider quotas as (requests, period in seconds). A provider may have more
+# than one quota (e.g. per-minute and per-day); every one must have room.
+# Override with RATE_LIMIT_<PROVIDER>=requests/seconds[,requests/seconds],
+# e.g. RATE_LIMIT_VIRUSTOTAL=4/60,500/86400
+PROVIDER_LIMITS: Dict[str, List[Tuple[int, float]]] = {
+    "ip-api": [(45, 60)],                 # ip-api.com free tier
+    "ip-api-batch": [(15, 60)],           # ip-api.com batch endpoint (100 IPs each)
+    "iplocate": [(1000, 86400)],          # IPLocate.io free tier
+    "builtwith": [(10, 86400)],           # BuiltWith free tier
+    "whatcms": [(1, 10)],                 # WhatCMS free tier
+    "virustotal": [(4, 60), (500, 86400)],
+    "abuseipdb": [(1000, 86400)],
+    "securitytrails": [(50, 2592000)],    # 50/month
+}
+
+# How long a caller will block for a token before giving up on the provider.
+# Short (per-minute) quotas are worth waiting for; an exhausted daily quota is not.
+DEFAULT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "120"))
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS rate_limit_calls (
+        provider TEXT NOT NULL,
+        ts REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_rate_limit_calls ON rate_limit_calls (provider, ts)",
+]
+
+
+def _limits_for(provider: str) -> List[Tuple[int, float]]:
+    override = os.getenv("RATE_LIMIT_" + provider.upper().replace("-", "_"), "")
+    if override:
+        limits = []
+        for part in override.split(","):
+            count, period = part.split("/")
+            limits.append((int(count), float(period)))
+        return limits
+    return PROVIDER_LIMITS.get(provider, [])
+
+
+def _connection() -> sqlite3.Connection:
+    return local_store.connect(os.getenv("RATE_LIMIT_DB", local_store.default_path("rate_limits.sqlite3")), _SCHEMA)
+
+
+def _try_acquire(provider: str, limits: List[Tuple[int, float]]) -> float:
+    """Take a token if one is free. Returns 0 on success, else seconds until one frees up."""
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        now = time.time()
+        wait = 0.0
+        for count, period in limits:
+            # The count-th most recent call in the window decides when a slot opens
+            row = conn.execute("""
+                SELECT ts FROM rate_limit_calls
+                WHERE provider = ? AND ts > ?
+                ORDER BY ts DESC LIMIT 1 OFFSET ?
+            """, (provider, now - period, count - 1)).fetchone()
+            if row:
+                wait = max(wait, row[0] + period - now)
+
+        if wait <= 0:
+            longest = max(period for _, period in limits)
+            conn.execute("DELETE FROM rate_limit_calls WHERE provider = ? AND ts <= ?", (provider, now - longest))
+            conn.execute("INSERT INTO rate_limit_calls (provider, ts) VALUES (?, ?)", (provider, now))
+        conn.execute("COMMIT")
+        return max(wait, 0.0)
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def acquire(provider: str, max_wait: Optional[float] = None) -> bool:
+    """
+    Wait for permission to make one request to ``provider``.
+
+    Each request takes a token that returns to the bucket exactly one period
+    later, so no window of that length ever sees more requests than the
+    quota allows - across all threads and processes sharing RATE_LIMIT_DB.
+
+    Args:
+        provider: Provider key, e.g. "ip-api" (unknown providers are unlimited)
+        max_wait: Longest time to block, in seconds (default RATE_LIMIT_MAX_WAIT)
+
+    Returns:
+        True if the request may proceed, False if the quota will not free up in time
+    """
+    limits = _limits_for(provider)
+    if not limits:
+        return True
+    if max_wait is None:
+        max_wait = DEFAULT_MAX_WAIT
+
+    deadline = time.time() + max_wait
+    announced = False
+    while True:
+        try:
+            wait = _try_acquire(provider, limits)
+        except sqlite3.Error as e:
+            # Never let limiter storage problems take down enrichment
+            print(f"  ⚠️  Rate limiter unavailable for {provider}: {e}")
+            return True
+        if wait == 0:
+            return True
+        if time.time() + wait > deadline:
+            print(f"  ⏳ {provider} quota exhausted for the next {wait:.0f}s, skipping")
+            return False
+        if not announced:
+            print(f"  ⏳ {provider} rate limit reached. Waiting {wait:.0f} seconds...")
+            announced = True
+        time.sleep(wait)
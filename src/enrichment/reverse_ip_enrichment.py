@@ -1,10 +1,12 @@
 """Reverse IP lookup and IP reputation enrichment."""
 
-import requests
 from typing import Dict, List
 import os
 from dotenv import load_dotenv
 
+from . import http_client
+from .rate_limiter import acquire
+
 load_dotenv()
 
 
@@ -30,11 +32,11 @@ def reverse_ip_lookup(ip_address: str) -> Dict:
     try:
         # Method 1: SecurityTrails API (free tier available)
         securitytrails_key = os.getenv("SECURITYTRAILS_API_KEY", "")
-        if securitytrails_key:
+        if securitytrails_key and acquire("securitytrails"):
             url = f"https://api.securitytrails.com/v1/domains/list"
             headers = {"APIKEY": securitytrails_key}
             params = {"ipv4": ip_address}
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = http_client.get(url, headers=headers, params=params, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -49,9 +51,9 @@ def reverse_ip_lookup(ip_address: str) -> Dict:
             # Try using dns.reversename (limited results)
             try:
                 import dns.reversename
-                import dns.resolver
+                from .dns_resolver import resolve
                 rev_name = dns.reversename.from_address(ip_address)
-                ptr_records = dns.resolver.resolve(rev_name, 'PTR')
+                ptr_records = resolve(rev_name, 'PTR')
                 result["shared_domains"] = [str(ptr).rstrip('.') for ptr in ptr_records]
                 result["shared_domain_count"] = len(result["shared_domains"])
             except:
@@ -60,11 +62,11 @@ def reverse_ip_lookup(ip_address: str) -> Dict:
         # Method 3: Check IP reputation using free services
         # AbuseIPDB (free tier: 1,000 requests/day)
         abuseipdb_key = os.getenv("ABUSEIPDB_API_KEY", "")
-        if abuseipdb_key:
+        if abuseipdb_key and acquire("abuseipdb"):
             url = "https://api.abuseipdb.com/api/v2/check"
             headers = {"Key": abuseipdb_key, "Accept": "application/json"}
             params = {"ipAddress": ip_address, "maxAgeInDays": 90, "verbose": ""}
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = http_client.get(url, headers=headers, params=params, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
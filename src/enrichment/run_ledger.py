@@ -0,0 +1,172 @@
+"""Run ledger: per-domain and per-stage progress of enrichment runs, for resuming."""
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+
+from . import local_store
+from .cache import dumps, loads
+from .enrichment_pipeline import is_empty_output
+
+load_dotenv()
+
+# Stages whose outputs can't be stored (live objects); they are re-run on
+# resume only if a stage that still has to run depends on them
+UNSAVED_STAGES = {"page"}
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS runs (
+        run_id TEXT PRIMARY KEY,
+        source TEXT,
+        options TEXT,
+        started_at REAL NOT NULL,
+        finished_at REAL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS run_domains (
+        run_id TEXT NOT NULL,
+        domain TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        updated_at REAL,
+        PRIMARY KEY (run_id, domain)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS run_stages (
+        run_id TEXT NOT NULL,
+        domain TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        status TEXT NOT NULL,
+        output TEXT,
+        error TEXT,
+        finished_at REAL NOT NULL,
+        PRIMARY KEY (run_id, domain, stage)
+    )
+    """,
+]
+
+
+def _connection() -> sqlite3.Connection:
+    return local_store.connect(os.getenv("RUN_LEDGER_DB", local_store.default_path("runs.sqlite3")), _SCHEMA)
+
+
+def start_run(domains: Iterable[str], source: Optional[str] = None, options: Optional[Dict] = None) -> str:
+    """
+    Register a new run over ``domains``.
+
+    Returns:
+        The run ID (pass it to --resume to continue the run later)
+    """
+    run_id = time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "INSERT INTO runs (run_id, source, options, started_at) VALUES (?, ?, ?, ?)",
+            (run_id, source, json.dumps(options or {}), time.time())
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO run_domains (run_id, domain) VALUES (?, ?)",
+            ((run_id, domain) for domain in domains)
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return run_id
+
+
+def get_run(run_id: str) -> Optional[Dict]:
+    """Run details plus domain counts by status, or None if the run doesn't exist."""
+    conn = _connection()
+    row = conn.execute(
+        "SELECT run_id, source, options, started_at, finished_at FROM runs WHERE run_id = ?", (run_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    counts = dict(conn.execute(
+        "SELECT status, COUNT(*) FROM run_domains WHERE run_id = ? GROUP BY status", (run_id,)
+    ).fetchall())
+    return {
+        "run_id": row[0],
+        "source": row[1],
+        "options": json.loads(row[2] or "{}"),
+        "started_at": row[3],
+        "finished_at": row[4],
+        "counts": counts,
+    }
+
+
+def pending_domains(run_id: str) -> List[str]:
+    """Domains of the run that are not done yet (never started, interrupted or failed)."""
+    return [row[0] for row in _connection().execute(
+        "SELECT domain FROM run_domains WHERE run_id = ? AND status != 'done' ORDER BY rowid", (run_id,)
+    )]
+
+
+def completed_stages(run_id: str, domain: str) -> Dict:
+    """{stage: output} for the stages of ``domain`` that finished successfully."""
+    outputs = {}
+    for stage, output in _connection().execute(
+        "SELECT stage, output FROM run_stages WHERE run_id = ? AND domain = ? AND status = 'done'",
+        (run_id, domain)
+    ):
+        outputs[stage] = loads(output) if output is not None else None
+    return outputs
+
+
+def record_stage(run_id: str, domain: str, stage: str, output=None, error: Optional[Exception] = None):
+    """
+    Record that ``stage`` finished for ``domain``.
+
+    It counts as failed if ``error`` is set, or if a provider stage came back
+    empty: the lookups return empty results on timeouts and rate limits
+    rather than raising, so those are retried on resume too.
+    """
+    if stage in UNSAVED_STAGES:
+        return
+    if error is None and is_empty_output(stage, output):
+        error = "No data returned (provider error, rate limit or no record)"
+    try:
+        encoded = dumps(output) if output is not None and error is None else None
+        _connection().execute("""
+            INSERT OR REPLACE INTO run_stages (run_id, domain, stage, status, output, error, finished_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (run_id, domain, stage, "failed" if error else "done", encoded,
+              str(error) if error else None, time.time()))
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        # The run goes on; this stage just won't be skipped on resume
+        print(f"  ⚠️  Could not record {stage} for {domain} in run ledger: {e}")
+
+
+def stage_recorder(run_id: str, domain: str) -> Callable:
+    """on_stage callback for enrich_domain() that records into this run."""
+    def on_stage(stage, output, error):
+        record_stage(run_id, domain, stage, output, error)
+    return on_stage
+
+
+def finish_domain(run_id: str, domain: str, ok: bool = True):
+    """Mark ``domain`` done (stored) or failed."""
+    _connection().execute(
+        "UPDATE run_domains SET status = ?, updated_at = ? WHERE run_id = ? AND domain = ?",
+        ("done" if ok else "failed", time.time(), run_id, domain)
+    )
+
+
+def failed_stages(run_id: str, domain: str) -> List[str]:
+    """Stages that failed for ``domain`` in its latest attempt."""
+    return [row[0] for row in _connection().execute(
+        "SELECT stage FROM run_stages WHERE run_id = ? AND domain = ? AND status = 'failed'", (run_id, domain)
+    )]
+
+
+def finish_run(run_id: str):
+    """Stamp the run as finished (it can still be resumed to retry failures)."""
+    _connection().execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), run_id))
@@ -0,0 +1,215 @@
+"""Decide which stored domains need re-enrichment, and which parts of them."""
+
+import math
+import os
+import re
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+
+from .enrichment_pipeline import enrich_domain
+from .whois_enrichment import detect_cdn
+
+load_dotenv()
+
+DAY = 86400
+
+# Refresh groups: pipeline stages refreshed together, the result fields they
+# own, and how long their data stays fresh (override with
+# REFRESH_INTERVAL_<GROUP>=seconds, e.g. REFRESH_INTERVAL_DNS=43200).
+REFRESH_GROUPS: Dict[str, Dict] = {
+    "whois": {
+        "stages": ("whois",),
+        "interval": 30 * DAY,
+        "fields": ("registrar", "creation_date", "whois_data", "expiration_date",
+                   "updated_date", "whois_status", "name_servers"),
+    },
+    "dns": {
+        "stages": ("dns", "ip"),
+        "interval": 1 * DAY,
+        "fields": ("dns_records", "ip_address", "ip_addresses", "ipv6_addresses", "mx_records",
+                   "host_name", "asn", "isp", "country", "ip_locations", "name_servers", "cdn"),
+    },
+    "web": {
+        "stages": ("page", "tech_stack", "cms", "payment", "headers", "ssl"),
+        "interval": 7 * DAY,
+        "fields": ("tech_stack", "cms", "payment_processor", "frameworks", "analytics", "languages",
+                   "web_server", "http_headers", "ssl_info", "cdn"),
+    },
+}
+
+def _whois_name_servers(record: Dict) -> Optional[List]:
+    name_servers = (record.get("whois_data") or {}).get("name_servers")
+    return name_servers if not name_servers or isinstance(name_servers, list) else [name_servers]
+
+
+# Fields more than one group can fill, with where each group keeps its own
+# value, in the pipeline's order of precedence: WHOIS name servers beat NS
+# records, and a CDN seen in DNS beats the tech stack's.
+SHARED_FIELDS: Dict[str, List[Tuple[str, Callable[[Dict], object]]]] = {
+    "name_servers": [
+        ("whois", _whois_name_servers),
+        ("dns", lambda record: (record.get("dns_records") or {}).get("NS")),
+    ],
+    "cdn": [
+        ("dns", lambda record: detect_cdn(record.get("dns_records") or {})),
+        ("web", lambda record: (record.get("tech_stack") or {}).get("cdn")),
+    ],
+}
+
+# Domains whose registration expires within this window get WHOIS re-checked
+# daily, to catch drops and renewals promptly
+EXPIRY_WINDOW = timedelta(days=int(os.getenv("REFRESH_EXPIRY_WINDOW_DAYS", "30")))
+EXPIRY_INTERVAL = DAY
+
+# Dead groups (no answer) back off exponentially up to this long
+MAX_BACKOFF = int(os.getenv("REFRESH_MAX_BACKOFF", str(90 * DAY)))
+
+
+def interval_for(group: str) -> float:
+    """Base refresh interval for ``group`` in seconds."""
+    override = os.getenv(f"REFRESH_INTERVAL_{group.upper()}")
+    return float(override) if override else REFRESH_GROUPS[group]["interval"]
+
+
+def parse_expiration(value) -> Optional[datetime]:
+    """
+    Earliest expiration date in a stored expiration_date value.
+
+    WHOIS results are stored as text, either a single datetime or the repr
+    of a list of them, e.g. "[datetime.datetime(2026, 3, 1, 0, 0), ...]".
+    """
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    text = str(value)
+    dates = [datetime(int(y), int(m), int(d)) for y, m, d in
+             re.findall(r"(\d{4})-(\d{2})-(\d{2})", text) + re.findall(r"datetime\((\d{4}), (\d{1,2}), (\d{1,2})", text)]
+    return min(dates) if dates else None
+
+
+def is_dead(group: str, result: Dict) -> bool:
+    """True if a refresh of ``group`` came back empty (domain gone, host down, ...)."""
+    if group == "whois":
+        return not result.get("registrar") and not result.get("creation_date")
+    if group == "dns":
+        return not result.get("dns_records")
+    if group == "web":
+        return not result.get("http_headers")
+    return False
+
+
+def next_due(group: str, refreshed_at: datetime, failures: int = 0,
+             expiration_date: Optional[datetime] = None) -> datetime:
+    """
+    When ``group`` should next be refreshed.
+
+    Args:
+        group: Refresh group name
+        refreshed_at: When it was last refreshed
+        failures: Consecutive refreshes that came back dead
+        expiration_date: Registration expiry, if known (tightens WHOIS refreshes)
+    """
+    interval = interval_for(group)
+    if group == "whois" and expiration_date and expiration_date - refreshed_at <= EXPIRY_WINDOW:
+        interval = min(interval, EXPIRY_INTERVAL)
+    if failures:
+        interval = min(interval * 2 ** failures, max(MAX_BACKOFF, interval))
+    return refreshed_at + timedelta(seconds=interval)
+
+
+def due_groups(record: Dict, state: Dict[str, Dict], now: datetime) -> Tuple[List[str], float]:
+    """
+    Groups of ``record`` that are stale, with the domain's priority.
+
+    Args:
+        record: Stored enrichment (needs enriched_at and expiration_date)
+        state: {group: {"refreshed_at", "failures"}} from earlier refreshes
+        now: Current time
+
+    Returns:
+        (groups, priority). Priority is how overdue the most overdue group
+        is, in multiples of its interval; never-enriched domains get inf.
+    """
+    if not record.get("enriched_at"):
+        return list(REFRESH_GROUPS), math.inf
+
+    expiration = parse_expiration(record.get("expiration_date"))
+    groups = []
+    priority = 0.0
+    for group in REFRESH_GROUPS:
+        # Domains enriched before the scheduler existed have no per-group rows yet
+        group_state = state.get(group) or {}
+        refreshed_at = group_state.get("refreshed_at") or record["enriched_at"]
+        due = next_due(group, refreshed_at, group_state.get("failures", 0), expiration)
+        if due <= now:
+            groups.append(group)
+            priority = max(priority, (now - due).total_seconds() / interval_for(group))
+    return groups, priority
+
+
+def plan_refresh(records: Iterable[Dict], states: Dict[str, Dict[str, Dict]],
+                 now: Optional[datetime] = None, limit: Optional[int] = None) -> List[Tuple[str, List[str]]]:
+    """
+    Stale domains in priority order.
+
+    Args:
+        records: Stored enrichment rows (as from get_all_enriched_domains)
+        states: {domain: {group: state}} (as from get_refresh_state)
+        now: Current time (default now)
+        limit: Return at most this many domains
+
+    Returns:
+        [(domain, [group, ...]), ...], most overdue first
+    """
+    now = now or datetime.now()
+    planned = []
+    for record in records:
+        groups, priority = due_groups(record, states.get(record["domain"], {}), now)
+        if groups:
+            planned.append((priority, record["domain"], groups))
+    planned.sort(key=lambda item: item[0], reverse=True)
+    if limit:
+        planned = planned[:limit]
+    return [(domain, groups) for _, domain, groups in planned]
+
+
+def apply_refresh(previous: Optional[Dict], fresh: Dict, groups: Iterable[str]) -> Dict:
+    """
+    Overlay the fields of the refreshed ``groups`` onto the stored record.
+
+    Fields of groups that were not refreshed keep their stored values.
+    Shared fields are rebuilt from each group's own data with the pipeline's
+    precedence, so a partial refresh gives the same answer a full enrichment
+    would; they keep their stored value if no group has one.
+    """
+    if not previous:
+        return fresh
+    groups = list(groups)
+    merged = dict(previous)
+    for group in groups:
+        for field in REFRESH_GROUPS[group]["fields"]:
+            if field not in SHARED_FIELDS:
+                merged[field] = fresh.get(field)
+    for field, sources in SHARED_FIELDS.items():
+        if not any(group in groups for group, _ in sources):
+            continue
+        value = next((value for value in (source(merged) for _, source in sources) if value), None)
+        if value:
+            merged[field] = value
+    return merged
+
+
+def refresh_domain(domain: str, groups: List[str], previous: Optional[Dict] = None) -> Dict:
+    """
+    Re-run the stages of ``groups`` for ``domain`` and merge with its stored data.
+
+    Returns:
+        The updated record, with ``refreshed_groups`` ({group: dead?}) added
+    """
+    stages = [stage for group in groups for stage in REFRESH_GROUPS[group]["stages"]]
+    fresh = enrich_domain(domain, stages=stages)
+    record = apply_refresh(previous, fresh, groups)
+    record["refreshed_groups"] = {group: is_dead(group, fresh) for group in groups}
+    return record
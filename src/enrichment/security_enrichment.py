@@ -1,10 +1,12 @@
 """Security headers and threat intelligence enrichment."""
 
-import requests
 from typing import Dict, Optional
 import os
 from dotenv import load_dotenv
 
+from . import http_client
+from .rate_limiter import acquire
+
 load_dotenv()
 
 
@@ -29,7 +31,7 @@ def enrich_security_headers(domain: str) -> Dict:
     
     try:
         url = f"https://{domain}" if not domain.startswith("http") else domain
-        response = requests.get(url, timeout=10, allow_redirects=True, verify=False)
+        response = http_client.get(url, retry=False, timeout=10, allow_redirects=True, verify=False)
         
         headers = dict(response.headers)
         
@@ -100,12 +102,12 @@ def check_threat_intelligence(domain: str, ip_address: str = None) -> Dict:
     
     # VirusTotal API (free tier: 4 requests/minute)
     virustotal_key = os.getenv("VIRUSTOTAL_API_KEY", "")
-    if virustotal_key:
+    if virustotal_key and acquire("virustotal"):
         try:
             # Check domain
             url = f"https://www.virustotal.com/vtapi/v2/domain/report"
             params = {"apikey": virustotal_key, "domain": domain}
-            response = requests.get(url, params=params, timeout=10)
+            response = http_client.get(url, params=params, timeout=10)
             
             if response.status_code == 200:
                 data = response.json()
@@ -124,12 +126,12 @@ def check_threat_intelligence(domain: str, ip_address: str = None) -> Dict:
     # AbuseIPDB for IP reputation (if IP provided)
     if ip_address:
         abuseipdb_key = os.getenv("ABUSEIPDB_API_KEY", "")
-        if abuseipdb_key:
+        if abuseipdb_key and acquire("abuseipdb"):
             try:
                 url = "https://api.abuseipdb.com/api/v2/check"
                 headers = {"Key": abuseipdb_key, "Accept": "application/json"}
                 params = {"ipAddress": ip_address, "maxAgeInDays": 90}
-                response = requests.get(url, headers=headers, params=params, timeout=10)
+                response = http_client.get(url, headers=headers, params=params, timeout=10)
                 
                 if response.status_code == 200:
                     data = response.json()
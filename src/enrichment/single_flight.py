@@ -0,0 +1,67 @@
+"""Coalescing of concurrent identical calls."""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs a function at most once at a time per key.
+
+    Callers asking for a key that is already running wait for that call and
+    get its result (or its exception). A successful result is also handed to
+    callers arriving within ``window`` seconds after it finished, so a burst
+    of requests for the same key costs exactly one call. Failures are never
+    shared past the callers that were already waiting.
+    """
+
+    def __init__(self, window: float = 0.0):
+        self.window = window
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}  # key -> running call
+        self._recent: Dict[Hashable, Tuple[float, Any]] = {}  # key -> (expires, result)
+
+    def do(self, key: Hashable, func: Callable, *args, **kwargs):
+        """Return ``func(*args, **kwargs)``, shared with concurrent callers using the same key."""
+        with self._lock:
+            now = time.monotonic()
+            recent = self._recent.get(key)
+            if recent is not None:
+                if recent[0] > now:
+                    return recent[1]
+                del self._recent[key]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.error is None and self.window > 0:
+                    now = time.monotonic()
+                    # Drop expired results so the map only holds the window's keys
+                    for stale in [k for k, (expires, _) in self._recent.items() if expires <= now]:
+                        del self._recent[stale]
+                    self._recent[key] = (now + self.window, call.result)
+            call.done.set()
+        return call.result
@@ -1,10 +1,20 @@
 """SSL/TLS Certificate enrichment module."""
 
+import asyncio
+import hashlib
+import os
 import socket
 import ssl
-from typing import Dict, Optional
-from datetime import datetime
+from typing import Callable, Dict, Iterable, Optional
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from dotenv import load_dotenv
 
+load_dotenv()
+
+# Handshakes in flight for batch scans, and seconds allowed per host
+SCAN_CONCURRENCY = int(os.getenv("SSL_SCAN_CONCURRENCY", "200"))
+SCAN_TIMEOUT = float(os.getenv("SSL_SCAN_TIMEOUT", "5"))
 
 def enrich_ssl_certificate(domain: str) -> Dict:
     """
@@ -26,45 +36,16 @@ def enrich_ssl_certificate(domain: str) -> Dict:
     
     try:
         # Try HTTPS first
-        context = ssl.create_default_context()
-        context.check_hostname = False
-        context.verify_mode = ssl.CERT_NONE
+        context = _scan_context()
         
         with socket.create_connection((domain, 443), timeout=5) as sock:
             with context.wrap_socket(sock, server_hostname=domain) as ssock:
-                cert = ssock.getpeercert()
-                cipher = ssock.cipher()
-                
-                if cert:
-                    # Extract certificate information
-                    issuer = dict(x[0] for x in cert.get('issuer', []))
-                    subject = dict(x[0] for x in cert.get('subject', []))
-                    
-                    result["ssl_issuer"] = issuer.get('commonName', '') or issuer.get('organizationName', '')
-                    result["ssl_subject"] = subject.get('commonName', '') or subject.get('organizationName', '')
-                    
-                    # Certificate dates
-                    if cert.get('notAfter'):
-                        result["ssl_expires"] = datetime.strptime(
-                            cert['notAfter'], '%b %d %H:%M:%S %Y %Z'
-                        ).isoformat()
-                    if cert.get('notBefore'):
-                        result["ssl_starts"] = datetime.strptime(
-                            cert['notBefore'], '%b %d %H:%M:%S %Y %Z'
-                        ).isoformat()
-                    
-                    # Subject Alternative Names
-                    ext_keyusage = cert.get('subjectAltName', [])
-                    for san_type, san_value in ext_keyusage:
-                        if san_type == 'DNS':
-                            result["ssl_sans"].append(san_value)
-                    
-                    # Certificate fingerprint (SHA256)
-                    cert_der = ssock.getpeercert(binary_form=True)
-                    if cert_der:
-                        import hashlib
-                        result["ssl_fingerprint"] = hashlib.sha256(cert_der).hexdigest()
+                # Without verification getpeercert() only returns the DER form
+                cert_der = ssock.getpeercert(binary_form=True)
+                if cert_der:
+                    result.update(certificate_fields(parse_certificate(cert_der)))
                 
+                cipher = ssock.cipher()
                 if cipher:
                     result["ssl_version"] = cipher[1]  # Protocol version
                     result["ssl_cipher"] = cipher[0]   # Cipher suite
@@ -76,3 +57,143 @@ def enrich_ssl_certificate(domain: str) -> Dict:
     return result
 
 
+def _scan_context() -> ssl.SSLContext:
+    # We want whatever certificate the host presents, valid or not
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def _name_value(name, oid) -> Optional[str]:
+    attributes = name.get_attributes_for_oid(oid)
+    return attributes[0].value if attributes else None
+
+
+def parse_certificate(cert_der: bytes) -> Dict:
+    """
+    Decode a DER certificate.
+    
+    Returns:
+        Dictionary with fingerprint (SHA-256 hex), issuer, subject, sans,
+        not_before, not_after (ISO, UTC) and serial_number
+    """
+    cert = x509.load_der_x509_certificate(cert_der)
+    try:
+        sans = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value.get_values_for_type(x509.DNSName)
+    except x509.ExtensionNotFound:
+        sans = []
+    return {
+        "fingerprint": hashlib.sha256(cert_der).hexdigest(),
+        "issuer": _name_value(cert.issuer, NameOID.COMMON_NAME) or _name_value(cert.issuer, NameOID.ORGANIZATION_NAME),
+        "subject": _name_value(cert.subject, NameOID.COMMON_NAME) or _name_value(cert.subject, NameOID.ORGANIZATION_NAME),
+        "sans": list(sans),
+        "not_before": cert.not_valid_before_utc.replace(tzinfo=None).isoformat(),
+        "not_after": cert.not_valid_after_utc.replace(tzinfo=None).isoformat(),
+        "serial_number": format(cert.serial_number, "x"),
+    }
+
+
+def certificate_fields(cert_info: Dict) -> Dict:
+    """Map parse_certificate() output to the ssl_* fields used in enrichment results."""
+    return {
+        "ssl_issuer": cert_info["issuer"],
+        "ssl_subject": cert_info["subject"],
+        "ssl_expires": cert_info["not_after"],
+        "ssl_starts": cert_info["not_before"],
+        "ssl_sans": cert_info["sans"],
+        "ssl_fingerprint": cert_info["fingerprint"],
+    }
+
+
+async def scan_certificate(domain: str, port: int = 443, timeout: float = SCAN_TIMEOUT,
+                           context: Optional[ssl.SSLContext] = None) -> Optional[Dict]:
+    """
+    Handshake with ``domain`` and return its certificate, or None if it has no usable TLS.
+    
+    Returns:
+        parse_certificate() output plus tls_version and cipher
+    """
+    host = domain.split("://")[-1].split("/")[0]
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=context or _scan_context(), server_hostname=host),
+            timeout
+        )
+    except Exception:
+        return None
+    
+    try:
+        ssl_object = writer.get_extra_info("ssl_object")
+        cert_der = ssl_object.getpeercert(binary_form=True) if ssl_object else None
+        if not cert_der:
+            return None
+        info = parse_certificate(cert_der)
+        cipher = ssl_object.cipher()
+        info["tls_version"] = ssl_object.version()
+        info["cipher"] = cipher[0] if cipher else None
+        return info
+    except Exception:
+        return None
+    finally:
+        writer.close()
+
+
+async def scan_certificates_async(domains: Iterable[str], concurrency: Optional[int] = None,
+                                  timeout: float = SCAN_TIMEOUT, port: int = 443,
+                                  on_result: Optional[Callable[[str, Optional[Dict]], None]] = None) -> Dict[str, Optional[Dict]]:
+    """
+    Scan many hosts concurrently, at most ``concurrency`` handshakes at a time.
+    
+    Returns:
+        {domain: scan_certificate() result or None}
+    """
+    concurrency = max(1, concurrency or SCAN_CONCURRENCY)
+    context = _scan_context()
+    results = {}
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    done = object()
+    
+    async def produce():
+        # Deduplicated as domains stream in, so the input is never held in memory
+        queued = set()
+        try:
+            for domain in domains:
+                if domain in queued:
+                    continue
+                queued.add(domain)
+                await queue.put(domain)
+        finally:
+            for _ in range(concurrency):
+                await queue.put(done)
+    
+    async def work():
+        while True:
+            domain = await queue.get()
+            if domain is done:
+                return
+            results[domain] = await scan_certificate(domain, port=port, timeout=timeout, context=context)
+            if on_result:
+                on_result(domain, results[domain])
+    
+    await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+    return results
+
+
+def scan_certificates(domains: Iterable[str], concurrency: Optional[int] = None,
+                      timeout: float = SCAN_TIMEOUT, port: int = 443,
+                      on_result: Optional[Callable[[str, Optional[Dict]], None]] = None) -> Dict[str, Optional[Dict]]:
+    """
+    Fetch the TLS certificate of every domain, hundreds of handshakes at a time.
+    
+    Args:
+        domains: Domain names (duplicates are scanned once)
+        concurrency: Handshakes in flight (default SSL_SCAN_CONCURRENCY)
+        timeout: Seconds allowed per host (connect + handshake)
+        port: TLS port to connect to
+        on_result: Called with (domain, result) as each scan finishes
+    
+    Returns:
+        {domain: certificate dict or None}; see scan_certificate()
+    """
+    return asyncio.run(scan_certificates_async(domains, concurrency, timeout, port, on_result))
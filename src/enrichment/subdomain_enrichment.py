@@ -1,47 +1,166 @@
 """Subdomain enumeration and discovery module."""
 
-import dns.resolver
-from typing import Dict, List
+import asyncio
+import secrets
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 import os
 from dotenv import load_dotenv
 
+from . import metrics
+from .dns_resolver import NOT_FOUND, get_async_resolver
+
 load_dotenv()
 
+# Wordlist file (one prefix per line, '#' comments allowed); built-in list if unset
+WORDLIST_PATH = os.getenv("SUBDOMAIN_WORDLIST", "")
+# DNS queries in flight per enumeration
+CONCURRENCY = int(os.getenv("SUBDOMAIN_CONCURRENCY", "200"))
+# Random labels resolved up front to detect wildcard DNS
+WILDCARD_PROBES = 3
+
+# Common subdomain prefixes
+COMMON_PREFIXES = [
+    'www', 'mail', 'ftp', 'blog', 'api', 'admin', 'test', 'dev',
+    'staging', 'prod', 'app', 'cdn', 'static', 'assets', 'img',
+    'images', 'media', 'files', 'download', 'upload', 'secure',
+    'ssl', 'vpn', 'remote', 'ssh', 'ns', 'ns1', 'ns2', 'ns3',
+    'webmail', 'email', 'smtp', 'pop', 'imap', 'exchange', 'owa',
+    'cpanel', 'whm', 'webdisk', 'autodiscover', 'autoconfig',
+    'm', 'mobile', 'wap', 'old', 'new', 'backup', 'backups',
+    'beta', 'alpha', 'demo', 'docs', 'support', 'help', 'faq',
+    'shop', 'store', 'cart', 'checkout', 'payment', 'pay',
+    'forum', 'forums', 'community', 'chat', 'irc', 'wiki',
+    'search', 'search2', 'find', 'archive', 'archives'
+]
+
 
-def enumerate_subdomains(domain: str) -> List[str]:
+def iter_wordlist(path: Optional[str] = None) -> Iterator[str]:
     """
-    Enumerate subdomains using common subdomain names and DNS queries.
-    
+    Yield prefixes from a wordlist file one line at a time (never loaded whole).
+
+    Falls back to COMMON_PREFIXES when no file is given or configured.
+    Blank lines, comments and duplicates are skipped.
+    """
+    path = path or WORDLIST_PATH
+    if not path:
+        yield from COMMON_PREFIXES
+        return
+
+    seen = set()
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            prefix = line.strip().lower().rstrip(".")
+            if prefix and not prefix.startswith("#") and prefix not in seen:
+                seen.add(prefix)
+                yield prefix
+
+
+async def _resolve_a(resolver, name: str) -> Set[str]:
+    try:
+        with metrics.track_provider("dns", not_found=NOT_FOUND):
+            answer = await resolver.resolve(name, "A")
+        return {str(rdata) for rdata in answer}
+    except Exception:
+        return set()
+
+
+async def detect_wildcard(domain: str) -> Set[str]:
+    """
+    Resolve a few random labels under ``domain``.
+
     Returns:
-        List of discovered subdomains
+        IPs a wildcard record answers with (empty set if there is no wildcard)
     """
-    subdomains = []
-    
-    # Common subdomain prefixes
-    common_prefixes = [
-        'www', 'mail', 'ftp', 'blog', 'api', 'admin', 'test', 'dev',
-        'staging', 'prod', 'app', 'cdn', 'static', 'assets', 'img',
-        'images', 'media', 'files', 'download', 'upload', 'secure',
-        'ssl', 'vpn', 'remote', 'ssh', 'ns', 'ns1', 'ns2', 'ns3',
-        'webmail', 'email', 'smtp', 'pop', 'imap', 'exchange', 'owa',
-        'cpanel', 'whm', 'webdisk', 'autodiscover', 'autoconfig',
-        'm', 'mobile', 'wap', 'old', 'new', 'backup', 'backups',
-        'beta', 'alpha', 'demo', 'docs', 'support', 'help', 'faq',
-        'shop', 'store', 'cart', 'checkout', 'payment', 'pay',
-        'forum', 'forums', 'community', 'chat', 'irc', 'wiki',
-        'search', 'search2', 'find', 'archive', 'archives', 'old'
-    ]
-    
-    # Try common subdomains
-    for prefix in common_prefixes[:50]:  # Limit to first 50 to avoid timeout
+    resolver = get_async_resolver()
+    probes = [f"{secrets.token_hex(8)}.{domain}" for _ in range(WILDCARD_PROBES)]
+    answers = await asyncio.gather(*(_resolve_a(resolver, name) for name in probes))
+    return set().union(*answers)
+
+
+async def enumerate_subdomains_async(domain: str, wordlist: Optional[Iterable[str]] = None,
+                                     concurrency: Optional[int] = None) -> AsyncIterator[Tuple[str, List[str]]]:
+    """
+    Resolve ``<prefix>.<domain>`` for every prefix, yielding hits as they arrive.
+
+    A fixed pool of ``concurrency`` resolver tasks pulls prefixes from a
+    bounded queue, so memory stays flat however long the wordlist is.
+    Subdomains that only resolve to the domain's wildcard IPs are dropped.
+
+    Args:
+        domain: Parent domain
+        wordlist: Prefixes to try (default: iter_wordlist())
+        concurrency: Queries in flight (default SUBDOMAIN_CONCURRENCY)
+
+    Yields:
+        (subdomain, sorted A records) for each subdomain found
+    """
+    resolver = get_async_resolver()
+    concurrency = max(1, concurrency or CONCURRENCY)
+    wildcard_ips = await detect_wildcard(domain)
+    if wildcard_ips:
+        print(f"  → Wildcard DNS on {domain} ({', '.join(sorted(wildcard_ips))}), filtering matches")
+
+    prefixes = asyncio.Queue(maxsize=concurrency * 2)
+    found = asyncio.Queue()
+    done = object()
+
+    async def produce():
         try:
+            for prefix in (wordlist if wordlist is not None else iter_wordlist()):
+                await prefixes.put(prefix)
+        finally:
+            # Always release the workers, even if reading the wordlist failed
+            for _ in range(concurrency):
+                await prefixes.put(done)
+
+    async def work():
+        while True:
+            prefix = await prefixes.get()
+            if prefix is done:
+                await found.put(done)
+                return
             subdomain = f"{prefix}.{domain}"
-            dns.resolver.resolve(subdomain, 'A')
+            ips = await _resolve_a(resolver, subdomain)
+            if ips and not ips <= wildcard_ips:
+                await found.put((subdomain, sorted(ips)))
+
+    tasks = [asyncio.create_task(produce())] + [asyncio.create_task(work()) for _ in range(concurrency)]
+    try:
+        remaining = concurrency
+        while remaining:
+            item = await found.get()
+            if item is done:
+                remaining -= 1
+            else:
+                yield item
+        # Surface producer errors (e.g. unreadable wordlist)
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def enumerate_subdomains(domain: str, wordlist: Optional[Iterable[str]] = None,
+                         concurrency: Optional[int] = None,
+                         on_found: Optional[Callable[[str, List[str]], None]] = None) -> List[str]:
+    """
+    Enumerate subdomains using common subdomain names and DNS queries.
+
+    Synchronous wrapper around enumerate_subdomains_async(); ``on_found`` is
+    called for each subdomain as soon as it resolves.
+
+    Returns:
+        List of discovered subdomains
+    """
+    async def collect():
+        subdomains = []
+        async for subdomain, ips in enumerate_subdomains_async(domain, wordlist, concurrency):
             subdomains.append(subdomain)
-        except:
-            pass
-    
-    return subdomains
+            if on_found:
+                on_found(subdomain, ips)
+        return subdomains
+
+    return asyncio.run(collect())
 
 
 def enrich_subdomains(domain: str) -> Dict:
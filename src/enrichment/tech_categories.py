@@ -0,0 +1,177 @@
+"""
+Technology -> tech stack field classification.
+
+Detected technologies are sorted into the tech stack fields using the
+categories in the Wappalyzer database, plus our own overrides. The index
+is built once from the shared engine, so classifying a technology is a
+dict lookup. What counts as a CMS is decided by the same whitelist and
+blacklist scripts/clean_cms_data.py uses to clean stored data.
+"""
+
+import threading
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+
+from .wappalyzer_engine import get_engine
+
+# Valid CMS platforms (whitelist)
+VALID_CMS_PLATFORMS = [
+    "wordpress", "joomla", "drupal", "shopify", "squarespace", "wix",
+    "magento", "woocommerce", "prestashop", "opencart", "bigcommerce",
+    "ghost", "grav", "strapi", "contentful", "craft cms", "expressionengine",
+    "typo3", "concrete5", "silverstripe", "sitecore", "umbraco", "kentico",
+    "pimcore", "aem", "adobe experience manager", "liferay", "sharepoint",
+    "dnn", "dotnetnuke", "plone", "modx", "processwire", "textpattern",
+    "bolt", "pico", "kirby", "statamic", "wagtail", "django cms", "weebly",
+    "carrd", "webflow", "tumblr", "medium", "blogger", "blogspot"
+]
+
+# Technologies that are NOT CMS (never stored in the CMS field)
+NOT_CMS = [
+    "bootstrap", "jquery", "nginx", "apache", "cloudflare", "react", "vue",
+    "angular", "node.js", "php", "python", "ruby", "java", "javascript",
+    "typescript", "css", "html", "sass", "less", "webpack", "gulp",
+    "babel", "express", "django", "rails", "laravel", "flask", "spring",
+    "asp.net", "symfony", "fastly", "cloudfront", "akamai", "maxcdn",
+    "keycdn", "bunnycdn", "stackpath", "sucuri", "incapsula", "imperva",
+    # Additional non-CMS technologies found in data
+    "amazon s3", "s3", "jsdelivr", "polyfill", "fingerprintjs", "next.js",
+    "netlify", "statcounter", "google cloud", "amazon web services", "aws",
+    "iconicons", "cloud storage", "cdn", "hosting", "platform", "analytics",
+    "counter", "icons", "font awesome", "fontawesome"
+]
+
+# Wappalyzer category ID -> tech stack field
+CATEGORY_FIELDS = {
+    1: "cms",  # CMS
+    6: "cms",  # Ecommerce
+    11: "cms",  # Blogs
+    10: "analytics",  # Analytics
+    42: "analytics",  # Tag managers
+    12: "javascript_frameworks",  # JavaScript frameworks
+    59: "javascript_frameworks",  # JavaScript libraries
+    18: "frameworks",  # Web frameworks
+    66: "frameworks",  # UI frameworks
+    22: "web_servers",  # Web servers
+    27: "programming_languages",  # Programming languages
+    31: "cdn",  # CDN
+    34: "database",  # Databases
+    23: "caching",  # Caching
+    36: "advertising",  # Advertising
+    41: "payment_processors",  # Payment processors
+    16: "security",  # Security
+}
+
+# Preferred CMS when a page matches several: CMS, then blogs, then ecommerce
+CMS_CATEGORY_RANK = {1: 0, 11: 1, 6: 2}
+
+# Technologies we file differently from their Wappalyzer categories
+FIELD_OVERRIDES = {
+    "Next.js": ("javascript_frameworks",),
+    "Nuxt.js": ("javascript_frameworks",),
+}
+
+# Fallback for technologies missing from the database: (field, name keywords)
+KEYWORD_FIELDS = [
+    ("javascript_frameworks", ["react", "vue", "angular", "next.js", "nuxt", "svelte", "ember",
+                               "backbone", "meteor", "jquery", "lodash", "underscore", "moment", "axios"]),
+    ("frameworks", ["django", "rails", "laravel", "express", "flask", "spring", "asp.net", "symfony",
+                    "bootstrap", "foundation", "bulma", "tailwind", "materialize", "semantic ui"]),
+    ("analytics", ["google tag manager", "google analytics", "matomo", "mixpanel", "segment",
+                   "amplitude", "hotjar", "analytics"]),
+    ("programming_languages", ["node.js", "php", "python", "ruby", "java", "rust", "typescript"]),
+    ("web_servers", ["nginx", "apache", "iis", "lighttpd", "caddy", "tomcat", "jetty"]),
+    ("cdn", ["cloudflare", "cloudfront", "fastly", "akamai", "maxcdn", "keycdn", "bunnycdn",
+             "stackpath", "sucuri", "incapsula", "imperva", "cdn77"]),
+]
+
+_UNRANKED = len(CMS_CATEGORY_RANK)
+
+_index: Optional[Dict[str, Tuple[Tuple[str, ...], int]]] = None
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=4096)
+def is_cms_name(name: str) -> bool:
+    """True if ``name`` passes the CMS whitelist and isn't blacklisted."""
+    name_lower = name.lower()
+    if any(not_cms in name_lower for not_cms in NOT_CMS):
+        return False
+    return any(valid_cms in name_lower for valid_cms in VALID_CMS_PLATFORMS)
+
+
+def is_valid_cms(cms_value) -> bool:
+    """
+    Whether a stored CMS value may stay.
+
+    Unlike is_cms_name(), values on neither list are kept, since they may be
+    a CMS the whitelist doesn't know yet.
+    """
+    if not cms_value:
+        return True  # None/empty is valid
+    cms_lower = str(cms_value).lower()
+    if any(not_cms in cms_lower for not_cms in NOT_CMS):
+        return False
+    return True
+
+
+def _keyword_fields(name: str) -> Tuple[str, ...]:
+    name_lower = name.lower()
+    return tuple(field for field, keywords in KEYWORD_FIELDS if any(k in name_lower for k in keywords))
+
+
+def _entry(name: str, categories: Iterable[int]) -> Tuple[Tuple[str, ...], int]:
+    """(fields, CMS rank) for a technology."""
+    categories = [int(c) for c in categories]
+    if name in FIELD_OVERRIDES:
+        fields = list(FIELD_OVERRIDES[name])
+    else:
+        fields = []
+        for category in categories:
+            field = CATEGORY_FIELDS.get(category)
+            if field and field not in fields:
+                fields.append(field)
+    # CMS membership follows the whitelist, whatever the category says
+    fields = [field for field in fields if field != "cms"]
+    if is_cms_name(name):
+        fields.insert(0, "cms")
+    rank = min((CMS_CATEGORY_RANK.get(c, _UNRANKED) for c in categories), default=_UNRANKED)
+    return tuple(fields), rank
+
+
+def category_index() -> Dict[str, Tuple[Tuple[str, ...], int]]:
+    """Technology name -> (fields, CMS rank) for every technology in the engine's database."""
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                engine = get_engine()
+                if engine is None:
+                    return {}
+                _index = {name: _entry(name, tech.get("cats", [])) for name, tech in engine.technologies.items()}
+    return _index
+
+
+@lru_cache(maxsize=4096)
+def _unindexed_entry(name: str) -> Tuple[Tuple[str, ...], int]:
+    fields = list(_keyword_fields(name))
+    if is_cms_name(name):
+        fields.insert(0, "cms")
+    return tuple(fields), _UNRANKED
+
+
+def classify(name: str) -> Tuple[str, ...]:
+    """Tech stack fields a technology belongs in; empty means "other"."""
+    entry = category_index().get(name) or _unindexed_entry(name)
+    return entry[0]
+
+
+def pick_cms(names: Iterable[str]) -> Optional[str]:
+    """The CMS among detected technologies, preferring dedicated CMS over blog and shop platforms."""
+    index = category_index()
+    candidates = []
+    for name in names:
+        fields, rank = index.get(name) or _unindexed_entry(name)
+        if "cms" in fields:
+            candidates.append((rank, name))
+    return min(candidates)[1] if candidates else None
@@ -0,0 +1,126 @@
+"""Process-wide Wappalyzer fingerprint engine."""
+
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Set
+from dotenv import load_dotenv
+
+from .page_fetch import PageSnapshot
+
+load_dotenv()
+
+# Try to import Wappalyzer (free open-source library)
+try:
+    from Wappalyzer import Wappalyzer, WebPage
+    WAPPALYZER_AVAILABLE = True
+except ImportError:
+    try:
+        # Alternative import path
+        from wappalyzer import Wappalyzer, WebPage
+        WAPPALYZER_AVAILABLE = True
+    except ImportError:
+        WAPPALYZER_AVAILABLE = False
+        print("Note: python-wappalyzer not installed. Install with: pip install python-wappalyzer")
+
+# Local copy of the technologies database; empty means the copy bundled
+# with python-wappalyzer. It is never downloaded.
+TECHNOLOGIES_FILE = os.getenv("WAPPALYZER_TECHNOLOGIES_FILE", "")
+
+if WAPPALYZER_AVAILABLE:
+    class _SharedWappalyzer(Wappalyzer):
+        """
+        Wappalyzer that can be shared between threads and forked workers.
+
+        The stock ``_has_technology`` records confidence and versions in the
+        technology database itself, so results leak between pages and every
+        analysis writes to (and un-shares) the copy-on-write pages. This one
+        only reads the database, and stops at the first matching pattern.
+        """
+
+        def _has_technology(self, technology, webpage) -> bool:
+            # URL patterns never counted as a detection in the stock engine
+            for name, pattern in technology['headers'].items():
+                if name in webpage.headers and pattern['regex'].search(webpage.headers[name]):
+                    return True
+            for pattern in technology['scripts']:
+                for script in webpage.scripts:
+                    if pattern['regex'].search(script):
+                        return True
+            for name, pattern in technology['meta'].items():
+                if name in webpage.meta and pattern['regex'].search(webpage.meta[name]):
+                    return True
+            for pattern in technology['html']:
+                if pattern['regex'].search(webpage.html):
+                    return True
+            return False
+
+
+_engine = None
+_load_failed = False
+_lock = threading.Lock()
+
+
+def technologies_file() -> str:
+    """Path of the technologies database the engine loads."""
+    if TECHNOLOGIES_FILE:
+        return TECHNOLOGIES_FILE
+    package_dir = Path(sys.modules[Wappalyzer.__module__].__file__).parent
+    return str(package_dir / "data" / "technologies.json")
+
+
+def get_engine() -> Optional["Wappalyzer"]:
+    """
+    The shared engine, loaded and compiled on first use.
+
+    Returns None if Wappalyzer is not installed or its database can't be
+    loaded; a failed load is not retried.
+    """
+    global _engine, _load_failed
+    if _engine is not None or _load_failed or not WAPPALYZER_AVAILABLE:
+        return _engine
+    with _lock:
+        if _engine is None and not _load_failed:
+            path = technologies_file()
+            try:
+                start = time.perf_counter()
+                _engine = _SharedWappalyzer.latest(technologies_file=path)
+                print(f"✓ Loaded {len(_engine.technologies)} Wappalyzer technologies from {path} "
+                      f"in {time.perf_counter() - start:.1f}s")
+            except Exception as e:
+                _load_failed = True
+                print(f"  ⚠️  Could not load Wappalyzer technologies from {path}: {e}")
+    return _engine
+
+
+def preload():
+    """
+    Load the engine now.
+
+    Call this at import time of a preloading server (gunicorn --preload) so
+    forked workers share the compiled database instead of each building it.
+    The technology category index is built along with it.
+    """
+    from .tech_categories import category_index
+    category_index()
+
+
+def analyze_snapshot(snapshot: PageSnapshot) -> Optional[Set[str]]:
+    """
+    Technology names Wappalyzer detects on a fetched page.
+
+    The result is kept on the snapshot, so every detector reading the same
+    page shares one HTML parse and one analysis. Returns None if the page
+    was not fetched or the engine is unavailable.
+    """
+    if not snapshot.ok:
+        return None
+    if snapshot.technologies is None:
+        engine = get_engine()
+        if engine is None:
+            return None
+        webpage = WebPage(snapshot.final_url, snapshot.body, snapshot.headers)
+        snapshot.technologies = engine.analyze(webpage)
+    return snapshot.technologies
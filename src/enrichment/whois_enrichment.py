@@ -1,11 +1,39 @@
 """WHOIS and DNS enrichment module."""
 
 import whois
-import dns.resolver
 from typing import Dict, Optional
 from datetime import datetime
 
+from . import metrics
+from .cache import cached
+from .dns_resolver import resolve_many
 
+DNS_RECORD_TYPES = ("A", "AAAA", "MX", "NS", "CNAME")
+
+# Substrings of nameserver/CNAME targets that identify a CDN
+CDN_INDICATORS = {
+    "cloudflare": "Cloudflare",
+    "cloudfront": "AWS CloudFront",
+    "fastly": "Fastly",
+    "akamai": "Akamai",
+    "incapdns": "Incapsula",
+    "azure": "Azure CDN",
+    "google": "Google Cloud CDN"
+}
+
+
+def detect_cdn(dns_records: Dict) -> Optional[str]:
+    """CDN named by a domain's NS or CNAME records, if any."""
+    ns_list = dns_records.get("NS", [])
+    cname_list = dns_records.get("CNAME", [])
+    for indicator, cdn_name in CDN_INDICATORS.items():
+        if any(indicator in str(ns).lower() for ns in ns_list) or \
+           any(indicator in str(cname).lower() for cname in cname_list):
+            return cdn_name
+    return None
+
+
+@cached("whois", is_negative=lambda r: not r.get("registrar") and not r.get("creation_date"))
 def enrich_whois(domain: str) -> Dict:
     """Enrich domain with WHOIS data."""
     result = {
@@ -15,7 +43,8 @@ def enrich_whois(domain: str) -> Dict:
     }
     
     try:
-        w = whois.whois(domain)
+        with metrics.track_provider("whois"):
+            w = whois.whois(domain)
         
         if w:
             result["registrar"] = w.registrar if hasattr(w, 'registrar') else None
@@ -43,6 +72,7 @@ def enrich_whois(domain: str) -> Dict:
     return result
 
 
+@cached("dns", is_negative=lambda r: not r.get("dns_records"))
 def enrich_dns(domain: str) -> Dict:
     """Enrich domain with DNS records."""
     result = {
@@ -52,61 +82,17 @@ def enrich_dns(domain: str) -> Dict:
     }
     
     try:
-        # A record (IPv4)
-        try:
-            a_records = dns.resolver.resolve(domain, 'A')
-            ip_addresses = [str(ip) for ip in a_records]
-            result["dns_records"]["A"] = ip_addresses
-            result["ip_address"] = ip_addresses[0] if ip_addresses else None
-        except Exception:
-            pass
+        # A, AAAA, MX, NS and CNAME are queried concurrently
+        answers = resolve_many((domain, rdtype) for rdtype in DNS_RECORD_TYPES)
+        for rdtype in DNS_RECORD_TYPES:
+            if answers[(domain, rdtype)]:
+                result["dns_records"][rdtype] = answers[(domain, rdtype)]
         
-        # AAAA record (IPv6)
-        try:
-            aaaa_records = dns.resolver.resolve(domain, 'AAAA')
-            result["dns_records"]["AAAA"] = [str(ip) for ip in aaaa_records]
-        except Exception:
-            pass
-        
-        # MX records
-        try:
-            mx_records = dns.resolver.resolve(domain, 'MX')
-            result["dns_records"]["MX"] = [str(mx) for mx in mx_records]
-        except Exception:
-            pass
-        
-        # NS records
-        try:
-            ns_records = dns.resolver.resolve(domain, 'NS')
-            result["dns_records"]["NS"] = [str(ns) for ns in ns_records]
-        except Exception:
-            pass
-        
-        # CNAME records
-        try:
-            cname_records = dns.resolver.resolve(domain, 'CNAME')
-            result["dns_records"]["CNAME"] = [str(cname) for cname in cname_records]
-        except Exception:
-            pass
+        ip_addresses = result["dns_records"].get("A", [])
+        result["ip_address"] = ip_addresses[0] if ip_addresses else None
         
         # Detect CDN from nameservers or CNAME
-        cdn_indicators = {
-            "cloudflare": "Cloudflare",
-            "cloudfront": "AWS CloudFront",
-            "fastly": "Fastly",
-            "akamai": "Akamai",
-            "incapdns": "Incapsula",
-            "azure": "Azure CDN",
-            "google": "Google Cloud CDN"
-        }
-        
-        for indicator, cdn_name in cdn_indicators.items():
-            ns_list = result["dns_records"].get("NS", [])
-            cname_list = result["dns_records"].get("CNAME", [])
-            if any(indicator.lower() in str(ns).lower() for ns in ns_list) or \
-               any(indicator.lower() in str(cname).lower() for cname in cname_list):
-                result["cdn"] = cdn_name
-                break
+        result["cdn"] = detect_cdn(result["dns_records"])
         
     except Exception as e:
         print(f"DNS lookup failed for {domain}: {e}")
@@ -0,0 +1,54 @@
+"""Tests for the dashboard aggregations."""
+
+from src.analysis.aggregations import (
+    build_service_graph, domain_analytics, graph_stats, infrastructure_summary, normalize_provider_name
+)
+
+DOMAINS = [
+    {"domain": "a.com", "host_name": "Cloudflare, Inc.", "isp": "Cloudflare", "cdn": "Cloudflare",
+     "cms": "WordPress", "registrar": "NameCheap, Inc.", "ip_address": "1.1.1.1"},
+    {"domain": "b.com", "host_name": "Cloudflare, Inc.", "isp": "Cloudflare", "cdn": "Cloudflare",
+     "cms": None, "registrar": "Namecheap", "ip_address": "1.1.1.2"},
+    {"domain": "c.com", "host_name": "OVH SAS", "isp": "OVH SAS", "cdn": None,
+     "cms": "WordPress", "registrar": "GoDaddy.com, LLC", "ip_address": "2.2.2.2"},
+]
+
+
+def test_graph_links_domains_to_top_services():
+    graph = build_service_graph(DOMAINS, top_n=2)
+
+    services = [n for n in graph["nodes"] if n["node_type"] == "service"]
+    assert [n["properties"]["name"] for n in services] == ["Cloudflare, Inc.", "Cloudflare"]
+    assert services[0]["properties"]["ip"] == "1.1.1.1"
+    assert graph["stats"] == {"total_domains": 3, "total_services": 2,
+                              "top_services": ["Cloudflare, Inc.", "Cloudflare"]}
+    service_ids = {n["id"] for n in services}
+    assert all(edge["target"] in service_ids for edge in graph["edges"])
+    assert len(graph["edges"]) == 4
+
+    assert graph_stats(graph) == {"total_nodes": 5, "total_edges": 4, "node_types": {"Domain": 3, "Host": 1, "CDN": 1}}
+
+
+def test_analytics_flags_concentrated_columns():
+    result = domain_analytics(DOMAINS)
+
+    by_column = {o["column"]: o for o in result["outliers"]}
+    assert by_column["cdn"]["value"] == "Cloudflare"
+    assert by_column["cdn"]["percentage"] == 66.7
+    assert by_column["cdn"]["severity"] == "medium"
+    assert "registrar" not in by_column  # three different spellings, none reaches 50%
+    assert result["statistics"]["domains_with_cms"] == 2
+    assert result["statistics"]["unique_hosts"] == 2
+    assert domain_analytics([]) == {"outliers": [], "statistics": {}}
+
+
+def test_infrastructure_summary_merges_provider_variants():
+    assert normalize_provider_name("Namecheap") == "Namecheap, Inc."
+    domains = [dict(DOMAINS[i % 2], domain=f"d{i}.com") for i in range(10)]
+
+    summary, bad_actors = infrastructure_summary(domains)
+
+    assert bad_actors["top_registrars"] == [{"name": "Namecheap, Inc.", "count": 10, "percentage": 100.0}]
+    # Host, ISP and CDN roles count each domain once
+    assert bad_actors["top_service_providers"] == [{"name": "Cloudflare, Inc.", "count": 10, "percentage": 100.0}]
+    assert "Total domains analyzed: 10" in summary
@@ -0,0 +1,96 @@
+"""Tests for the persistent lookup cache."""
+
+import asyncio
+from datetime import date
+import pytest
+from src.enrichment import cache
+
+
+@pytest.fixture(autouse=True)
+def cache_db(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_DB", str(tmp_path / "lookups.sqlite3"))
+    monkeypatch.delenv("CACHE_DISABLED", raising=False)
+
+
+def test_cached_function_runs_once():
+    """A second call within the TTL is served from the cache."""
+    calls = []
+
+    @cache.cached("test")
+    def lookup(domain):
+        calls.append(domain)
+        return {"registrar": "Example Registrar", "creation_date": date(2020, 1, 2)}
+
+    first = lookup("Example.com")
+    second = lookup("example.com")
+
+    assert calls == ["Example.com"]
+    assert second == first
+    assert isinstance(second["creation_date"], date)
+
+
+def test_expired_entries_are_refreshed(monkeypatch):
+    """Entries past their TTL are looked up again."""
+    monkeypatch.setenv("CACHE_TTL_TEST", "-1")
+    calls = []
+
+    @cache.cached("test")
+    def lookup(domain):
+        calls.append(domain)
+        return {"value": 1}
+
+    lookup("example.com")
+    lookup("example.com")
+
+    assert len(calls) == 2
+
+
+def test_negative_results_use_negative_ttl(monkeypatch):
+    """Failed lookups are cached, but only for NEGATIVE_TTL."""
+    monkeypatch.setattr(cache, "NEGATIVE_TTL", -1)
+    calls = []
+
+    @cache.cached("test", is_negative=lambda r: not r["records"])
+    def lookup(domain):
+        calls.append(domain)
+        return {"records": []}
+
+    lookup("dead.example")
+    lookup("dead.example")
+
+    assert len(calls) == 2
+
+
+def test_eviction_keeps_most_recent(monkeypatch):
+    """Eviction trims the cache to MAX_ENTRIES, dropping least recently used."""
+    monkeypatch.setattr(cache, "MAX_ENTRIES", 2)
+    for key in ("a", "b", "c"):
+        cache.put("test", key, {"key": key})
+    cache.get("test", "a")
+
+    cache.evict()
+
+    assert cache.get("test", "a") == {"key": "a"}
+    assert cache.get("test", "b") is None
+
+
+def test_refresh_skips_reads_but_writes(monkeypatch):
+    """Inside refresh() lookups run live, and later calls see their results."""
+    calls = []
+
+    @cache.cached("test")
+    def lookup(domain):
+        calls.append(domain)
+        return {"value": len(calls)}
+
+    lookup("example.com")
+
+    async def forced():
+        with cache.refresh():
+            # Stage threads inherit the flag
+            return await asyncio.to_thread(lookup, "example.com")
+
+    assert asyncio.run(forced()) == {"value": 2}
+    assert lookup("example.com") == {"value": 2}
+    assert len(calls) == 2
+    assert not cache.refreshing()
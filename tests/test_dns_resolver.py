@@ -0,0 +1,52 @@
+"""Tests for the shared DNS resolver."""
+
+import time
+import dns.resolver
+from src.enrichment import dns_resolver, whois_enrichment
+
+RECORDS = {
+    ("example.com", "A"): ["93.184.216.34"],
+    ("example.com", "NS"): ["a.iana-servers.net.", "b.iana-servers.net."],
+    ("example.com", "CNAME"): [],
+}
+
+
+def fake_resolve(qname, rdtype="A", **kwargs):
+    time.sleep(0.2)
+    answer = RECORDS.get((str(qname), rdtype))
+    if not answer:
+        raise dns.resolver.NoAnswer()
+    return answer
+
+
+def test_queries_run_concurrently(monkeypatch):
+    """Record types are resolved in parallel, not one after another."""
+    monkeypatch.setattr(dns_resolver, "resolve", fake_resolve)
+
+    start = time.monotonic()
+    answers = dns_resolver.resolve_many(("example.com", rdtype) for rdtype in ("A", "AAAA", "MX", "NS", "CNAME"))
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 0.6
+    assert answers[("example.com", "A")] == ["93.184.216.34"]
+    assert answers[("example.com", "MX")] == []
+
+
+def test_enrich_dns_uses_shared_resolver(monkeypatch):
+    monkeypatch.setattr(dns_resolver, "resolve", fake_resolve)
+
+    result = whois_enrichment.enrich_dns.uncached("example.com")
+
+    assert result["ip_address"] == "93.184.216.34"
+    assert result["dns_records"] == {
+        "A": ["93.184.216.34"],
+        "NS": ["a.iana-servers.net.", "b.iana-servers.net."],
+    }
+
+
+def test_resolver_is_shared_and_cached():
+    resolver = dns_resolver.get_resolver()
+
+    assert dns_resolver.get_resolver() is resolver
+    assert isinstance(resolver.cache, dns.resolver.LRUCache)
+    assert resolver.lifetime == dns_resolver.LIFETIME
@@ -0,0 +1,34 @@
+"""Tests for reading uploaded domain lists."""
+
+import io
+from src.enrichment.domain_import import normalize_domain, read_domain_rows
+
+
+def test_normalize_domain():
+    assert normalize_domain(" https://www.example.com/shop?x=1 ") == "example.com"
+    assert normalize_domain("example.org") == "example.org"
+    assert normalize_domain("") == ""
+
+
+def test_csv_rows_are_read_lazily():
+    lines = io.StringIO("url,source,notes\nhttp://a.example/,list,first\n,list,\nb.example,,\n")
+    rows = read_domain_rows(lines)
+
+    assert next(rows) == {"domain": "a.example", "source": "list", "notes": "first"}
+    assert lines.tell() < len(lines.getvalue())  # the rest hasn't been read yet
+    assert [row["domain"] for row in rows] == ["", "b.example"]
+
+
+def test_csv_without_source_column_uses_default():
+    rows = list(read_domain_rows(["domain\n", "a.example\n"], default_source="Upload"))
+    assert rows == [{"domain": "a.example", "source": "Upload", "notes": ""}]
+
+
+def test_ndjson_rows():
+    lines = ['{"domain": "a.example", "notes": "n"}\n', "\n", '"https://b.example"\n', "{oops\n", "[1]\n"]
+    rows = list(read_domain_rows(lines, "ndjson", default_source="Upload"))
+
+    assert rows[0] == {"domain": "a.example", "source": "Upload", "notes": "n"}
+    assert rows[1]["domain"] == "b.example"
+    assert rows[2]["domain"] == "" and rows[2]["error"].startswith("Invalid JSON")
+    assert rows[3]["domain"] == "" and "error" in rows[3]
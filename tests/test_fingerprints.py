@@ -0,0 +1,74 @@
+"""Tests for the CMS and payment fingerprint matching."""
+
+import pytest
+from src.enrichment import fingerprints
+from src.enrichment.cms_enrichment import detect_cms_enhanced
+from src.enrichment.fingerprints import PatternMatcher, join_fields
+from src.enrichment.page_fetch import PageSnapshot
+from src.enrichment.payment_detection import detect_payment_processors
+
+
+def snapshot(body, headers=None, url="https://shop.example/"):
+    page = PageSnapshot("shop.example")
+    page.status_code = 200
+    page.final_url = url
+    page.body = body
+    page.headers.update(headers or {})
+    return page
+
+
+@pytest.fixture(params=[True, False], ids=["automaton", "fallback"])
+def backend(request, monkeypatch):
+    """Run a test against both matcher backends."""
+    monkeypatch.setattr(fingerprints, "MIN_AUTOMATON_PATTERNS", 1 if request.param else float("inf"))
+
+
+def test_matcher_reports_every_hit_in_priority_order(backend):
+    matcher = PatternMatcher([("mage.js", "Magento"), ("age", "Other"), ("wp-json", "WordPress"), ("age", "Dup")])
+
+    assert matcher.scan("x/mage.js?v=1 wp-json") == [0, 1, 2, 3]
+    assert matcher.labels("wp-json and an image") == ["Other", "WordPress", "Dup"]
+    assert matcher.matches("nothing here") == []
+    assert PatternMatcher([]).scan("anything") == []
+
+
+def test_fields_do_not_match_across_the_separator(backend):
+    matcher = PatternMatcher([("wix.com", "Wix")])
+    assert matcher.scan(join_fields("page by wix", ".com")) == []
+
+
+def test_cms_keeps_first_match_precedence(backend, monkeypatch):
+    # Reload the module matcher under the selected backend
+    from src.enrichment import cms_enrichment
+    monkeypatch.setattr(cms_enrichment, "_CMS_MATCHER", PatternMatcher(cms_enrichment._CMS_MATCHER.table))
+
+    # magento comes before ghost in the table even though it is later in the page
+    page = snapshot("<script src='/ghost/app.js'></script><img src='/skin/frontend/x.png'>")
+    assert detect_cms_enhanced("shop.example", page) == "Magento"
+
+    # Headers and URL are scanned as well
+    assert detect_cms_enhanced("shop.example", snapshot("", {"Link": "<https://cdn.shopify.com/x>"})) == "Shopify"
+    assert detect_cms_enhanced("shop.example", snapshot("", url="https://x.myshopify.com/")) == "Shopify"
+    assert detect_cms_enhanced("shop.example", snapshot("<p>hello</p>")) is None
+
+
+def test_cms_bare_name_falls_back_to_generator_and_powered_by(backend, monkeypatch):
+    from src.enrichment import cms_enrichment
+    monkeypatch.setattr(cms_enrichment, "_CMS_MATCHER", PatternMatcher(cms_enrichment._CMS_MATCHER.table))
+
+    page = snapshot('<meta name="generator" content="Ghost 5.2">')
+    assert detect_cms_enhanced("shop.example", page) == "Ghost"
+    assert detect_cms_enhanced("shop.example", snapshot("", {"X-Powered-By": "Weebly"})) == "Weebly"
+    # The name appearing in running text is not enough
+    assert detect_cms_enhanced("shop.example", snapshot("<p>a ghost story</p>")) is None
+
+
+def test_payment_processors_in_table_order(backend, monkeypatch):
+    from src.enrichment import payment_detection
+    monkeypatch.setattr(payment_detection, "_PAYMENT_MATCHER",
+                        PatternMatcher(payment_detection._PAYMENT_MATCHER.table))
+
+    page = snapshot("<a class='payment-button'></a><script src='https://www.PayPal.com/sdk'></script>"
+                    "<script src='https://js.stripe.com/v3'></script>")
+    assert detect_payment_processors("shop.example", page) == ["stripe", "paypal", "unknown"]
+    assert detect_payment_processors("shop.example", snapshot("<p>cash only</p>")) == []
@@ -0,0 +1,54 @@
+"""Tests for the shared HTTP client."""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from src.enrichment import http_client
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    client_ports = []
+
+    def do_GET(self):
+        self.client_ports.append(self.client_address[1])
+        body = b"ok"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    KeepAliveHandler.client_ports = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_connections_are_reused(server):
+    """Repeated calls to a host go over the same kept-alive connection."""
+    for _ in range(3):
+        assert http_client.get(server, timeout=5).text == "ok"
+
+    assert len(set(KeepAliveHandler.client_ports)) == 1
+
+
+def test_pools_shared_across_threads():
+    """Each thread has its own session, all backed by the same adapter."""
+    sessions = []
+    thread = threading.Thread(target=lambda: sessions.append(http_client.session()))
+    thread.start()
+    thread.join()
+
+    main_session = http_client.session()
+    assert sessions[0] is not main_session
+    assert sessions[0].get_adapter("https://x") is main_session.get_adapter("https://x")
+    assert http_client.session(retry=False).get_adapter("https://x") is not main_session.get_adapter("https://x")
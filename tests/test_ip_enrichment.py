@@ -0,0 +1,108 @@
+"""Tests for batched IP enrichment."""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from src.enrichment import cache, ip_enrichment, rate_limiter
+
+
+class FakeBatchResponse:
+    status_code = 200
+
+    def __init__(self, ips):
+        self._ips = ips
+
+    def json(self):
+        return [
+            {"status": "success", "query": ip, "as": "AS13335 Cloudflare, Inc.",
+             "isp": "Cloudflare", "org": "Cloudflare Inc."}
+            for ip in self._ips
+        ]
+
+
+@pytest.fixture
+def batch_calls(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_DB", str(tmp_path / "lookups.sqlite3"))
+    monkeypatch.setenv("RATE_LIMIT_DB", str(tmp_path / "rate_limits.sqlite3"))
+    monkeypatch.delenv("CACHE_DISABLED", raising=False)
+    monkeypatch.delenv("IPLOCATE_API_KEY", raising=False)
+    monkeypatch.setattr(ip_enrichment, "_batcher", ip_enrichment.IPBatcher(window=0.05))
+
+    calls = []
+
+    def fake_post(url, params=None, json=None, timeout=None):
+        calls.append(list(json))
+        return FakeBatchResponse(json)
+
+    monkeypatch.setattr(ip_enrichment.http_client, "post", fake_post)
+    return calls
+
+
+def test_duplicate_ips_looked_up_once(batch_calls):
+    """Each distinct IP is sent once, in a single batch request."""
+    results = ip_enrichment.enrich_ip_locations(["104.16.1.1", "104.16.1.1", "2606:4700::1"])
+
+    assert batch_calls == [["104.16.1.1", "2606:4700::1"]]
+    assert results["104.16.1.1"]["asn"] == "13335 Cloudflare, Inc."
+    assert set(results) == {"104.16.1.1", "2606:4700::1"}
+
+
+def test_cached_ips_skip_the_api(batch_calls):
+    """IPs resolved earlier in the run come from the cache."""
+    ip_enrichment.enrich_ip_locations(["104.16.1.1"])
+    results = ip_enrichment.enrich_ip_locations(["104.16.1.1", "104.16.2.2"])
+
+    assert batch_calls == [["104.16.1.1"], ["104.16.2.2"]]
+    assert results["104.16.1.1"]["isp"] == "Cloudflare Inc."
+
+
+def test_concurrent_lookups_share_a_batch(batch_calls):
+    """Lookups from concurrent workers are coalesced into one request."""
+    ips = [f"104.16.0.{i}" for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda ip: ip_enrichment.enrich_ip_locations([ip, "104.16.1.1"]), ips))
+
+    assert len(batch_calls) == 1
+    assert sorted(batch_calls[0]) == sorted(ips + ["104.16.1.1"])
+    assert all(r["104.16.1.1"]["host_name"] == "Cloudflare" for r in results)
+
+
+def test_batches_are_capped_at_batch_size(batch_calls):
+    """More IPs than fit in one request are split across batches."""
+    ips = [f"10.0.{i // 256}.{i % 256}" for i in range(250)]
+    results = ip_enrichment.enrich_ip_locations(ips)
+
+    assert [len(batch) for batch in batch_calls] == [100, 100, 50]
+    assert len(results) == 250
+
+
+def test_batch_results_match_iplocate_fields(batch_calls):
+    """host_name/isp come from the organisation, as IPLocate lookups store them."""
+    result = ip_enrichment.enrich_ip_locations(["104.16.1.1"])["104.16.1.1"]
+    assert result == {"host_name": "Cloudflare", "asn": "13335 Cloudflare, Inc.",
+                      "isp": "Cloudflare Inc.", "country": None}
+
+
+def test_timed_out_lookups_are_not_cached(batch_calls, monkeypatch):
+    """IPs whose batch is still pending when the wait runs out aren't cached as empty."""
+    sending, release = threading.Event(), threading.Event()
+
+    def slow_batch(ips):
+        sending.set()
+        release.wait(5)
+        return {}
+
+    monkeypatch.setattr(rate_limiter, "DEFAULT_MAX_WAIT", 0)
+    monkeypatch.setattr(ip_enrichment, "IP_API_BATCH_TIMEOUT", 0.1)
+    monkeypatch.setattr(ip_enrichment, "_ip_api_batch", slow_batch)
+
+    # Another worker is sending the batch this IP is queued in
+    lead = threading.Thread(target=ip_enrichment._batcher.lookup, args=(["104.16.1.1"],))
+    lead.start()
+    assert sending.wait(5)
+    results = ip_enrichment.enrich_ip_locations(["104.16.1.1"])
+    release.set()
+    lead.join()
+
+    assert results["104.16.1.1"]["asn"] is None
+    assert cache.get("ip_geo", "104.16.1.1") is None
@@ -0,0 +1,56 @@
+"""Tests for the offline IP -> ASN index."""
+
+import pytest
+from src.enrichment import ip_enrichment, ip_index
+
+TSV = (
+    "1.0.0.0\t1.0.0.255\t13335\tUS\tCLOUDFLARENET\n"
+    "1.0.4.0\t1.0.7.255\t38803\tAU\tGTELECOM-AUSTRALIA\n"
+    "1.0.8.0\t1.0.15.255\t0\tNone\tNot routed\n"
+    "8.8.8.0\t8.8.8.255\t15169\tUS\tGOOGLE\n"
+    "2606:4700::\t2606:4700:ffff:ffff:ffff:ffff:ffff:ffff\t13335\tUS\tCLOUDFLARENET\n"
+)
+
+
+@pytest.fixture
+def index_path(tmp_path, monkeypatch):
+    tsv = tmp_path / "ip2asn.tsv"
+    tsv.write_text(TSV)
+    path = str(tmp_path / "ip2asn.idx")
+    assert ip_index.build_index(str(tsv), path) == 4
+
+    monkeypatch.setenv("IP_ASN_DB", path)
+    monkeypatch.setattr(ip_index, "_index_pid", None)
+    yield path
+    monkeypatch.setattr(ip_index, "_index_pid", None)
+
+
+def test_lookup_ipv4_and_ipv6(index_path):
+    """Addresses inside a range resolve to that range's ASN."""
+    assert ip_index.lookup("1.0.0.1") == {"asn": "13335", "org": "CLOUDFLARENET", "country": "US"}
+    assert ip_index.lookup("1.0.5.9")["org"] == "GTELECOM-AUSTRALIA"
+    assert ip_index.lookup("8.8.8.8")["asn"] == "15169"
+    assert ip_index.lookup("2606:4700::6810:84e5")["asn"] == "13335"
+
+
+def test_lookup_misses(index_path):
+    """Gaps, unrouted ranges and invalid input are misses."""
+    assert ip_index.lookup("1.0.2.1") is None
+    assert ip_index.lookup("1.0.9.1") is None
+    assert ip_index.lookup("255.255.255.255") is None
+    assert ip_index.lookup("0.0.0.0") is None
+    assert ip_index.lookup("not-an-ip") is None
+
+
+def test_enrich_ip_location_prefers_index(index_path, monkeypatch):
+    """Covered IPs are answered without touching the remote APIs."""
+    def no_network(*args, **kwargs):
+        raise AssertionError("remote API called")
+
+    monkeypatch.setattr(ip_enrichment.http_client, "get", no_network)
+    monkeypatch.setattr(ip_enrichment.http_client, "post", no_network)
+
+    assert ip_enrichment.enrich_ip_location("8.8.8.8") == {
+        "host_name": "GOOGLE", "asn": "15169", "isp": "GOOGLE", "country": "US"
+    }
+    assert ip_enrichment.enrich_ip_locations(["1.0.0.1", "8.8.8.8"])["1.0.0.1"]["asn"] == "13335"
@@ -0,0 +1,166 @@
+"""Tests for the background job queue."""
+
+import threading
+import time
+from datetime import date
+import pytest
+from src.enrichment import job_queue
+
+
+@pytest.fixture(autouse=True)
+def queue_db(tmp_path, monkeypatch):
+    monkeypatch.setenv("JOB_QUEUE_DB", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(job_queue, "_handlers", {})
+
+
+def test_same_key_shares_a_job_until_it_finishes():
+    first, created = job_queue.enqueue("check", "example.com", {"domain": "example.com"})
+    assert created
+    assert job_queue.enqueue("check", "example.com", {"domain": "Example.com"}) == (first, False)
+    other, created = job_queue.enqueue("enrich", "example.com", {"domain": "example.com"})
+    assert created and other != first
+
+    assert job_queue.claim() == (first, "check", {"domain": "example.com"})
+    assert job_queue.enqueue("check", "example.com", {})[0] == first  # still running
+    job_queue.finish(first, {"ok": True})
+    again, created = job_queue.enqueue("check", "example.com", {})
+    assert created and again != first
+
+
+def test_jobs_run_oldest_first_and_are_claimed_once():
+    ids = [job_queue.enqueue("check", f"d{i}.example", {"domain": f"d{i}.example"})[0] for i in range(20)]
+
+    claimed = []
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            job = job_queue.claim()
+            if job is None:
+                return
+            with lock:
+                claimed.append(job[0])
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == sorted(ids)
+    assert job_queue.get_job(ids[0])["status"] == "running"
+
+
+def test_run_one_stores_results_and_errors():
+    def check(domain):
+        if domain == "bad.example":
+            raise ConnectionError("refused")
+        return {"domain": domain, "created": date(2020, 1, 2)}
+
+    job_queue.register("check", check)
+    good, _ = job_queue.enqueue("check", "good.example", {"domain": "good.example"})
+    bad, _ = job_queue.enqueue("check", "bad.example", {"domain": "bad.example"})
+    orphan, _ = job_queue.enqueue("unknown", "x", {})
+
+    assert job_queue.run_one() and job_queue.run_one() and job_queue.run_one()
+    assert not job_queue.run_one()
+
+    job = job_queue.get_job(good)
+    assert job["status"] == "done" and job["attempts"] == 1
+    assert job["result"] == {"domain": "good.example", "created": date(2020, 1, 2)}
+    assert job_queue.get_job(bad)["status"] == "failed"
+    assert job_queue.get_job(bad)["error"] == "refused"
+    assert "No handler" in job_queue.get_job(orphan)["error"]
+    assert job_queue.get_job("missing") is None
+
+
+def test_lost_jobs_are_retried_then_failed(monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_TIMEOUT", 0.05)
+    monkeypatch.setattr(job_queue, "JOB_MAX_ATTEMPTS", 2)
+    job_id, _ = job_queue.enqueue("check", "example.com", {"domain": "example.com"})
+
+    assert job_queue.claim()[0] == job_id
+    assert job_queue.claim() is None  # its worker may still be on it
+    time.sleep(0.1)
+    assert job_queue.claim()[0] == job_id  # assumed lost: run again
+    time.sleep(0.1)
+    assert job_queue.claim() is None
+
+    job = job_queue.get_job(job_id)
+    assert job["status"] == "failed" and job["attempts"] == 2
+
+
+def test_finished_jobs_are_purged_after_ttl(monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_RESULT_TTL", 0.05)
+    job_id, _ = job_queue.enqueue("check", "old.example", {})
+    job_queue.claim()
+    job_queue.finish(job_id, "result")
+    time.sleep(0.1)
+
+    job_queue.enqueue("check", "new.example", {})
+    assert job_queue.get_job(job_id) is None
+
+
+def test_enqueue_many_and_statuses():
+    first, _ = job_queue.enqueue("enrich", "a.example", {})
+    queued = job_queue.enqueue_many("enrich", [("a.example", {}), ("b.example", {}), ("b.example", {})])
+
+    assert queued[0] == (first, False)
+    assert queued[1][1] and queued[2] == (queued[1][0], False)
+
+    job_queue.claim()
+    job_queue.finish(first, error="refused")
+    assert job_queue.job_statuses([first, queued[1][0], "missing"]) == {
+        first: ("failed", "refused"),
+        queued[1][0]: ("queued", None),
+    }
+
+
+
+def test_submit_runs_the_job_in_the_background(monkeypatch):
+    monkeypatch.setattr(job_queue, "_workers_pid", None)
+    monkeypatch.setattr(job_queue, "JOB_WORKERS", 1)
+    job_queue.register("check", lambda domain: {"domain": domain})
+
+    job_id, _ = job_queue.submit("check", "example.com", {"domain": "example.com"})
+    deadline = time.monotonic() + 5
+    while job_queue.get_job(job_id)["status"] != "done" and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert job_queue.get_job(job_id)["result"] == {"domain": "example.com"}
+
+
+def test_jobs_with_a_heartbeat_are_not_taken_over(monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_TIMEOUT", 0.1)
+    job_id, _ = job_queue.enqueue("check", "slow.example", {"domain": "slow.example"})
+
+    assert job_queue.claim()[0] == job_id
+    for _ in range(3):
+        time.sleep(0.05)
+        job_queue.heartbeat([job_id])  # its process is alive, however long it takes
+        assert job_queue.claim() is None
+
+    job_queue.finish(job_id, "result")
+    assert job_queue.get_job(job_id)["attempts"] == 1
+
+
+def test_handlers_record_events_that_can_be_tailed(monkeypatch):
+    def check(domain):
+        job_id = job_queue.current_job()
+        job_queue.add_event(job_id, "stage", {"stage": "dns"})
+        job_queue.add_event(job_id, "stage", {"stage": "whois"})
+        return {"domain": domain}
+
+    job_queue.register("check", check)
+    job_id, _ = job_queue.enqueue("check", "example.com", {"domain": "example.com"})
+    assert job_queue.run_one()
+    assert job_queue.current_job() is None
+
+    events = job_queue.job_events(job_id)
+    assert [data["stage"] for _, _, data in events] == ["dns", "whois"]
+    assert job_queue.job_events(job_id, after=events[0][0]) == events[1:]
+
+    # Purged jobs take their events along
+    monkeypatch.setattr(job_queue, "JOB_RESULT_TTL", -1)
+    job_queue.enqueue("check", "other.example", {})
+    assert job_queue.job_events(job_id) == []
@@ -0,0 +1,109 @@
+"""Tests for stage and provider metrics."""
+
+import json
+import os
+import pytest
+from src.enrichment import enrichment_pipeline, http_client, metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_histogram_buckets_in_prometheus_format():
+    """Observations land in cumulative buckets with sum and count."""
+    metrics.record_stage("dns", 0.02)
+    metrics.record_stage("dns", 3.0, TimeoutError())
+    text = metrics.render_prometheus()
+
+    assert "# TYPE enrichment_stage_duration_seconds histogram" in text
+    assert 'enrichment_stage_duration_seconds_bucket{stage="dns",le="0.025"} 1' in text
+    assert 'enrichment_stage_duration_seconds_bucket{stage="dns",le="+Inf"} 2' in text
+    assert 'enrichment_stage_duration_seconds_count{stage="dns"} 2' in text
+    assert 'enrichment_stage_total{stage="dns",outcome="success"} 1' in text
+    assert 'enrichment_stage_total{stage="dns",outcome="timeout"} 1' in text
+
+
+def test_label_values_are_escaped():
+    metrics.record_provider('odd"name', 0.1, "success")
+    assert 'provider="odd\\"name"' in metrics.render_prometheus()
+
+
+def test_track_provider_outcomes():
+    """Not-found answers are told apart from failures, and exceptions still propagate."""
+    class NotFound(Exception):
+        pass
+
+    with metrics.track_provider("dns", not_found=(NotFound,)):
+        pass
+    with pytest.raises(NotFound):
+        with metrics.track_provider("dns", not_found=(NotFound,)):
+            raise NotFound()
+    with pytest.raises(ValueError):
+        with metrics.track_provider("dns", not_found=(NotFound,)):
+            raise ValueError()
+
+    outcomes = metrics.summary()["providers"]["dns"]["outcomes"]
+    assert outcomes == {"success": 1, "not_found": 1, "error": 1}
+
+
+def test_summary_orders_by_total_time(tmp_path):
+    metrics.record_stage("whois", 2.0)
+    metrics.record_stage("dns", 0.1)
+    metrics.record_stage("dns", 0.1)
+    metrics.record_provider("ip-api", 0.3, "success", 512)
+
+    data = metrics.summary()
+    assert list(data["stages"]) == ["whois", "dns"]
+    assert data["stages"]["dns"]["count"] == 2
+    assert data["providers"]["ip-api"]["bytes"] == 512
+
+    path = tmp_path / "metrics.json"
+    metrics.write_summary(str(path))
+    assert json.loads(path.read_text())["stages"]["whois"]["outcomes"] == {"success": 1}
+    assert "whois" in metrics.format_summary()
+
+
+def test_provider_names():
+    assert http_client.provider_for("http://ip-api.com/batch") == "ip-api"
+    assert http_client.provider_for("https://example.com/", retry=False) == "site"
+    assert http_client.provider_for("https://html.duckduckgo.com/html/") == "html.duckduckgo.com"
+
+
+def test_pipeline_records_stage_outcomes(monkeypatch):
+    """Every stage that runs is timed, failed ones counted as errors."""
+    def failing(domain, outputs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(enrichment_pipeline.STAGES, "whois",
+                        (failing,) + enrichment_pipeline.STAGES["whois"][1:])
+    enrichment_pipeline.enrich_domain("example.com", stages=["whois"])
+
+    assert metrics.summary()["stages"]["whois"]["outcomes"] == {"error": 1}
+
+
+def test_shared_totals_add_up_across_processes(tmp_path, monkeypatch):
+    """Each process adds only what is new, and /metrics reports the sum."""
+    monkeypatch.setenv("METRICS_DB", str(tmp_path / "metrics.sqlite3"))
+    monkeypatch.setattr(metrics, "_shared", True)
+    monkeypatch.setattr(metrics, "_flusher_pid", os.getpid())  # no background thread
+
+    metrics.record_stage("dns", 0.02)
+    metrics.record_provider("ip-api", 0.3, "success", 512)
+    metrics.flush()
+    metrics.flush()  # nothing new: nothing added
+
+    # Another worker, with its own in-memory metrics
+    metrics.reset()
+    metrics.record_stage("dns", 3.0, TimeoutError())
+    text = metrics.render_prometheus()
+
+    assert 'enrichment_stage_duration_seconds_count{stage="dns"} 2' in text
+    assert 'enrichment_stage_duration_seconds_bucket{stage="dns",le="0.025"} 1' in text
+    assert 'enrichment_stage_total{stage="dns",outcome="success"} 1' in text
+    assert 'enrichment_stage_total{stage="dns",outcome="timeout"} 1' in text
+    assert 'provider_response_bytes_total{provider="ip-api"} 512' in text
+    assert metrics.summary()["stages"]["dns"]["count"] == 1  # scripts' summary stays per process
@@ -0,0 +1,99 @@
+"""Tests for versioned schema migrations (no database needed)."""
+
+import pytest
+from src.database import migrations
+
+
+class FakeDatabase:
+    """Just enough of a connection to track schema_migrations."""
+
+    def __init__(self, versions=None):
+        self.versions = set(versions) if versions is not None else None  # None: no table yet
+        self.statements = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.fail_on = None
+        self._pending = set()
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+        if self._pending:
+            self.versions |= self._pending
+            self._pending = set()
+
+    def rollback(self):
+        self.rollbacks += 1
+        self._pending = set()
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def execute(self, sql, params=None):
+        sql = " ".join(sql.split())
+        self.db.statements.append(sql)
+        if self.db.fail_on and self.db.fail_on in sql:
+            raise RuntimeError(f"failed: {sql}")
+        if "to_regclass" in sql:
+            self.result = [(self.db.versions is not None,)]
+        elif "MAX(version)" in sql:
+            self.result = [(max(self.db.versions, default=0),)]
+        elif sql.startswith("SELECT version FROM schema_migrations"):
+            self.result = [(version,) for version in self.db.versions]
+        elif sql.startswith("CREATE TABLE IF NOT EXISTS schema_migrations"):
+            if self.db.versions is None:
+                self.db.versions = set()
+        elif sql.startswith("INSERT INTO schema_migrations"):
+            self.db._pending.add(params[0])
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+def test_versions_are_sequential():
+    versions = [version for version, _, _ in migrations.MIGRATIONS]
+    assert versions == list(range(1, len(versions) + 1))
+    assert migrations.LATEST_VERSION == versions[-1]
+
+
+def test_fresh_database_gets_every_migration_in_order():
+    db = FakeDatabase()
+    assert migrations.migrate(db) == [version for version, _, _ in migrations.MIGRATIONS]
+    assert db.statements[1].startswith("SELECT pg_advisory_lock")  # after the version check
+    assert db.statements[-1].startswith("SELECT pg_advisory_unlock")
+    assert migrations.current_version(db) == migrations.LATEST_VERSION
+
+
+def test_current_database_is_only_read():
+    db = FakeDatabase(versions=range(1, migrations.LATEST_VERSION + 1))
+    assert migrations.migrate(db) == []
+    assert len(db.statements) == 2 and all(sql.startswith("SELECT") for sql in db.statements)
+
+
+def test_only_pending_migrations_run():
+    db = FakeDatabase(versions=range(1, migrations.LATEST_VERSION))
+    assert migrations.migrate(db) == [migrations.LATEST_VERSION]
+    assert not any("CREATE TABLE IF NOT EXISTS domains" in sql for sql in db.statements)
+
+
+def test_failed_migration_is_rolled_back_and_not_recorded():
+    db = FakeDatabase(versions=[1])
+    db.fail_on = "ALTER COLUMN cms TYPE TEXT"
+
+    with pytest.raises(RuntimeError):
+        migrations.migrate(db)
+
+    assert db.versions == {1, 2}  # the migration before it stays applied
+    assert db.rollbacks == 1
+    assert db.statements[-1].startswith("SELECT pg_advisory_unlock")
@@ -0,0 +1,144 @@
+"""Tests for PostgresClient's pooled connections (no database needed)."""
+
+import psycopg2
+import pytest
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+from src.database import postgres_client
+from src.database.postgres_client import PostgresClient
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        self.conn.statements.append(sql)
+        if self.conn.fail is not None:
+            error, self.conn.fail = self.conn.fail, None
+            self.conn.status = extensions.TRANSACTION_STATUS_INERROR
+            if "server closed" in str(error):
+                self.conn.closed = 2  # what psycopg2 does when the server went away
+            raise error
+        self.conn.status = extensions.TRANSACTION_STATUS_INTRANS
+
+    def fetchall(self):
+        return [("a.example",)]
+
+    def fetchone(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+        self.statements = []
+        self.rollbacks = 0
+        self.fail = None
+
+    @property
+    def info(self):
+        return self
+
+    @property
+    def transaction_status(self):
+        return self.status
+
+    def cursor(self, cursor_factory=None):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """Connections opened through the pool, newest last."""
+    opened = []
+
+    def connect(*args, **kwargs):
+        opened.append(FakeConnection())
+        return opened[-1]
+
+    monkeypatch.setattr(psycopg2, "connect", connect)
+    monkeypatch.setattr(postgres_client, "_pools", {})
+    monkeypatch.setattr(postgres_client, "_pools_pid", None)
+    # Skip table creation
+    key = tuple(sorted(postgres_client.connect_params().items()))
+    monkeypatch.setattr(postgres_client, "_schema_ready", {key})
+    return opened
+
+
+def test_clients_reuse_pooled_connections(connections):
+    first = PostgresClient()
+    first.get_existing_domains(["a.example"])
+    first.close()
+    first.close()  # closing twice is harmless
+
+    second = PostgresClient()
+    third = PostgresClient()
+    assert second.conn is connections[0]
+    assert third.conn is connections[1]
+    assert connections[0].rollbacks == 1  # the read's transaction wasn't left open
+
+
+def test_dead_connection_is_replaced_and_call_retried(connections):
+    first, second = PostgresClient(), PostgresClient()
+    first.close()
+    second.close()
+
+    client = PostgresClient()
+    dead = client.conn
+    dead.fail = psycopg2.OperationalError("server closed the connection unexpectedly")
+    assert client.get_existing_domains(["a.example"]) == {"a.example"}
+
+    assert len(connections) == 3 and client.conn is connections[2]
+    assert all(conn.closed for conn in connections[:2])  # idle ones from before the drop too
+    client.close()
+
+
+def test_errors_on_live_connections_are_not_retried(connections):
+    client = PostgresClient()
+    client.conn.fail = psycopg2.OperationalError("canceling statement due to statement timeout")
+
+    with pytest.raises(psycopg2.OperationalError):
+        client.get_existing_domains(["a.example"])
+    assert len(connections) == 1
+    client.close()
+    assert connections[0].rollbacks == 1 and not connections[0].closed
+
+
+def test_callers_wait_for_a_free_connection(connections, monkeypatch):
+    monkeypatch.setattr(postgres_client, "POOL_SIZE", 1)
+    monkeypatch.setattr(postgres_client, "POOL_TIMEOUT", 0.05)
+
+    client = PostgresClient()
+    with pytest.raises(PoolError):
+        PostgresClient()
+    client.close()
+    PostgresClient().close()
+
+
+def test_existing_domains_match_case_insensitively(connections):
+    client = PostgresClient()
+    assert client.get_existing_domains(["A.Example", "b.example"]) == {"A.Example"}
+    assert "lower(domain)" in connections[0].statements[-1]
+    client.close()
+
+
+def test_enriched_domain_is_looked_up_case_insensitively(connections):
+    client = PostgresClient()
+    assert client.get_enriched_domain("A.Example") is None
+    assert "lower(d.domain) = %s" in connections[0].statements[-1]
+    client.close()
@@ -0,0 +1,47 @@
+"""Tests for the shared per-provider rate limiter."""
+
+import threading
+import pytest
+from src.enrichment import rate_limiter
+
+
+@pytest.fixture
+def limiter_db(tmp_path, monkeypatch):
+    monkeypatch.setenv("RATE_LIMIT_DB", str(tmp_path / "limits.sqlite3"))
+    return tmp_path
+
+
+def test_unknown_provider_is_unlimited(limiter_db):
+    """Providers without a quota never block."""
+    assert all(rate_limiter.acquire("no-such-provider", max_wait=0) for _ in range(100))
+
+
+def test_quota_is_enforced(limiter_db, monkeypatch):
+    """The request past the quota is refused when the caller won't wait."""
+    monkeypatch.setenv("RATE_LIMIT_TEST_PROVIDER", "3/60")
+    assert [rate_limiter.acquire("test-provider", max_wait=0) for _ in range(4)] == [True, True, True, False]
+
+
+def test_quota_is_shared_across_threads(limiter_db, monkeypatch):
+    """Concurrent callers together never exceed the quota."""
+    monkeypatch.setenv("RATE_LIMIT_TEST_PROVIDER", "10/60")
+    granted = []
+
+    def worker():
+        for _ in range(5):
+            granted.append(rate_limiter.acquire("test-provider", max_wait=0))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert granted.count(True) == 10
+
+
+def test_token_returns_after_period(limiter_db, monkeypatch):
+    """A caller willing to wait gets the next token once the window slides."""
+    monkeypatch.setenv("RATE_LIMIT_TEST_PROVIDER", "1/0.2")
+    assert rate_limiter.acquire("test-provider", max_wait=0)
+    assert rate_limiter.acquire("test-provider", max_wait=1)
@@ -0,0 +1,175 @@
+"""Tests for checkpointed, resumable runs."""
+
+from datetime import date
+import pytest
+from src.enrichment import enrichment_pipeline, run_ledger
+
+
+@pytest.fixture(autouse=True)
+def ledger_db(tmp_path, monkeypatch):
+    monkeypatch.setenv("RUN_LEDGER_DB", str(tmp_path / "runs.sqlite3"))
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    """Small stage graph: whois, page, and two page-based stages (one flaky)."""
+    calls = []
+    flaky = {"fail": True}
+
+    def run_whois(domain, outputs):
+        calls.append("whois")
+        return {"registrar": "Example", "creation_date": date(2020, 1, 2)}
+
+    def run_page(domain, outputs):
+        calls.append("page")
+        return object()
+
+    def run_cms(domain, outputs):
+        calls.append("cms")
+        assert outputs["page"] is not None
+        return "WordPress"
+
+    def run_payment(domain, outputs):
+        calls.append("payment")
+        if flaky["fail"]:
+            raise ConnectionError("reset by peer")
+        return ["stripe"]
+
+    def merge_whois(result, value):
+        result.update(value)
+
+    def merge_cms(result, value):
+        result["cms"] = value
+
+    def merge_payment(result, value):
+        result["payment_processor"] = ", ".join(value)
+
+    monkeypatch.setattr(enrichment_pipeline, "STAGES", {
+        "whois": (run_whois, (), merge_whois),
+        "page": (run_page, (), None),
+        "cms": (run_cms, ("page",), merge_cms),
+        "payment": (run_payment, ("page",), merge_payment),
+    })
+    return calls, flaky
+
+
+def enrich(run_id, domain):
+    return enrichment_pipeline.enrich_domain(
+        domain, completed=run_ledger.completed_stages(run_id, domain),
+        on_stage=run_ledger.stage_recorder(run_id, domain)
+    )
+
+
+def test_resume_reruns_only_failed_stages(stages):
+    calls, flaky = stages
+    run_id = run_ledger.start_run(["a.com", "b.com"], source="domains.csv", options={"limit": 2})
+
+    result = enrich(run_id, "a.com")
+    assert result["payment_processor"] is None
+    assert run_ledger.failed_stages(run_id, "a.com") == ["payment"]
+    run_ledger.finish_domain(run_id, "a.com", ok=False)
+
+    # Resume: whois and cms come from the ledger; page is re-fetched because payment needs it
+    calls.clear()
+    flaky["fail"] = False
+    result = enrich(run_id, "a.com")
+
+    assert sorted(calls) == ["page", "payment"]
+    assert result["cms"] == "WordPress"
+    assert result["creation_date"] == date(2020, 1, 2)
+    assert result["payment_processor"] == "stripe"
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """WHOIS, DNS and IP stages that, like the real lookups, return empty results when a provider is down."""
+    calls = []
+    down = set()
+
+    def run_whois(domain, outputs):
+        calls.append("whois")
+        if "whois" in down:
+            return {"registrar": None, "creation_date": None, "whois_data": {}}
+        return {"registrar": "Example", "creation_date": date(2020, 1, 2), "whois_data": {}}
+
+    def run_dns(domain, outputs):
+        calls.append("dns")
+        return {"dns_records": {} if "dns" in down else {"A": ["192.0.2.1"]}}
+
+    def run_ip(domain, outputs):
+        calls.append("ip")
+        ips = outputs["dns"]["dns_records"].get("A")
+        return {ip: {"asn": "64500", "isp": "Example Hosting"} for ip in ips} if ips else None
+
+    def merge(result, value):
+        result.update(value)
+
+    def merge_ip(result, value):
+        result["ip_locations"] = value
+
+    monkeypatch.setattr(enrichment_pipeline, "STAGES", {
+        "whois": (run_whois, (), merge),
+        "dns": (run_dns, (), merge),
+        "ip": (run_ip, ("dns",), merge_ip),
+    })
+    return calls, down
+
+
+def test_empty_provider_result_is_retried_on_resume(providers):
+    calls, down = providers
+    run_id = run_ledger.start_run(["a.com"])
+
+    down.add("whois")  # e.g. rate limited: enrich_whois returns an empty result
+    assert enrich(run_id, "a.com")["registrar"] is None
+    assert run_ledger.failed_stages(run_id, "a.com") == ["whois"]
+
+    calls.clear()
+    down.clear()
+    result = enrich(run_id, "a.com")
+
+    assert calls == ["whois"]
+    assert result["registrar"] == "Example"
+    assert result["ip_locations"] == {"192.0.2.1": {"asn": "64500", "isp": "Example Hosting"}}
+    assert run_ledger.failed_stages(run_id, "a.com") == []
+
+
+def test_stage_left_empty_by_a_failed_dependency_is_rerun(providers):
+    calls, down = providers
+    run_id = run_ledger.start_run(["a.com"])
+
+    down.add("dns")  # no IPs, so the IP stage has nothing to look up
+    enrich(run_id, "a.com")
+    assert run_ledger.failed_stages(run_id, "a.com") == ["dns"]
+
+    calls.clear()
+    down.clear()
+    result = enrich(run_id, "a.com")
+
+    assert sorted(calls) == ["dns", "ip"]
+    assert result["ip_locations"] == {"192.0.2.1": {"asn": "64500", "isp": "Example Hosting"}}
+
+
+def test_page_skipped_when_no_dependent_is_pending(stages):
+    calls, flaky = stages
+    flaky["fail"] = False
+    run_id = run_ledger.start_run(["a.com"])
+    run_ledger.record_stage(run_id, "a.com", "cms", "Joomla")
+    run_ledger.record_stage(run_id, "a.com", "payment", ["paypal"])
+
+    result = enrich(run_id, "a.com")
+
+    assert calls == ["whois"]
+    assert result["cms"] == "Joomla"
+
+
+def test_pending_domains_and_run_info():
+    run_id = run_ledger.start_run(["a.com", "b.com", "c.com"], source="domains.csv", options={"limit": 3})
+    run_ledger.finish_domain(run_id, "a.com")
+    run_ledger.finish_domain(run_id, "b.com", ok=False)
+
+    assert run_ledger.pending_domains(run_id) == ["b.com", "c.com"]
+    run = run_ledger.get_run(run_id)
+    assert run["source"] == "domains.csv"
+    assert run["options"] == {"limit": 3}
+    assert run["counts"] == {"done": 1, "failed": 1, "pending": 1}
+    assert run_ledger.get_run("missing") is None
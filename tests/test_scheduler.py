@@ -0,0 +1,83 @@
+"""Tests for the staleness scheduler."""
+
+import math
+from datetime import datetime, timedelta
+from src.enrichment import scheduler
+
+NOW = datetime(2025, 6, 1, 12, 0)
+
+
+def record(domain, enriched_days_ago, expiration_date=None):
+    return {
+        "domain": domain,
+        "enriched_at": NOW - timedelta(days=enriched_days_ago) if enriched_days_ago is not None else None,
+        "expiration_date": expiration_date,
+    }
+
+
+def test_groups_follow_their_intervals():
+    """After two days only DNS/IP is stale; after ten, the web data too."""
+    groups, _ = scheduler.due_groups(record("a.com", 2), {}, NOW)
+    assert groups == ["dns"]
+
+    groups, _ = scheduler.due_groups(record("a.com", 10), {}, NOW)
+    assert groups == ["dns", "web"]
+
+
+def test_never_enriched_domains_come_first():
+    plan = scheduler.plan_refresh([record("old.com", 40), record("new.com", None), record("fresh.com", 0)], {}, now=NOW)
+
+    assert plan[0] == ("new.com", ["whois", "dns", "web"])
+    assert plan[1] == ("old.com", ["whois", "dns", "web"])
+    assert "fresh.com" not in dict(plan)
+    assert scheduler.due_groups(record("new.com", None), {}, NOW)[1] == math.inf
+
+
+def test_expiring_domains_get_daily_whois():
+    expiring = record("expiring.com", 2, expiration_date="[datetime.datetime(2025, 6, 20, 0, 0), datetime.datetime(2025, 6, 21, 0, 0)]")
+
+    groups, _ = scheduler.due_groups(expiring, {}, NOW)
+
+    assert "whois" in groups
+    assert scheduler.parse_expiration("2027-01-05 10:00:00") == datetime(2027, 1, 5)
+
+
+def test_dead_groups_back_off_exponentially():
+    refreshed = NOW - timedelta(days=3)
+    state = {"dns": {"refreshed_at": refreshed, "failures": 2}}
+
+    groups, _ = scheduler.due_groups(record("dead.com", 3), state, NOW)
+
+    assert "dns" not in groups
+    assert scheduler.next_due("dns", refreshed, failures=2) == refreshed + timedelta(days=4)
+    assert scheduler.next_due("dns", refreshed, failures=20) == refreshed + timedelta(seconds=scheduler.MAX_BACKOFF)
+
+
+def test_refresh_only_overwrites_refreshed_groups():
+    previous = {"domain": "a.com", "registrar": "Old Registrar", "ip_address": "192.0.2.1",
+                "name_servers": ["ns1.old.net"], "cms": "WordPress"}
+    fresh = {"domain": "a.com", "registrar": None, "ip_address": "198.51.100.2",
+             "name_servers": [], "cms": None, "dns_records": {"A": ["198.51.100.2"]}}
+
+    merged = scheduler.apply_refresh(previous, fresh, ["dns"])
+
+    assert merged["ip_address"] == "198.51.100.2"
+    assert merged["registrar"] == "Old Registrar"
+    assert merged["cms"] == "WordPress"
+    assert merged["name_servers"] == ["ns1.old.net"]
+
+    # Conflicting values keep the pipeline's precedence
+    previous.update({"whois_data": {"name_servers": ["ns1.old.net"]}, "cdn": "Cloudflare",
+                     "dns_records": {"NS": ["kim.ns.cloudflare.com"]}, "tech_stack": {"cdn": "Cloudflare"}})
+    fresh_dns = dict(fresh, dns_records={"NS": ["kim.ns.cloudflare.com", "bob.ns.cloudflare.com"]},
+                     name_servers=["kim.ns.cloudflare.com", "bob.ns.cloudflare.com"], cdn="Cloudflare")
+    assert scheduler.apply_refresh(previous, fresh_dns, ["dns"])["name_servers"] == ["ns1.old.net"]
+    fresh_web = dict(fresh, tech_stack={"cdn": "Fastly"}, cdn="Fastly")
+    assert scheduler.apply_refresh(previous, fresh_web, ["web"])["cdn"] == "Cloudflare"
+
+    # ...and the lower-precedence source fills in when the other has nothing
+    previous.update({"whois_data": {}, "dns_records": {"NS": ["ns1.host.net"]}, "cdn": "Fastly",
+                     "tech_stack": {"cdn": "Fastly"}})
+    assert scheduler.apply_refresh(previous, fresh_dns, ["dns"])["name_servers"] == fresh_dns["name_servers"]
+    fresh_web = dict(fresh, tech_stack={"cdn": "Akamai"}, cdn="Akamai")
+    assert scheduler.apply_refresh(previous, fresh_web, ["web"])["cdn"] == "Akamai"
@@ -0,0 +1,80 @@
+"""Tests for coalescing concurrent identical calls."""
+
+import threading
+import time
+import pytest
+from src.enrichment.single_flight import SingleFlight
+
+
+def run_concurrently(count, target):
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    def enrich(domain):
+        calls.append(domain)
+        time.sleep(0.2)
+        return {"domain": domain}
+
+    results = run_concurrently(8, lambda: flight.do("a.com", enrich, "a.com"))
+
+    assert calls == ["a.com"]
+    assert all(result is results[0] for result in results)
+    # Without a window the next call runs again
+    flight.do("a.com", enrich, "a.com")
+    assert len(calls) == 2
+
+
+def test_result_is_shared_within_the_window(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    flight = SingleFlight(window=10)
+    calls = []
+
+    def enrich(domain):
+        calls.append(domain)
+        return len(calls)
+
+    assert flight.do("a.com", enrich, "a.com") == 1
+    clock[0] += 9
+    assert flight.do("a.com", enrich, "a.com") == 1
+    assert flight.do("b.com", enrich, "b.com") == 2
+    clock[0] += 2
+    assert flight.do("a.com", enrich, "a.com") == 3
+    assert list(flight._recent) == ["b.com", "a.com"]
+
+
+def test_failures_reach_waiters_but_are_not_kept():
+    flight = SingleFlight(window=60)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        time.sleep(0.2)
+        raise RuntimeError("site down")
+
+    results = run_concurrently(4, lambda: flight.do("a.com", failing))
+
+    assert len(calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    with pytest.raises(RuntimeError):
+        flight.do("a.com", failing)
+    assert len(calls) == 2
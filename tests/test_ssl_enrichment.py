@@ -0,0 +1,121 @@
+"""Tests for TLS certificate parsing and batch scanning."""
+
+import datetime
+import ssl
+import threading
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+from src.enrichment import ssl_enrichment
+
+
+@pytest.fixture(scope="module")
+def certificate(tmp_path_factory):
+    """Self-signed certificate for shop.example with two SANs."""
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "shop.example")])
+    issuer = x509.Name([x509.NameAttribute(NameOID.ORGANIZATION_NAME, "Test CA")])
+    now = datetime.datetime(2025, 1, 1)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(issuer)
+        .public_key(key.public_key())
+        .serial_number(0xABC123)
+        .not_valid_before(now)
+        .not_valid_after(now + datetime.timedelta(days=90))
+        .add_extension(x509.SubjectAlternativeName([x509.DNSName("shop.example"), x509.DNSName("www.shop.example")]), critical=False)
+        .sign(key, hashes.SHA256())
+    )
+    directory = tmp_path_factory.mktemp("tls")
+    (directory / "cert.pem").write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    (directory / "key.pem").write_bytes(key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ))
+    return directory, cert.public_bytes(serialization.Encoding.DER)
+
+
+@pytest.fixture
+def tls_server(certificate):
+    """TLS server on a random local port that completes handshakes and hangs up."""
+    import socket
+
+    directory, _ = certificate
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(directory / "cert.pem", directory / "key.pem")
+    listener = socket.create_server(("127.0.0.1", 0))
+    listener.settimeout(0.2)
+    stop = threading.Event()
+
+    def serve():
+        while not stop.is_set():
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                continue
+            try:
+                with context.wrap_socket(conn, server_side=True):
+                    pass
+            except (ssl.SSLError, OSError):
+                pass
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield listener.getsockname()[1]
+    stop.set()
+    thread.join()
+    listener.close()
+
+
+def test_parse_certificate(certificate):
+    _, der = certificate
+    info = ssl_enrichment.parse_certificate(der)
+
+    assert info["subject"] == "shop.example"
+    assert info["issuer"] == "Test CA"
+    assert info["sans"] == ["shop.example", "www.shop.example"]
+    assert info["not_after"] == "2025-04-01T00:00:00"
+    assert info["serial_number"] == "abc123"
+    assert len(info["fingerprint"]) == 64
+
+
+def test_scan_certificates(tls_server, certificate):
+    _, der = certificate
+    seen = []
+
+    results = ssl_enrichment.scan_certificates(
+        ["localhost", "127.0.0.1", "localhost"], port=tls_server, timeout=5,
+        on_result=lambda domain, cert: seen.append(domain)
+    )
+
+    assert sorted(seen) == ["127.0.0.1", "localhost"]
+    assert results["localhost"]["fingerprint"] == results["127.0.0.1"]["fingerprint"]
+    assert results["localhost"]["sans"] == ["shop.example", "www.shop.example"]
+    assert results["localhost"]["tls_version"].startswith("TLS")
+
+
+def test_scan_unreachable_host():
+    assert ssl_enrichment.scan_certificates(["nonexistent.invalid"], timeout=1) == {"nonexistent.invalid": None}
+
+
+def test_scan_reads_domains_as_it_goes(monkeypatch):
+    """Input is consumed (and deduplicated) lazily, not loaded up front."""
+    consumed = []
+    consumed_at_first_scan = []
+
+    def domains():
+        for i in range(100):
+            consumed.append(i)
+            yield f"d{i % 50}.example"
+
+    async def fake_scan(domain, port, timeout, context):
+        consumed_at_first_scan.append(len(consumed))
+        return {"domain": domain}
+
+    monkeypatch.setattr(ssl_enrichment, "scan_certificate", fake_scan)
+    results = ssl_enrichment.scan_certificates(domains(), concurrency=2)
+
+    assert len(results) == 50
+    assert consumed_at_first_scan[0] < 10
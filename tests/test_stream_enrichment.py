@@ -0,0 +1,43 @@
+"""Tests for reporting an enrichment's progress stage by stage."""
+
+import pytest
+from src.enrichment import enrichment_pipeline
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    """DNS fills in the IP, WHOIS the registrar; the CDN stage times out."""
+    def run_dns(domain, outputs):
+        return {"dns_records": {"A": ["192.0.2.1"]}}
+
+    def run_whois(domain, outputs):
+        return {"registrar": "Example Registrar"}
+
+    def run_cdn(domain, outputs):
+        raise TimeoutError("timed out")
+
+    def merge_dns(result, value):
+        result["ip_address"] = value["dns_records"]["A"][0]
+
+    def merge_whois(result, value):
+        result.update(value)
+
+    monkeypatch.setattr(enrichment_pipeline, "STAGES", {
+        "whois": (run_whois, (), merge_whois),
+        "dns": (run_dns, (), merge_dns),
+        "cdn": (run_cdn, (), lambda result, value: None),
+    })
+
+
+def test_each_stage_reports_the_fields_it_changed(stages):
+    reported = []
+    on_stage = enrichment_pipeline.stage_reporter("example.com", reported.append)
+    result = enrichment_pipeline.enrich_domain("example.com", on_stage=on_stage)
+
+    by_stage = {progress["stage"]: progress for progress in reported}
+    assert by_stage == {
+        "dns": {"stage": "dns", "fields": {"ip_address": "192.0.2.1"}, "error": None},
+        "whois": {"stage": "whois", "fields": {"registrar": "Example Registrar"}, "error": None},
+        "cdn": {"stage": "cdn", "fields": {}, "error": "timed out"},
+    }
+    assert result["ip_address"] == "192.0.2.1" and result["registrar"] == "Example Registrar"
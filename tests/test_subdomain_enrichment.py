@@ -0,0 +1,71 @@
+"""Tests for async subdomain enumeration."""
+
+import asyncio
+import dns.resolver
+import pytest
+from src.enrichment import subdomain_enrichment
+
+
+class FakeAsyncResolver:
+    """Answers from a fixed zone, optionally with a wildcard record."""
+
+    def __init__(self, zone, wildcard=None, delay=0.05):
+        self.zone = zone
+        self.wildcard = wildcard
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def resolve(self, name, rdtype="A"):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            answer = self.zone.get(name) or self.wildcard
+            if not answer:
+                raise dns.resolver.NXDOMAIN()
+            return answer
+        finally:
+            self.in_flight -= 1
+
+
+@pytest.fixture
+def wordlist(tmp_path):
+    path = tmp_path / "words.txt"
+    words = [f"host{i}" for i in range(2000)] + ["# comment", "", "WWW", "www", "mail"]
+    path.write_text("\n".join(words))
+    return str(path)
+
+
+def test_enumerates_large_wordlist_concurrently(wordlist, monkeypatch):
+    resolver = FakeAsyncResolver({"www.example.com": ["192.0.2.1"], "mail.example.com": ["192.0.2.2"],
+                                  "host1500.example.com": ["192.0.2.3"]})
+    monkeypatch.setattr(subdomain_enrichment, "get_async_resolver", lambda: resolver)
+
+    found = []
+    subdomains = subdomain_enrichment.enumerate_subdomains(
+        "example.com", subdomain_enrichment.iter_wordlist(wordlist), concurrency=100,
+        on_found=lambda name, ips: found.append((name, ips))
+    )
+
+    assert sorted(subdomains) == ["host1500.example.com", "mail.example.com", "www.example.com"]
+    assert ("www.example.com", ["192.0.2.1"]) in found
+    assert resolver.max_in_flight <= 100
+
+
+def test_wildcard_matches_are_filtered(monkeypatch):
+    resolver = FakeAsyncResolver({"shop.example.com": ["198.51.100.7"]}, wildcard=["203.0.113.9"], delay=0)
+    monkeypatch.setattr(subdomain_enrichment, "get_async_resolver", lambda: resolver)
+
+    subdomains = subdomain_enrichment.enumerate_subdomains("example.com", ["www", "shop", "mail"])
+
+    assert subdomains == ["shop.example.com"]
+
+
+def test_unreadable_wordlist_raises(monkeypatch, tmp_path):
+    monkeypatch.setattr(subdomain_enrichment, "get_async_resolver", lambda: FakeAsyncResolver({}))
+
+    with pytest.raises(FileNotFoundError):
+        subdomain_enrichment.enumerate_subdomains(
+            "example.com", subdomain_enrichment.iter_wordlist(str(tmp_path / "missing.txt"))
+        )
@@ -0,0 +1,56 @@
+"""Tests for the technology category index."""
+
+import pytest
+from src.enrichment import tech_categories, wappalyzer_engine
+from src.enrichment.page_fetch import PageSnapshot
+from src.enrichment.tech_categories import classify, is_cms_name, is_valid_cms, pick_cms
+from src.enrichment.tech_stack_enrichment import get_wappalyzer_library_tech_stack
+
+if not wappalyzer_engine.WAPPALYZER_AVAILABLE:
+    pytest.skip("python-wappalyzer not installed", allow_module_level=True)
+
+
+def test_fields_come_from_wappalyzer_categories():
+    assert classify("Nginx") == ("web_servers",)
+    assert classify("Stripe") == ("payment_processors",)
+    assert classify("MySQL") == ("database",)
+    assert classify("Google Tag Manager") == ("analytics",)
+    assert classify("Next.js") == ("javascript_frameworks",)  # override
+    assert classify("Cart Functionality") == ()
+    # Not in the database: falls back to name keywords
+    assert classify("Acme Analytics Pro") == ("analytics",)
+
+
+def test_cms_follows_the_cleanup_whitelist():
+    for name in ("WordPress", "Shopify", "Webflow"):
+        assert "cms" in classify(name) and is_valid_cms(name)
+    # CMS-category technologies the cleanup script would remove are never a CMS
+    for name in ("Amazon S3", "Netlify", "Bootstrap"):
+        assert "cms" not in classify(name) and not is_valid_cms(name)
+    assert not is_cms_name("Some Unknown CMS") and is_valid_cms("Some Unknown CMS")
+
+    assert pick_cms({"WooCommerce", "WordPress", "PHP"}) == "WordPress"
+    assert pick_cms({"PHP"}) is None
+
+
+def test_index_is_built_once():
+    index = tech_categories.category_index()
+    assert tech_categories.category_index() is index
+    assert len(index) == len(wappalyzer_engine.get_engine().technologies)
+
+
+def test_tech_stack_uses_the_index():
+    page = PageSnapshot("shop.example")
+    page.status_code = 200
+    page.final_url = "https://shop.example/"
+    page.body = ('<html><head><meta name="generator" content="WordPress 6.4">'
+                 '<script src="https://js.stripe.com/v3/"></script></head>'
+                 '<body><img src="/wp-content/plugins/woocommerce/x.png"></body></html>')
+    page.headers.update({"Server": "nginx", "X-Powered-By": "PHP/8.2"})
+
+    stack = get_wappalyzer_library_tech_stack("shop.example", page)
+
+    assert stack["cms"] == "WordPress"
+    assert stack["web_servers"] == ["Nginx"]
+    assert stack["payment_processors"] == ["Stripe"]
+    assert "PHP" in stack["programming_languages"]
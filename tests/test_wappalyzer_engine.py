@@ -0,0 +1,53 @@
+"""Tests for the shared Wappalyzer engine."""
+
+import pytest
+from src.enrichment import wappalyzer_engine
+from src.enrichment.page_fetch import PageSnapshot
+
+if not wappalyzer_engine.WAPPALYZER_AVAILABLE:
+    pytest.skip("python-wappalyzer not installed", allow_module_level=True)
+
+PAGE = """<html><head>
+<meta name="generator" content="WordPress 6.4.2">
+<script src="/wp-includes/js/jquery/jquery.min.js?ver=3.7.1"></script>
+</head><body><link rel="stylesheet" href="/wp-content/themes/x/style.css"></body></html>"""
+
+
+def snapshot(body=PAGE, headers=None):
+    page = PageSnapshot("blog.example")
+    page.status_code = 200
+    page.final_url = "https://blog.example/"
+    page.body = body
+    page.headers.update(headers or {"Server": "nginx", "X-Powered-By": "PHP/8.2"})
+    return page
+
+
+def test_matches_the_stock_engine_without_touching_the_database():
+    engine = wappalyzer_engine.get_engine()
+    assert wappalyzer_engine.get_engine() is engine
+
+    stock = wappalyzer_engine.Wappalyzer.latest(technologies_file=wappalyzer_engine.technologies_file())
+    page = snapshot()
+    expected = stock.analyze(wappalyzer_engine.WebPage(page.final_url, page.body, page.headers))
+
+    assert wappalyzer_engine.analyze_snapshot(page) == expected
+    assert {"WordPress", "PHP", "Nginx"} <= expected
+    assert not any("detected" in tech or "confidence" in tech for tech in engine.technologies.values())
+
+
+def test_analysis_is_kept_on_the_snapshot(monkeypatch):
+    page = snapshot()
+    first = wappalyzer_engine.analyze_snapshot(page)
+    monkeypatch.setattr(wappalyzer_engine, "WebPage", None)  # a second parse would fail
+    assert wappalyzer_engine.analyze_snapshot(page) is first
+    assert wappalyzer_engine.analyze_snapshot(PageSnapshot("down.example")) is None
+
+
+def test_failed_load_is_not_retried(monkeypatch, tmp_path):
+    monkeypatch.setattr(wappalyzer_engine, "_engine", None)
+    monkeypatch.setattr(wappalyzer_engine, "_load_failed", False)
+    monkeypatch.setattr(wappalyzer_engine, "TECHNOLOGIES_FILE", str(tmp_path / "missing.json"))
+
+    assert wappalyzer_engine.get_engine() is None
+    assert wappalyzer_engine._load_failed
+    assert wappalyzer_engine.analyze_snapshot(snapshot()) is None